@@ -14,6 +14,7 @@ import yaml
 import pkg_resources
 from ..exceptions import InvalidJson, UnrecognizedRescaler
 from ..loci.transcript import Transcript
+from ..loci.expression_engine import get_expression
 from ..utilities import merge_dictionaries
 import json
 import jsonschema
@@ -280,13 +281,13 @@ def check_requirements(json_conf, require_schema, index):
     for key in keys:  # Create the final expression
         newexpr = re.sub(key, "evaluated[\"{0}\"]".format(key), newexpr)
 
-    # Test the expression
+    # Test the expression, and compile it for the rest of the run
+    json_conf[index]["expression"] = newexpr
     try:
-        compile(newexpr, "<json>", "eval")
+        get_expression(json_conf[index])
     except SyntaxError:
         raise InvalidJson("Invalid expression for {}:\n{}".format(index, newexpr))
 
-    json_conf[index]["expression"] = newexpr
     return json_conf
 
 
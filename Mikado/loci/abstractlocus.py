@@ -9,6 +9,7 @@ import abc
 import random
 import logging
 import itertools
+import collections
 from sys import maxsize
 from .clique_methods import find_cliques, find_communities, define_graph
 import networkx
@@ -17,6 +18,7 @@ from ..utilities import overlap, merge_ranges
 from ..utilities.log_utils import create_null_logger
 from ..utilities.intervaltree import Interval, IntervalTree
 from .transcript import Transcript
+from .expression_engine import evaluate_value, get_expression
 from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
 
 # I do not care that there are too many attributes: this IS a massive class!
@@ -57,6 +59,11 @@ class Abstractlocus(metaclass=abc.ABCMeta):
         self.__regressor = None
         self.session = None
         self.metrics_calculated = False
+        # Reference counts of the locus-wide features, and what each transcript contributed to them
+        self.__feature_counts = dict((feature, collections.Counter()) for feature in self._locus_features)
+        self.__contributions = dict()
+        self.__cds_coverage = None
+        self.__cds_intron_index = None
 
     @abc.abstractmethod
     def __str__(self, *args, **kwargs):
@@ -115,17 +122,13 @@ class Abstractlocus(metaclass=abc.ABCMeta):
         return (self == other) or (self > other)
 
     def __getstate__(self):
-        """Method to allow serialisation - we remove the byte-compiled eval expression."""
+        """Method to allow serialisation - we remove the logger, the session and the engine."""
 
         logger = self.logger
         del self.logger
         state = self.__dict__.copy()
         self.logger = logger
 
-        if hasattr(self, "json_conf"):
-            if "requirements" in self.json_conf and "compiled" in self.json_conf["requirements"]:
-                del state["json_conf"]["requirements"]["compiled"]
-
         if hasattr(self, "session"):
             if self.session is not None:
                 self.session.expunge_all()
@@ -141,11 +144,6 @@ class Abstractlocus(metaclass=abc.ABCMeta):
     def __setstate__(self, state):
         """Method to recreate the object after serialisation."""
         self.__dict__.update(state)
-        if hasattr(self, "json_conf"):
-            if "requirements" in self.json_conf and "expression" in self.json_conf["requirements"]:
-                self.json_conf["requirements"]["compiled"] = compile(
-                    self.json_conf["requirements"]["expression"],
-                    "<json>", "eval")
         # Set the logger to NullHandler
         self.logger = create_null_logger(self)
 
@@ -199,25 +197,7 @@ class Abstractlocus(metaclass=abc.ABCMeta):
         operation from the JSON dict file.
         """
 
-        if conf["operator"] == "eq":
-            comparison = (float(param) == float(conf["value"]))
-        elif conf["operator"] == "ne":
-            comparison = (float(param) != float(conf["value"]))
-        elif conf["operator"] == "gt":
-            comparison = (float(param) > float(conf["value"]))
-        elif conf["operator"] == "lt":
-            comparison = (float(param) < float(conf["value"]))
-        elif conf["operator"] == "ge":
-            comparison = (float(param) >= float(conf["value"]))
-        elif conf["operator"] == "le":
-            comparison = (float(param) <= float(conf["value"]))
-        elif conf["operator"] == "in":
-            comparison = (param in conf["value"])
-        elif conf["operator"] == "not in":
-            comparison = (param not in conf["value"])
-        else:
-            raise ValueError("Unknown operator: {0}".format(conf["operator"]))
-        return comparison
+        return evaluate_value(param, conf)
 
     # #### Class methods ########
 
@@ -373,19 +353,14 @@ class Abstractlocus(metaclass=abc.ABCMeta):
         self.start = min(self.start, transcript.start)
         self.end = max(self.end, transcript.end)
 
+        if transcript.id in self.transcripts:
+            self.__uncount_transcript(transcript.id)
         self.transcripts[transcript.id] = transcript
-        self.splices.update(transcript.splices)
-        self.introns.update(transcript.introns)
+        self.__count_transcript(transcript)
         if transcript.monoexonic is False:
             assert len(self.introns) > 0
-
-        self.combined_cds_introns = set.union(
-            self.combined_cds_introns, transcript.combined_cds_introns)
         assert len(transcript.combined_cds_introns) <= len(self.combined_cds_introns)
 
-        self.selected_cds_introns.update(transcript.selected_cds_introns)
-
-        self.exons.update(set(transcript.exons))
         assert isinstance(self.locus_verified_introns, set)
         assert isinstance(transcript.verified_introns, set)
         self.locus_verified_introns = set.union(self.locus_verified_introns,
@@ -413,67 +388,127 @@ class Abstractlocus(metaclass=abc.ABCMeta):
         if len(self.transcripts) == 1:
             self.transcripts = dict()
             self.introns, self.exons, self.splices = set(), set(), set()
-            self.cds_introns, self.selected_cds_introns = set(), set()
+            self.combined_cds_introns, self.selected_cds_introns = set(), set()
+            self.cds_introns = set()
+            self.__feature_counts = dict((feature, collections.Counter())
+                                         for feature in self._locus_features)
+            self.__contributions = dict()
+            self.__cds_coverage = None
             self.start, self.end, self.strand = float("Inf"), float("-Inf"), None
             self.stranded = True
             self.initialized = False
 
         else:
-            keys = list(key for key in self.transcripts if key != tid)
             self.end = max(self.transcripts[t].end for t in self.transcripts if t != tid)
             self.start = min(self.transcripts[t].start for t in self.transcripts if t != tid)
 
-            # Remove excess exons
-            other_exons = [
-                set(self.transcripts[otid].exons if
-                    otid in self.transcripts else []) for otid in keys]
-            other_exons = set.union(*other_exons)
-            exons_to_remove = set.difference(set(self.transcripts[tid].exons), other_exons)
-            self.exons.difference_update(exons_to_remove)
-
-            # Remove excess introns
-            other_introns = set.union(
-                *[set(self.transcripts[otid].introns if otid in self.transcripts else [])
-                  for otid in keys])
-            introns_to_remove = set.difference(set(self.transcripts[tid].introns), other_introns)
-            self.introns.difference_update(introns_to_remove)
-
-            # Remove excess cds introns
-            other_cds_introns = set.union(
-                *[set(
-                    self.transcripts[otid].combined_cds_introns
-                    if otid in self.transcripts else [])
-                  for otid in keys])
-            for otid in keys:
-                if otid in self.transcripts:
-                    other_cds_introns.update(set(self.transcripts[otid].combined_cds_introns))
-
-            cds_introns_to_remove = set.difference(
-                set(self.transcripts[tid].combined_cds_introns),
-                other_cds_introns)
-            self.combined_cds_introns.difference_update(cds_introns_to_remove)
-
-            # Remove excess selected_cds_introns
-            other_selected_cds_introns = set.union(
-                *[set(
-                    self.transcripts[otid].selected_cds_introns if otid in self.transcripts else []
-                ) for otid in keys])
-            selected_cds_introns_to_remove = set.difference(
-                set(self.transcripts[tid].selected_cds_introns),
-                other_selected_cds_introns)
-            self.selected_cds_introns.difference_update(selected_cds_introns_to_remove)
-
-            # Remove excess splices
-            other_splices = set.union(
-                *[self.transcripts[otid].splices
-                  if otid in self.transcripts else set() for otid in keys])
-            splices_to_remove = set.difference(self.transcripts[tid].splices, other_splices)
-            self.splices.difference_update(splices_to_remove)
-
+            # Remove the exons, introns, splices and CDS introns not shared with other transcripts
+            self.__uncount_transcript(tid)
             del self.transcripts[tid]
             for tid in self.transcripts:
                 self.transcripts[tid].parent = self.id
 
+    # Locus-wide sets which are kept updated with reference counting
+    _locus_features = ("exons", "introns", "splices", "combined_cds_introns", "selected_cds_introns")
+
+    def __count_transcript(self, transcript):
+
+        """
+        Private method to add the features of a transcript to the locus-wide sets.
+        The features are recorded, so that they can be removed later even if the transcript
+        has been modified in the meantime.
+        :param transcript: the transcript being added.
+        :type transcript: Transcript
+        """
+
+        contribution = dict()
+        for feature in self._locus_features:
+            values = set(getattr(transcript, feature))
+            contribution[feature] = values
+            getattr(self, feature).update(values)
+            self.__feature_counts[feature].update(values)
+        self.__contributions[transcript.id] = contribution
+        if contribution["combined_cds_introns"]:
+            self.__cds_introntree = IntervalTree()
+        self._invalidate_cds_cache()
+
+    def __uncount_transcript(self, tid):
+
+        """
+        Private method to remove the features contributed by a transcript from the locus-wide sets,
+        in time proportional to the size of the transcript rather than of the locus.
+        :param tid: the transcript being removed.
+        :type tid: str
+        """
+
+        contribution = self.__contributions.pop(tid)
+        for feature in self._locus_features:
+            counts, store = self.__feature_counts[feature], getattr(self, feature)
+            for value in contribution[feature]:
+                counts[value] -= 1
+                if counts[value] <= 0:
+                    del counts[value]
+                    store.discard(value)
+        if contribution["combined_cds_introns"]:
+            self.__cds_introntree = IntervalTree()
+        self._invalidate_cds_cache()
+
+    def _invalidate_cds_cache(self):
+        """
+        Method to signal that the CDS of the transcripts have changed without passing through
+        add_transcript_to_locus/remove_transcript_from_locus, so that the locus-wide
+        CDS coverage and CDS intron index have to be recalculated.
+        """
+        self.__cds_coverage = None
+        self.__cds_intron_index = None
+
+    @property
+    def _cds_coverage(self):
+
+        """
+        The number of bases covered by the combined and the selected CDS of all transcripts
+        in the locus. The value is cached until the transcripts of the locus change.
+        :rtype: (int, int)
+        """
+
+        if self.__cds_coverage is None:
+            cds_bases = sum(_[1] - _[0] + 1 for _ in merge_ranges(
+                itertools.chain(*[
+                    self.transcripts[_].combined_cds for _ in self.transcripts
+                    if self.transcripts[_].combined_cds])))
+
+            selected_bases = sum(_[1] - _[0] + 1 for _ in merge_ranges(
+                itertools.chain(*[
+                    self.transcripts[_].selected_cds for _ in self.transcripts
+                    if self.transcripts[_].selected_cds])))
+            self.__cds_coverage = (cds_bases, selected_bases)
+        return self.__cds_coverage
+
+    @property
+    def _cds_intron_index(self):
+
+        """
+        Strand-aware index of the CDS introns of all the transcripts in the locus.
+        For each strand, the IntervalTree contains each CDS intron once, with the set
+        of the transcripts it belongs to as value. The index is rebuilt only when the
+        transcripts of the locus, or their CDS introns, change.
+        :rtype: dict
+        """
+
+        total = sum(len(self.transcripts[_].combined_cds_introns) for _ in self.transcripts)
+        if self.__cds_intron_index is None or self.__cds_intron_index[0] != total:
+            owners = collections.defaultdict(dict)
+            for tid in self.transcripts:
+                strand = self.transcripts[tid].strand
+                for intron in self.transcripts[tid].combined_cds_introns:
+                    owners[strand].setdefault(intron, set()).add(tid)
+            trees = dict()
+            for strand in owners:
+                trees[strand] = IntervalTree.from_tuples(
+                    [(intron[0], intron[1] + 1, frozenset(tids)) for intron, tids in owners[strand].items()])
+            self.__cds_intron_index = (total, trees)
+        return self.__cds_intron_index[1]
+
     def find_retained_introns(self, transcript):
 
         """This method checks the number of exons that are possibly retained
@@ -525,6 +560,7 @@ class Abstractlocus(metaclass=abc.ABCMeta):
             #     [intervaltree.Interval(cds[0], max(cds[1], cds[0]+1))
             #      for cds in transcript.combined_cds])
 
+        cds_introns = self._cds_intron_index.get(transcript.strand, IntervalTree())
         for exon in iter(_ for _ in transcript.exons if _ not in transcript.combined_cds):
             # Ignore stuff that is at the 5'
             if transcript.combined_cds_length > 0:
@@ -549,27 +585,18 @@ class Abstractlocus(metaclass=abc.ABCMeta):
                 continue
 
             is_retained = False
-            for tid in self.transcripts:
+            # We cannot call retained introns against oneself or against stuff on the opposite strand
+            for intr in cds_introns.find(exon[0], exon[1], strict=True):
                 if is_retained:
                     break
-                if tid == transcript.id or transcript.strand != self.transcripts[tid].strand:
-                    # We cannot call retained introns against oneself or against stuff on the opposite strand
+                if not intr.value - {transcript.id}:
                     continue
-
-                cds_introns = self.transcripts[tid]._cds_introntree.find(exon[0],
-                                                                         exon[1],
-                                                                         strict=True)
-                # cds_introns = [_ for _ in cds_introns if _.start >= exon[0] and _.end <= exon[1]]
-
                 for frag in frags:
-                    if is_retained:
+                    if overlap((frag[0], frag[1]), (intr[0], intr[1])) > 0:
+                        self.logger.debug("Exon %s of %s is a retained intron",
+                                          exon, transcript.id)
+                        is_retained = True
                         break
-                    for intr in cds_introns:
-                        if overlap((frag[0], frag[1]), (intr[0], intr[1])) > 0:
-                            self.logger.debug("Exon %s of %s is a retained intron",
-                                              exon, transcript.id)
-                            is_retained = True
-                            break
 
             if is_retained:
                 retained_introns.append(exon)
@@ -619,6 +646,8 @@ class Abstractlocus(metaclass=abc.ABCMeta):
 
         assert len(self._cds_introntree) == len(self.combined_cds_introns)
 
+        # The CDS of the transcripts might have been modified since they were added
+        self._invalidate_cds_cache()
         for tid in sorted(self.transcripts):
             self.calculate_metrics(tid)
 
@@ -663,23 +692,13 @@ class Abstractlocus(metaclass=abc.ABCMeta):
 
         self.transcripts[tid].exon_fraction = fraction
 
-        cds_bases = sum(_[1] - _[0] + 1 for _ in merge_ranges(
-            itertools.chain(*[
-                self.transcripts[_].combined_cds for _ in self.transcripts
-                if self.transcripts[_].combined_cds])))
-
-        selected_bases = sum(_[1] - _[0] + 1 for _ in merge_ranges(
-            itertools.chain(*[
-                self.transcripts[_].selected_cds for _ in self.transcripts
-                if self.transcripts[_].selected_cds])))
-
-        for tid in self.transcripts:
-            if cds_bases == 0:
-                self.transcripts[tid].combined_cds_locus_fraction = 0
-                self.transcripts[tid].selected_cds_locus_fraction = 0
-            else:
-                self.transcripts[tid].combined_cds_locus_fraction = self.transcripts[tid].combined_cds_length / cds_bases
-                self.transcripts[tid].selected_cds_locus_fraction = self.transcripts[tid].selected_cds_length / selected_bases
+        cds_bases, selected_bases = self._cds_coverage
+        if cds_bases == 0:
+            self.transcripts[tid].combined_cds_locus_fraction = 0
+            self.transcripts[tid].selected_cds_locus_fraction = 0
+        else:
+            self.transcripts[tid].combined_cds_locus_fraction = self.transcripts[tid].combined_cds_length / cds_bases
+            self.transcripts[tid].selected_cds_locus_fraction = self.transcripts[tid].selected_cds_length / selected_bases
 
         if len(self.introns) > 0:
             _ = len(set.intersection(self.transcripts[tid].introns, self.introns))
@@ -712,7 +731,7 @@ class Abstractlocus(metaclass=abc.ABCMeta):
                              for e in self.transcripts[tid].retained_introns)
         fraction = retained_bases / self.transcripts[tid].cdna_length
         self.transcripts[tid].retained_fraction = fraction
-        self.logger.debug("Calculated metrics for {0}".format(tid))
+        self.logger.debug("Calculated metrics for %s", tid)
 
     def _check_not_passing(self, previous_not_passing=set()):
         """
@@ -723,26 +742,9 @@ class Abstractlocus(metaclass=abc.ABCMeta):
         """
 
         self.get_metrics()
-        if ("compiled" not in self.json_conf["requirements"] or
-                self.json_conf["requirements"]["compiled"] is None):
-            self.json_conf["requirements"]["compiled"] = compile(
-                self.json_conf["requirements"]["expression"], "<json>",
-                "eval")
-
-        not_passing = set()
-        not_passing = set()
-        for tid in iter(tid for tid in self.transcripts if
-                        tid not in previous_not_passing):
-            evaluated = dict()
-            for key in self.json_conf["requirements"]["parameters"]:
-                value = getattr(self.transcripts[tid],
-                                self.json_conf["requirements"]["parameters"][key]["name"])
-                evaluated[key] = self.evaluate(
-                    value,
-                    self.json_conf["requirements"]["parameters"][key])
-            # pylint: disable=eval-used
-            if eval(self.json_conf["requirements"]["compiled"]) is False:
-                not_passing.add(tid)
+        tids = [tid for tid in self.transcripts if tid not in previous_not_passing]
+        passing = get_expression(self.json_conf["requirements"]).evaluate_all(self.transcripts, tids)
+        not_passing = set(tid for tid, passed in zip(tids, passing) if passed is False)
         return not_passing
 
     @classmethod
@@ -815,11 +817,11 @@ class Abstractlocus(metaclass=abc.ABCMeta):
     def logger(self, logger):
         """Set a logger for the instance.
         :param logger
-        :type logger: logging.Logger | Nonell
+        :type logger: logging.Logger | logging.LoggerAdapter | None
         """
         if logger is None:
             logger = create_null_logger(self)
-        elif not isinstance(logger, logging.Logger):
+        elif not isinstance(logger, (logging.Logger, logging.LoggerAdapter)):
             raise TypeError("Invalid logger: {0}".format(type(logger)))
         self.__logger = logger
 
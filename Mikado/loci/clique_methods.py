@@ -8,6 +8,7 @@ import networkx
 from ..utilities.log_utils import create_null_logger
 from collections import defaultdict
 from itertools import chain, combinations
+import heapq
 
 __all__ = ["reid_daid_hurley"]
 
@@ -59,6 +60,9 @@ def define_graph(objects: dict, inters, **kwargs) -> networkx.Graph:
         - "inters" a function/method that determines whether two objects are connected or not.
 
     It will then return a graph.
+    Only pairs of objects whose genomic spans overlap (or touch) are tested with the
+    "inters" function, as none of the intersecting functions can consider as connected
+    objects lying in different portions of the genome.
     The method accepts also kwargs that can be passed to the inters function.
     WARNING: the kwargs option is really stupid and does not check
     for correctness of the arguments!
@@ -70,14 +74,71 @@ def define_graph(objects: dict, inters, **kwargs) -> networkx.Graph:
     # memory usage to increase too much
     graph.add_nodes_from(objects.keys())
 
-    for obj, other_obj in combinations(objects.keys(), 2):
+    keys = list(objects.keys())
+    edges = []
+    for first, second in _overlapping_pairs([objects[key] for key in keys]):
+        obj, other_obj = keys[first], keys[second]
         if inters(objects[obj], objects[other_obj], **kwargs):
-            # Connections are not directional
-            graph.add_edge(*tuple(sorted([obj, other_obj])))
+            edges.append((first, second))
+
+    # Add the edges in the same order in which the all-pairs loop would have,
+    # so that the adjacency of the resulting graph is identical
+    for first, second in sorted(edges):
+        # Connections are not directional
+        graph.add_edge(*tuple(sorted([keys[first], keys[second]])))
 
     return graph
 
 
+def _get_span(obj):
+
+    """
+    Private function to retrieve the genomic span of an object to be put in a graph.
+    Tuples and lists (e.g. exons) are interpreted as (start, end) duplexes; any other object
+    must expose "start" and "end" attributes (e.g. transcripts and BED12 ORFs).
+
+    :param obj: the object to analyse.
+    :return: the (start, end) duplex of the object.
+    """
+
+    if isinstance(obj, (tuple, list)):
+        start, end = obj[0], obj[1]
+    else:
+        start, end = obj.start, obj.end
+    if not isinstance(start, int) or not isinstance(end, int):
+        raise TypeError("Invalid span for object: {0}, {1}".format(start, end))
+    return start, end
+
+
+def _overlapping_pairs(objects: list):
+
+    """
+    Private generator that yields the index pairs (i, j), with i < j, of the objects
+    whose genomic spans overlap or touch. The pairs are found with a sweep-line on
+    the objects sorted by start, keeping the currently open spans in a heap keyed by end;
+    therefore only pairs which could possibly be intersecting are reported.
+    If the spans cannot be determined for any of the objects, all pairs are yielded.
+
+    :param objects: the list of objects to analyse.
+    :type objects: list
+    """
+
+    try:
+        spans = [_get_span(obj) for obj in objects]
+    except (AttributeError, TypeError, IndexError, KeyError):
+        yield from combinations(range(len(objects)), 2)
+        return
+
+    open_spans = []
+    for index in sorted(range(len(spans)), key=lambda pos: spans[pos][0]):
+        start, end = spans[index]
+        while open_spans and open_spans[0][0] < start:
+            heapq.heappop(open_spans)
+        for _, other in open_spans:
+            yield (other, index) if other < index else (index, other)
+        heapq.heappush(open_spans, (end, index))
+
+
 def find_cliques(graph: networkx.Graph, logger=None) -> (networkx.Graph, list):
     """
 
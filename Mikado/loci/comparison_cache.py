@@ -0,0 +1,62 @@
+# coding: utf-8
+
+"""
+This module contains the cache used by the loci of a superlocus to avoid comparing
+the same pair of transcripts more than once with Assigner.compare.
+"""
+
+from ..scales.assigner import Assigner
+
+__author__ = 'Luca Venturini'
+
+
+class ComparisonCache:
+
+    """
+    Class to memoise the results of Assigner.compare for pairs of transcripts.
+    Each transcript is identified by its ID, its strand and its exon chain, so that a
+    transcript modified after a comparison (e.g. by padding) is compared again.
+    The cache is meant to be shared by all the loci derived from a single superlocus,
+    and it is emptied when pickled.
+    """
+
+    def __init__(self):
+        self.__results = dict()
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_ComparisonCache__results"] = dict()
+        return state
+
+    def __len__(self):
+        return len(self.__results)
+
+    @staticmethod
+    def _key(transcript):
+        return transcript.id, transcript.strand, tuple(transcript.exons)
+
+    def compare(self, prediction, reference):
+
+        """
+        Method to compare two transcripts, returning the cached result if the
+        same comparison has already been performed.
+
+        :param prediction: the transcript query
+        :type prediction: Mikado.loci.Transcript
+
+        :param reference: the reference transcript
+        :type reference: Mikado.loci.Transcript
+
+        :returns: the same result as Assigner.compare
+        :rtype: (ResultStorer, tuple)
+        """
+
+        key = (self._key(prediction), self._key(reference))
+        if key in self.__results:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.__results[key] = Assigner.compare(prediction, reference)
+        return self.__results[key]
@@ -0,0 +1,179 @@
+# coding: utf-8
+
+"""
+This module contains the engine used to evaluate the filtering expressions of the configuration
+(the "requirements" and "not_fragmentary" sections). Each expression is compiled only once per
+process and kept in a cache; it can then be evaluated either on a single transcript or, as a
+vectorised predicate, on all the transcripts of a locus at once.
+"""
+
+import io
+import json
+import tokenize
+import numpy
+from .scoring_engine import evaluate_column
+
+__author__ = 'Luca Venturini'
+
+
+# Logical operators and their element-wise equivalent for boolean arrays
+_VECTORISED_OPERATORS = {"and": "&", "or": "|", "not": "~"}
+
+
+def evaluate_value(param, conf):
+
+    """
+    Function to evaluate a single value of a metric using the requested operation.
+    :param param: the value to be checked.
+
+    :param conf: the dictionary with the operator and the value to compare against.
+    :type conf: dict
+
+    :rtype: bool
+    """
+
+    if conf["operator"] == "eq":
+        comparison = (float(param) == float(conf["value"]))
+    elif conf["operator"] == "ne":
+        comparison = (float(param) != float(conf["value"]))
+    elif conf["operator"] == "gt":
+        comparison = (float(param) > float(conf["value"]))
+    elif conf["operator"] == "lt":
+        comparison = (float(param) < float(conf["value"]))
+    elif conf["operator"] == "ge":
+        comparison = (float(param) >= float(conf["value"]))
+    elif conf["operator"] == "le":
+        comparison = (float(param) <= float(conf["value"]))
+    elif conf["operator"] == "in":
+        comparison = (param in conf["value"])
+    elif conf["operator"] == "not in":
+        comparison = (param not in conf["value"])
+    else:
+        raise ValueError("Unknown operator: {0}".format(conf["operator"]))
+    return comparison
+
+
+def _vectorise(expression):
+
+    """
+    Private function to translate an expression, using only the "evaluated" dictionary
+    and logical operators, into its element-wise equivalent for numpy boolean arrays.
+    As the operands are always subscriptions of "evaluated", the relative precedence of
+    the operators is preserved.
+    :returns: the translated expression, or None if the expression contains anything else.
+    """
+
+    tokens = []
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(expression).readline):
+            if token.type == tokenize.NAME:
+                if token.string in _VECTORISED_OPERATORS:
+                    tokens.append((tokenize.OP, _VECTORISED_OPERATORS[token.string]))
+                    continue
+                elif token.string != "evaluated":
+                    return None
+            elif token.type == tokenize.OP and token.string not in ("(", ")", "[", "]"):
+                return None
+            tokens.append((token.type, token.string))
+    except (tokenize.TokenError, IndentationError):
+        return None
+    return tokenize.untokenize(tokens)
+
+
+class Expression:
+
+    """
+    Class representing a compiled filtering expression, together with its parameters.
+    Instances should be retrieved with get_expression, so that each expression is compiled only once.
+    """
+
+    def __init__(self, section):
+
+        """
+        :param section: the section of the configuration, with the "expression" and "parameters" keys.
+        :type section: dict
+        """
+
+        self.expression = section["expression"]
+        self.parameters = section["parameters"]
+        self.code = compile(self.expression, "<json>", "eval")
+        vectorised = _vectorise(self.expression)
+        if vectorised is not None:
+            try:
+                self.vectorised = compile(vectorised, "<json>", "eval")
+            except SyntaxError:
+                self.vectorised = None
+        else:
+            self.vectorised = None
+
+    def __reduce__(self):
+        # Code objects cannot be pickled, so the expression is compiled again when unpickling
+        return get_expression, ({"expression": self.expression, "parameters": self.parameters},)
+
+    def evaluate(self, transcript):
+
+        """
+        Method to evaluate the expression on a single transcript.
+        :param transcript: the transcript to evaluate.
+        :rtype: bool
+        """
+
+        evaluated = dict()
+        for key, conf in self.parameters.items():
+            evaluated[key] = evaluate_value(getattr(transcript, conf["name"]), conf)
+        # pylint: disable=eval-used
+        return eval(self.code, {"evaluated": evaluated})
+
+    def evaluate_all(self, transcripts, tids):
+
+        """
+        Method to evaluate the expression on multiple transcripts at once. Each parameter is
+        evaluated as a whole column; if any of the metrics is not numeric, or the expression
+        cannot be vectorised, the transcripts are evaluated one at a time instead.
+        :param transcripts: dictionary of the transcripts.
+        :type transcripts: dict
+
+        :param tids: the transcripts to evaluate, in order.
+        :type tids: list
+
+        :returns: the values of the expression, in the same order as tids.
+        :rtype: list
+        """
+
+        if self.vectorised is None or len(tids) == 0:
+            return [self.evaluate(transcripts[tid]) for tid in tids]
+
+        evaluated = dict()
+        for key, conf in self.parameters.items():
+            values = [getattr(transcripts[tid], conf["name"]) for tid in tids]
+            if conf["operator"] in ("in", "not in"):
+                column = numpy.array([value in conf["value"] for value in values], dtype=bool)
+                evaluated[key] = column if conf["operator"] == "in" else ~column
+            elif all(isinstance(value, (int, float, numpy.number)) for value in values):
+                evaluated[key] = evaluate_column(numpy.array(values, dtype=numpy.float64), conf)
+            else:
+                return [self.evaluate(transcripts[tid]) for tid in tids]
+
+        # pylint: disable=eval-used
+        result = numpy.broadcast_to(eval(self.vectorised, {"evaluated": evaluated}), (len(tids),))
+        return [bool(value) for value in result]
+
+
+_cache = dict()
+
+
+def get_expression(section):
+
+    """
+    Function to retrieve the compiled version of the expression in a section of the configuration.
+    The expressions are compiled on first use and cached for the lifetime of the process.
+    :param section: the section of the configuration, e.g. json_conf["requirements"].
+    :type section: dict
+
+    :rtype: Expression
+    """
+
+    key = (section["expression"], json.dumps(section["parameters"], sort_keys=True, default=str))
+    if key not in _cache:
+        _cache[key] = Expression(section)
+    return _cache[key]
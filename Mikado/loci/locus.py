@@ -6,22 +6,21 @@ i.e. the locus.
 """
 
 import itertools
+import logging
 import operator
+import time
 # import functools
 from collections import deque
 from .transcript import Transcript
-from ..scales.assigner import Assigner
+from .comparison_cache import ComparisonCache
 from .sublocus import Sublocus
 from .abstractlocus import Abstractlocus
+from .expression_engine import get_expression
 from ..parsers.GFF import GffLine
 import collections
 from ..utilities import overlap
+from ..utilities.genome_cache import get_genome
 import pyfaidx
-from sys import version_info
-if version_info.minor < 5:
-    from sortedcontainers import SortedDict
-else:
-    from collections import OrderedDict as SortedDict
 
 
 class Locus(Sublocus, Abstractlocus):
@@ -51,6 +50,8 @@ class Locus(Sublocus, Abstractlocus):
         self.locus_verified_introns = transcript.verified_introns
         self.metrics_calculated = False
         self.scores_calculated = False
+        # Cache of the comparisons, shared with the other loci of the superlocus
+        self.comparisons = ComparisonCache()
         self.score = transcript.score
         # A set of the transcript we will ignore during printing
         # because they are duplications of the original instance. Done solely to
@@ -61,12 +62,13 @@ class Locus(Sublocus, Abstractlocus):
         self.tid = transcript.id
         self.logger = logger
         self.attributes = dict()
-        self.logger.debug("Created Locus object with {0}".format(transcript.id))
+        self.logger.debug("Created Locus object with %s", transcript.id)
         self.primary_transcript_id = transcript.id
         self.attributes["is_fragment"] = False
         self.metric_lines_store = []
         self.__id = None
         self.fai = None
+        self.padding_time = 0
 
         # if (isinstance(self.json_conf, dict) and
         #         "reference" in self.json_conf):
@@ -142,23 +144,24 @@ class Locus(Sublocus, Abstractlocus):
 
             for tid, score in order:
                 if len(to_keep) == max_isoforms:
-                    self.logger.debug(
-                        "Discarding {} from the locus because we have reached the maximum number of isoforms for the locus".format(
+                    if self.logger.isEnabledFor(logging.DEBUG):
+                        self.logger.debug(
+                            "Discarding %s from the locus because we have reached the maximum number of isoforms for the locus",
                             ", ".join(list(set.difference(set(self.transcripts.keys()),
-                                                          to_keep)))
-                        ))
+                                                          to_keep))))
                     break
                 if score < threshold:
-                    self.logger.debug(
-                        "Discarding {} from the locus because their scores are below the threshold ({})".format(
+                    if self.logger.isEnabledFor(logging.DEBUG):
+                        self.logger.debug(
+                            "Discarding %s from the locus because their scores are below the threshold (%s)",
                             ", ".join(list(set.difference(set(self.transcripts.keys()),
                                                           to_keep))),
-                            round(threshold, 2)))
+                            round(threshold, 2))
                     break
                 to_keep.add(tid)
 
             if to_keep == set(self.transcripts.keys()):
-                self.logger.debug("Finished to discard superfluous transcripts from {}".format(self.id))
+                self.logger.debug("Finished to discard superfluous transcripts from %s", self.id)
                 break
             else:
                 for tid in set.difference(set(self.transcripts.keys()), to_keep):
@@ -181,8 +184,8 @@ class Locus(Sublocus, Abstractlocus):
                     continue
             if (self.json_conf["pick"]["alternative_splicing"]["keep_retained_introns"] is False
                 and to_remove):
-                self.logger.debug("Removing {} because they contain retained introns".format(
-                    ", ".join(list(to_remove))))
+                self.logger.debug("Removing %s because they contain retained introns",
+                                  ", ".join(list(to_remove)))
                 for tid in to_remove:
                     self.remove_transcript_from_locus(tid)
                 self.metrics_calculated = False
@@ -196,7 +199,9 @@ class Locus(Sublocus, Abstractlocus):
                 break
 
         if self.json_conf["pick"]["alternative_splicing"]["pad"] is True:
+            start = time.perf_counter()
             self.pad_transcripts()
+            self.padding_time += time.perf_counter() - start
 
         return
 
@@ -325,18 +330,7 @@ class Locus(Sublocus, Abstractlocus):
         """This method will use the expression in the "not_fragmentary" section
         of the configuration to determine whether it is itself a putative fragment."""
 
-        self.json_conf["not_fragmentary"]["compiled"] = compile(
-            self.json_conf["not_fragmentary"]["expression"], "<json>",
-            "eval")
-
-        evaluated = dict()
-        for key in self.json_conf["not_fragmentary"]["parameters"]:
-            value = getattr(self.primary_transcript,
-                            self.json_conf["not_fragmentary"]["parameters"][key]["name"])
-            evaluated[key] = self.evaluate(
-                value,
-                self.json_conf["not_fragmentary"]["parameters"][key])
-        if eval(self.json_conf["not_fragmentary"]["compiled"]) is True:
+        if get_expression(self.json_conf["not_fragmentary"]).evaluate(self.primary_transcript) is True:
             self.logger.debug("%s cannot be a fragment according to the definitions, keeping it",
                               self.id)
             return False
@@ -370,22 +364,22 @@ class Locus(Sublocus, Abstractlocus):
                           self.primary_transcript_id,
                           other.primary_transcript_id)
 
-        result, _ = Assigner.compare(other.primary_transcript, self.primary_transcript)
+        result, _ = self.comparisons.compare(other.primary_transcript, self.primary_transcript)
         # Exclude anything which is completely contained within an intron,
         # or is a monoexonic fragment overlapping/in the neighborhood
-        self.logger.debug("Comparison between {0} (strand {3}) and {1}: class code \"{2}\"".format(
-            self.primary_transcript.id,
-            other.primary_transcript.id,
-            result.ccode[0],
-            other.strand))
+        self.logger.debug("Comparison between %s (strand %s) and %s: class code \"%s\"",
+                          self.primary_transcript.id,
+                          other.strand,
+                          other.primary_transcript.id,
+                          result.ccode[0])
         if result.ccode[0] in ("i", "P", "p", "x", "X", "m", "_"):
-            self.logger.debug("{0} is a fragment (ccode {1})".format(
-                other.primary_transcript.id, result.ccode[0]))
+            self.logger.debug("%s is a fragment (ccode %s)",
+                              other.primary_transcript.id, result.ccode[0])
             return True
         # Adding c's because fragments might very well be contained!
         elif other.strand is None and (result.n_f1[0] > 0 or result.ccode in ("rI", "ri")):
-            self.logger.debug("Unstranded {0} is a fragment (ccode {1})".format(
-                other.primary_transcript.id, result.ccode[0]))
+            self.logger.debug("Unstranded %s is a fragment (ccode %s)",
+                              other.primary_transcript.id, result.ccode[0])
             return True
 
         return False
@@ -412,6 +406,7 @@ class Locus(Sublocus, Abstractlocus):
         # self.logger.info("Calculating the intron tree for %s", self.id)
         assert len(self._cds_introntree) == len(self.combined_cds_introns)
 
+        self._invalidate_cds_cache()
         for tid in sorted(self.transcripts):
             self.calculate_metrics(tid)
 
@@ -441,6 +436,7 @@ class Locus(Sublocus, Abstractlocus):
             new_transcript = transcript.copy()
             new_transcript.id = "{0}.orf1".format(new_transcript.id)
             self.transcripts[new_transcript.id] = new_transcript
+            self._invalidate_cds_cache()
             super().calculate_metrics(new_transcript.id)
             self.__orf_doubles[tid].add(new_transcript.id)
 
@@ -453,10 +449,11 @@ class Locus(Sublocus, Abstractlocus):
                                                      orf != _])
                 new_transcript.id = "{0}.orf{1}".format(new_transcript.id, num + 2)
                 self.transcripts[new_transcript.id] = new_transcript
+                self._invalidate_cds_cache()
                 super().calculate_metrics(new_transcript.id)
                 self.__orf_doubles[tid].add(new_transcript.id)
 
-        self.logger.debug("Calculated metrics for {0}".format(tid))
+        self.logger.debug("Calculated metrics for %s", tid)
 
     def calculate_scores(self):
         """
@@ -474,7 +471,7 @@ class Locus(Sublocus, Abstractlocus):
         if not hasattr(self, "logger"):
             self.logger = None
             self.logger.setLevel("DEBUG")
-        self.logger.debug("Calculating scores for {0}".format(self.id))
+        self.logger.debug("Calculating scores for %s", self.id)
 
         self.scores = dict()
         for tid in self.transcripts:
@@ -483,8 +480,7 @@ class Locus(Sublocus, Abstractlocus):
             self.scores[tid]["source_score"] = self.transcripts[tid].source_score
 
         if self.regressor is None:
-            for param in self.json_conf["scoring"]:
-                self._calculate_score(param)
+            self._calculate_score_matrix()
 
             for tid in self.scores:
                 self.transcripts[tid].scores = self.scores[tid].copy()
@@ -498,24 +494,7 @@ class Locus(Sublocus, Abstractlocus):
                 self.scores[tid]["score"] = self.transcripts[tid].score
 
         else:
-            valid_metrics = self.regressor.metrics
-            metric_rows = SortedDict()
-            for tid, transcript in sorted(self.transcripts.items(), key=operator.itemgetter(0)):
-                for param in valid_metrics:
-                    self.scores[tid][param] = "NA"
-                row = []
-                for attr in valid_metrics:
-                    val = getattr(transcript, attr)
-                    if isinstance(val, bool):
-                        if val:
-                            val = 1
-                        else:
-                            val = 0
-                    row.append(val)
-                metric_rows[tid] = row
-            # scores = SortedDict.fromkeys(metric_rows.keys())
-            for pos, score in enumerate(self.regressor.predict(list(metric_rows.values()))):
-                tid = list(metric_rows.keys())[pos]
+            for tid, score in self._predict_scores().items():
                 if tid in self.__orf_doubles:
                     del self.scores[tid]
                     continue
@@ -533,6 +512,7 @@ class Locus(Sublocus, Abstractlocus):
             for partial in self.__orf_doubles[doubled]:
                 if partial in self.transcripts:
                     del self.transcripts[partial]
+                    self._invalidate_cds_cache()
 
         self.scores_calculated = True
 
@@ -584,7 +564,7 @@ class Locus(Sublocus, Abstractlocus):
         valid_ccodes = self.json_conf["pick"]["alternative_splicing"]["valid_ccodes"]
         redundant_ccodes = self.json_conf["pick"]["alternative_splicing"]["redundant_ccodes"]
 
-        main_result, _ = Assigner.compare(other, self.primary_transcript)
+        main_result, _ = self.comparisons.compare(other, self.primary_transcript)
         main_ccode = main_result.ccode[0]
 
         if main_ccode not in valid_ccodes:
@@ -596,7 +576,7 @@ class Locus(Sublocus, Abstractlocus):
             for tid in iter(tid for tid in self.transcripts if
                             tid not in (self.primary_transcript_id, other.id)):
                 candidate = self.transcripts[tid]
-                result, _ = Assigner.compare(other, candidate)
+                result, _ = self.comparisons.compare(other, candidate)
                 if result.ccode[0] in redundant_ccodes:
                     self.logger.debug("%s is a redundant isoform of %s (ccode %s)",
                                       other.id, candidate.id, result.ccode[0])
@@ -611,7 +591,8 @@ class Locus(Sublocus, Abstractlocus):
         """
 
         try:
-            self.fai = pyfaidx.Fasta(self.json_conf["reference"]["genome"])
+            self.fai = get_genome(self.json_conf["reference"]["genome"],
+                                  memory_map=self.json_conf["reference"].get("memory_map", False))
         except KeyError:
             raise KeyError(self.json_conf.keys())
 
@@ -726,7 +707,7 @@ class Locus(Sublocus, Abstractlocus):
                 new_orfs = []
                 seq = ''
                 for exon in new_transcript.exons:
-                    seq += self.fai[self.chrom][exon[0] - 1:exon[1]].seq
+                    seq += self.fai.fetch(self.chrom, exon[0], exon[1])
                 seq = pyfaidx.Sequence(tid, seq)
                 self.logger.warning("For TID %s we have new length %d, old length %d, exons:\n%s",
                                     tid, len(seq), old_length, new_transcript.exons)
@@ -747,6 +728,7 @@ class Locus(Sublocus, Abstractlocus):
             # Now finalize again
             new_transcript.finalize()
             self.transcripts[tid] = new_transcript
+            self._invalidate_cds_cache()
 
     def __share_extreme(self, first, second, three_prime=False):
 
@@ -10,13 +10,12 @@ if version_info.minor < 5:
     from sortedcontainers import SortedDict
 else:
     from collections import OrderedDict as SortedDict
-import itertools
 from .transcript import Transcript
 from .abstractlocus import Abstractlocus
 from .sublocus import Sublocus
 from .locus import Locus
 from .monosublocus import Monosublocus
-from ..utilities import overlap
+from ..utilities import any_overlap
 from ..utilities.log_utils import create_null_logger
 import logging
 
@@ -156,7 +155,7 @@ class MonosublocusHolder(Sublocus, Abstractlocus):
                 if purge is False or selected_transcript.score > 0:
                     new_locus = Locus(selected_transcript, logger=self.logger)
                     loci.append(new_locus)
-            self.logger.debug("Removing {0} transcripts from {1}".format(len(to_remove), self.id))
+            self.logger.debug("Removing %d transcripts from %s", len(to_remove), self.id)
             graph.remove_nodes_from(to_remove)  # Remove nodes from graph, iterate
 
         for locus in sorted(loci):
@@ -193,7 +192,7 @@ class MonosublocusHolder(Sublocus, Abstractlocus):
          :rtype : bool
         """
 
-        if logger is None or not isinstance(logger, logging.Logger):
+        if logger is None or not isinstance(logger, (logging.Logger, logging.LoggerAdapter)):
             logger = create_null_logger("MSH")
 
         if transcript.id == other.id:
@@ -206,7 +205,7 @@ class MonosublocusHolder(Sublocus, Abstractlocus):
             logger.debug("No genomic overlap between %s and %s", transcript.id, other.id)
             return False  # We do not want intersection with oneself
 
-        if not any((overlap(*_) > 0) for _ in itertools.product(transcript.exons, other.exons)):
+        if not any_overlap(transcript.exons, other.exons, 1):
             logger.debug("No exonic overlap between %s and %s",
                          transcript.id, other.id)
             return False
@@ -220,9 +219,8 @@ class MonosublocusHolder(Sublocus, Abstractlocus):
         if not any([other.monoexonic, transcript.monoexonic]):
             if cds_only is True and all((_.is_coding is True for _ in (transcript, other))):
                 # First check for splice site interaction
-                if any(((overlap(*_) > 0) for _ in itertools.product(
-                        transcript.combined_cds_introns,
-                        other.combined_cds_introns))):
+                if any_overlap(transcript.combined_cds_introns,
+                               other.combined_cds_introns, 1):
                     logger.debug("At least one combined CDS intron of %s intersects a combined CDS intron of %s; %s %s",
                                  transcript.id, other.id, transcript.combined_cds_introns, other.combined_cds_introns)
                     return True
@@ -230,7 +228,7 @@ class MonosublocusHolder(Sublocus, Abstractlocus):
                     logger.debug("No combined CDS intron of %s intersects a combined CDS intron of %s",
                                  transcript.id, other.id)
             else:
-                if any(((overlap(*_) > 0) for _ in itertools.product(transcript.introns, other.introns))):
+                if any_overlap(transcript.introns, other.introns, 1):
                     logger.debug("At least 1 intron of %s intersects another intron in %s",
                                  transcript.id, other.id)
                     return True
@@ -239,8 +237,7 @@ class MonosublocusHolder(Sublocus, Abstractlocus):
                                  transcript.id, other.id)
         else:
             if cds_only is True and all((_.is_coding is True for _ in (transcript, other))):
-                if any(True for comb in itertools.product(transcript.combined_cds, other.combined_cds) if
-                       cls.overlap(*comb) >= 0):
+                if any_overlap(transcript.combined_cds, other.combined_cds, 0):
                     logger.debug("CDS overlap between %s and %s",
                                  transcript.id, other.id)
                     return True
@@ -249,8 +246,7 @@ class MonosublocusHolder(Sublocus, Abstractlocus):
                                  transcript.id, other.id)
                     # return False
             else:
-                if any(True for comb in itertools.product(transcript.exons, other.exons) if
-                       cls.overlap(*comb) >= 0):
+                if any_overlap(transcript.exons, other.exons, 0):
                     logger.debug("Genomic overlap between %s and %s",
                                  transcript.id, other.id)
                     return True
@@ -90,9 +90,9 @@ class Gene:
     def logger(self, logger):
         """Set a logger for the instance.
         :param logger
-        :type logger: logging.Logger | None
+        :type logger: logging.Logger | logging.LoggerAdapter | None
         """
-        if isinstance(logger, logging.Logger):
+        if isinstance(logger, (logging.Logger, logging.LoggerAdapter)):
             self.__logger = logger
         elif logger is None:
             name = "gene_{0}".format(self.id if self.id else "generic")
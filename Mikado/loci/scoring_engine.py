@@ -0,0 +1,163 @@
+# coding: utf-8
+
+"""
+This module contains the engine used to score the transcripts of a locus according to
+the scoring section of the configuration. All the metrics of the transcripts are
+collected into a single matrix, and each scoring parameter is then rescaled,
+filtered and multiplied as a whole column, rather than one transcript at a time.
+"""
+
+import numpy
+from sklearn.ensemble import RandomForestClassifier
+
+__author__ = 'Luca Venturini'
+
+
+_COMPARISONS = {"eq": numpy.equal,
+                "ne": numpy.not_equal,
+                "gt": numpy.greater,
+                "lt": numpy.less,
+                "ge": numpy.greater_equal,
+                "le": numpy.less_equal}
+
+
+def metrics_matrix(transcripts, tids, params):
+
+    """
+    This function collects the values of the requested metrics into a matrix,
+    with one row per transcript and one column per metric.
+
+    :param transcripts: dictionary of the transcripts.
+    :type transcripts: dict
+
+    :param tids: the transcripts to include, in order.
+    :type tids: list
+
+    :param params: the metrics to include, in order.
+    :type params: list
+
+    :rtype: numpy.ndarray
+    """
+
+    matrix = numpy.zeros((len(tids), len(params)), dtype=numpy.float64)
+    for row, tid in enumerate(tids):
+        transcript = transcripts[tid]
+        matrix[row] = [getattr(transcript, param) for param in params]
+    return matrix
+
+
+def evaluate_column(column, conf):
+
+    """
+    Vectorised version of Abstractlocus.evaluate, applied to all the values of a metric.
+
+    :param column: the values of the metric.
+    :type column: numpy.ndarray
+
+    :param conf: the dictionary with the operator and the value to compare against.
+    :type conf: dict
+
+    :returns: a boolean array, True for the values which pass the filter.
+    :rtype: numpy.ndarray
+    """
+
+    if conf["operator"] in _COMPARISONS:
+        return _COMPARISONS[conf["operator"]](column, float(conf["value"]))
+    elif conf["operator"] == "in":
+        return numpy.isin(column, conf["value"])
+    elif conf["operator"] == "not in":
+        return numpy.isin(column, conf["value"], invert=True)
+    else:
+        raise ValueError("Unknown operator: {0}".format(conf["operator"]))
+
+
+def rescale_column(column, conf):
+
+    """
+    This function calculates the scores of all transcripts for a single parameter,
+    before applying the filter and the multiplier.
+
+    :param column: the values of the metric.
+    :type column: numpy.ndarray
+
+    :param conf: the scoring configuration of the parameter.
+    :type conf: dict
+
+    :returns: the scores, and a flag indicating whether they are constant
+    (i.e. all the values of the metric are equal).
+    :rtype: (numpy.ndarray, bool)
+    """
+
+    rescaling = conf["rescaling"]
+    if rescaling == "target":
+        distances = numpy.abs(column - conf["value"])
+        denominator = distances.max()
+        if denominator == 0:
+            denominator = 1
+        return 1 - distances / denominator, False
+
+    minimum, maximum = column.min(), column.max()
+    if minimum == maximum:
+        return numpy.ones(column.shape), True
+    denominator = maximum - minimum
+    if rescaling == "max":
+        return numpy.abs((column - minimum) / denominator), False
+    elif rescaling == "min":
+        return numpy.abs(1 - (column - minimum) / denominator), False
+    return numpy.zeros(column.shape), True
+
+
+def score_matrix(matrix, params, scoring):
+
+    """
+    This function calculates the scores for all the transcripts and parameters at once.
+
+    :param matrix: the matrix of the metrics, as created by metrics_matrix.
+    :type matrix: numpy.ndarray
+
+    :param params: the scoring parameters, in the order of the columns of the matrix.
+    :type params: list
+
+    :param scoring: the scoring section of the configuration.
+    :type scoring: dict
+
+    :returns: a matrix of the same shape with the (unrounded) scores, and a boolean matrix
+    indicating which scores are constant (filtered out, or derived from a metric with a single value).
+    The latter are integers when the multiplier is an integer.
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+
+    scores = numpy.zeros(matrix.shape, dtype=numpy.float64)
+    constant = numpy.zeros(matrix.shape, dtype=bool)
+    for index, param in enumerate(params):
+        conf = scoring[param]
+        column, constant[:, index] = rescale_column(matrix[:, index], conf)
+        if "filter" in conf and conf["filter"] != {}:
+            passing = evaluate_column(matrix[:, index], conf["filter"])
+            column = numpy.where(passing, column, 0)
+            constant[:, index] |= ~passing
+        scores[:, index] = column * conf["multiplier"]
+    return scores, constant
+
+
+def predict_scores(regressor, matrix):
+
+    """
+    This function scores all the rows of a metrics matrix with a single call to
+    the provided scikit-learn model. For classifiers, the score is the probability
+    of the second class (i.e. of the transcript being correct).
+
+    :param regressor: the random forest, with the list of the metrics it uses in its "metrics" attribute.
+    :type regressor: (sklearn.ensemble.RandomForestRegressor|sklearn.ensemble.RandomForestClassifier)
+
+    :param matrix: the matrix of the metrics, with the columns in the order of regressor.metrics.
+    :type matrix: numpy.ndarray
+
+    :rtype: numpy.ndarray
+    """
+
+    if matrix.shape[0] == 0:
+        return numpy.zeros(0)
+    if isinstance(regressor, RandomForestClassifier):
+        return regressor.predict_proba(matrix)[:, 1]
+    return regressor.predict(matrix)
@@ -6,20 +6,13 @@ Each of these containers holds transcripts which either are monoexonic and overl
 or multiexonic and with at least one intron in common.
 """
 
-import itertools
 from .abstractlocus import Abstractlocus
+from . import scoring_engine
 from .excluded import Excluded
 from .monosublocus import Monosublocus
 from .transcript import Transcript
 from ..parsers.GFF import GffLine
-from sys import version_info
-import numpy
-from sklearn.ensemble import RandomForestClassifier
-if version_info.minor < 5:
-    from sortedcontainers import SortedDict
-else:
-    from collections import OrderedDict as SortedDict
-import operator
+from ..utilities import any_overlap
 
 
 # pylint: disable=too-many-instance-attributes
@@ -90,7 +83,7 @@ class Sublocus(Abstractlocus):
             self.attributes = getattr(span, "attributes")
 
         self.monosubloci = []
-        self.logger.debug("Initialized {0}".format(self.id))
+        self.logger.debug("Initialized %s", self.id)
         self.metric_lines_store = []  # This list will contain the lines to be printed in the metrics file
 
         self.scores = dict()
@@ -191,10 +184,10 @@ class Sublocus(Abstractlocus):
 
         self.monosubloci = []
         self.excluded = excluded
-        self.logger.debug("Launching calculate scores for {0}".format(self.id))
+        self.logger.debug("Launching calculate scores for %s", self.id)
         self.calculate_scores()
 
-        self.logger.debug("Defining monosubloci for {0}".format(self.id))
+        self.logger.debug("Defining monosubloci for %s", self.id)
 
         transcript_graph = self.define_graph(self.transcripts,
                                              inters=self.is_intersecting,
@@ -203,8 +196,8 @@ class Sublocus(Abstractlocus):
         while len(transcript_graph) > 0:
             cliques = self.find_cliques(transcript_graph)
             communities = self.find_communities(transcript_graph)
-            self.logger.debug("Cliques: {0}".format(cliques))
-            self.logger.debug("Communities: {0}".format(communities))
+            self.logger.debug("Cliques: %s", cliques)
+            self.logger.debug("Communities: %s", communities)
             to_remove = set()
             for msbl in communities:
                 msbl = dict((x, self.transcripts[x]) for x in msbl)
@@ -215,10 +208,9 @@ class Sublocus(Abstractlocus):
                                   selected_tid, selected_transcript.score)
                 for clique in cliques:
                     if selected_tid in clique:
-                        self.logger.debug("Removing as intersecting {0}: {1}".format(
-                            selected_tid,
-                            ",".join(list(clique))
-                        ))
+                        self.logger.debug("Removing as intersecting %s: %s",
+                                          selected_tid,
+                                          ",".join(list(clique)))
                         to_remove.update(clique)
                 if purge is False or selected_transcript.score > 0:
                     new_locus = Monosublocus(selected_transcript, logger=self.logger)
@@ -300,7 +292,7 @@ class Sublocus(Abstractlocus):
         if not hasattr(self, "logger"):
             self.logger = None
             self.logger.setLevel("DEBUG")
-        self.logger.debug("Calculating scores for {0}".format(self.id))
+        self.logger.debug("Calculating scores for %s", self.id)
         if "requirements" in self.json_conf:
             self.__check_requirements()
 
@@ -316,8 +308,7 @@ class Sublocus(Abstractlocus):
             self.scores[tid]["source_score"] = self.transcripts[tid].source_score
 
         if self.regressor is None:
-            for param in self.json_conf["scoring"]:
-                self._calculate_score(param)
+            self._calculate_score_matrix()
 
             for tid in self.scores:
                 self.transcripts[tid].scores = self.scores[tid].copy()
@@ -339,87 +330,59 @@ class Sublocus(Abstractlocus):
                 self.scores[tid]["score"] = self.transcripts[tid].score
 
         else:
-            valid_metrics = self.regressor.metrics
-            metric_rows = SortedDict()
-            for tid, transcript in sorted(self.transcripts.items(), key=operator.itemgetter(0)):
-                for param in valid_metrics:
-                    self.scores[tid][param] = "NA"
-                row = []
-                for attr in valid_metrics:
-                    val = getattr(transcript, attr)
-                    if isinstance(val, bool):
-                        if val:
-                            val = 1
-                        else:
-                            val = 0
-                    row.append(val)
-                # Necessary for sklearn ..
-                row = numpy.array(row)
-                # row = row.reshape(1, -1)
-                metric_rows[tid] = row
-            # scores = SortedDict.fromkeys(metric_rows.keys())
-            if isinstance(self.regressor, RandomForestClassifier):
-                # We have to pick the second probability (correct)
-                for tid in metric_rows:
-                    score = self.regressor.predict_proba(metric_rows[tid])[0][1]
-                    self.scores[tid]["score"] = score
-                    self.transcripts[tid].score = score
-            else:
-                pred_scores = self.regressor.predict(list(metric_rows.values()))
-                for pos, score in enumerate(pred_scores):
-                    self.scores[list(metric_rows.keys())[pos]]["score"] = score
-                    self.transcripts[list(metric_rows.keys())[pos]].score = score
+            for tid, score in self._predict_scores().items():
+                self.scores[tid]["score"] = score
+                self.transcripts[tid].score = score
 
         self.metric_lines_store = [_ for _ in self.prepare_metrics()]
         self.scores_calculated = True
 
-    def _calculate_score(self, param):
+    def _predict_scores(self):
         """
-        Private method that calculates a score for each transcript,
-        given a target parameter.
-        :param param:
-        :return:
+        Private method that scores all the transcripts with a single call to the
+        random forest model, rather than one call per transcript.
+        :return: a dictionary with the score of each transcript.
+        :rtype: dict
         """
 
-        rescaling = self.json_conf["scoring"][param]["rescaling"]
-        metrics = [getattr(self.transcripts[tid], param) for tid in self.transcripts]
-        if rescaling == "target":
-            target = self.json_conf["scoring"][param]["value"]
-            denominator = max(abs(x - target) for x in metrics)
-        else:
-            target = None
-            denominator = (max(metrics) - min(metrics))
-        if denominator == 0:
-            denominator = 1
+        valid_metrics = self.regressor.metrics
+        tids = sorted(self.transcripts.keys())
+        for tid in tids:
+            for param in valid_metrics:
+                self.scores[tid][param] = "NA"
+        predicted = scoring_engine.predict_scores(
+            self.regressor, scoring_engine.metrics_matrix(self.transcripts, tids, valid_metrics))
+        return dict(zip(tids, predicted.tolist()))
 
-        scores = []
-        for tid in self.transcripts:
-            tid_metric = getattr(self.transcripts[tid], param)
-            score = 0
-            check = True
-            if ("filter" in self.json_conf["scoring"][param] and
-                    self.json_conf["scoring"][param]["filter"] != {}):
-                check = self.evaluate(tid_metric, self.json_conf["scoring"][param]["filter"])
-
-            if check is True:
-                if rescaling == "target":
-                    score = 1 - abs(tid_metric - target) / denominator
+    def _calculate_score_matrix(self):
+        """
+        Private method that calculates the score of each transcript for all the
+        scoring parameters at once, using the matrix of their metrics.
+        :return:
+        """
+
+        params = list(self.json_conf["scoring"].keys())
+        tids = list(self.transcripts.keys())
+        scores, constant = scoring_engine.score_matrix(
+            scoring_engine.metrics_matrix(self.transcripts, tids, params),
+            params, self.json_conf["scoring"])
+
+        for index, param in enumerate(params):
+            multiplier = self.json_conf["scoring"][param]["multiplier"]
+            integral = isinstance(multiplier, int)
+            for row, (score, is_constant) in enumerate(zip(scores[:, index].tolist(),
+                                                          constant[:, index].tolist())):
+                if integral is True and is_constant is True:
+                    # Keep the integer scores for the transcripts which were filtered out
+                    # or have the only value present in the locus
+                    self.scores[tids[row]][param] = int(score)
                 else:
-                    if min(metrics) == max(metrics):
-                        score = 1
-                    elif rescaling == "max":
-                        score = abs((tid_metric - min(metrics)) / denominator)
-                    elif rescaling == "min":
-                        score = abs(1 - (tid_metric - min(metrics)) / denominator)
-
-            score *= self.json_conf["scoring"][param]["multiplier"]
-            self.scores[tid][param] = round(score, 2)
-            scores.append(score)
-
-        # This MUST be true
-        if "filter" not in self.json_conf["scoring"][param] and max(scores) == 0:
-            self.logger.warning("All transcripts have a score of 0 for %s in %s",
-                                param, self.id)
+                    self.scores[tids[row]][param] = round(score, 2)
+
+            # This MUST be true
+            if "filter" not in self.json_conf["scoring"][param] and scores[:, index].max() == 0:
+                self.logger.warning("All transcripts have a score of 0 for %s in %s",
+                                    param, self.id)
 
     def prepare_metrics(self):
 
@@ -502,18 +465,17 @@ class Sublocus(Abstractlocus):
         if transcript.id == other.id:
             # We do not want intersection with oneself
             if logger is not None:
-                logger.debug("Self-comparison for {0}".format(transcript.id))
+                logger.debug("Self-comparison for %s", transcript.id)
             return False
         if logger is not None:
-            logger.debug("Comparing {0} and {1}".format(transcript.id, other.id))
-        if any(True for comb in itertools.product(transcript.exons, other.exons) if
-               cls.overlap(*comb) >= 0):
+            logger.debug("Comparing %s and %s", transcript.id, other.id)
+        if any_overlap(transcript.exons, other.exons, 0):
             if logger is not None:
-                logger.debug("{0} and {1} are intersecting".format(transcript.id, other.id))
+                logger.debug("%s and %s are intersecting", transcript.id, other.id)
 
             return True
         if logger is not None:
-            logger.debug("{0} and {1} are not intersecting".format(transcript.id, other.id))
+            logger.debug("%s and %s are not intersecting", transcript.id, other.id)
         return False
     # pylint: enable=arguments-differ
 
@@ -8,6 +8,7 @@ and is used to define all the possible children (subloci, monoloci, loci, etc.)
 
 # Core imports
 import collections
+import time
 from sys import version_info
 import networkx
 from sqlalchemy.engine import Engine
@@ -20,6 +21,8 @@ from ..serializers.junction import Junction, Chrom
 from ..serializers.blast_serializer import Hit, Query, Target
 from ..serializers.orf import Orf
 from .abstractlocus import Abstractlocus
+from .expression_engine import get_expression
+from .comparison_cache import ComparisonCache
 from .monosublocus import Monosublocus
 from .excluded import Excluded
 from .transcript import Transcript
@@ -147,6 +150,12 @@ class Superlocus(Abstractlocus):
         self.__retained_sources = set()
         self.__data_loaded = False
 
+        # Wall time spent in each stage of the analysis, and size of the transcript graph
+        self.timings = collections.Counter()
+        self.graph_size = (0, 0)
+        # Cache of the transcript comparisons, shared with the stranded superloci and their loci
+        self.comparisons = ComparisonCache()
+
     def __create_locus_lines(self, superlocus_line, new_id, print_cds=True):
 
         """
@@ -309,7 +318,7 @@ class Superlocus(Abstractlocus):
         two different superloci.
         """
 
-        self.logger.debug("Splitting by strand for {0}".format(self.id))
+        self.logger.debug("Splitting by strand for %s", self.id)
         if self.stranded is True:
             self.logger.warning("Trying to split by strand a stranded Locus, {0}!".format(self.id))
             yield self
@@ -318,7 +327,7 @@ class Superlocus(Abstractlocus):
             plus, minus, nones = [], [], []
             for cdna_id in self.transcripts:
                 cdna = self.transcripts[cdna_id]
-                self.logger.debug("{0}: strand {1}".format(cdna_id, cdna.strand))
+                self.logger.debug("%s: strand %s", cdna_id, cdna.strand)
                 if cdna.strand == "+":
                     plus.append(cdna)
                 elif cdna.strand == "-":
@@ -356,6 +365,7 @@ class Superlocus(Abstractlocus):
             for new_locus in iter(sorted(new_loci)):
                 if self.regressor is not None:
                     new_locus.regressor = self.regressor
+                new_locus.comparisons = self.comparisons
                 yield new_locus
         raise StopIteration
 
@@ -391,7 +401,7 @@ class Superlocus(Abstractlocus):
 
         This routine is used to load data for a single transcript."""
 
-        self.logger.debug("Retrieving data for {0}".format(tid))
+        self.logger.debug("Retrieving data for %s", tid)
         self.transcripts[tid].logger = self.logger
         self.transcripts[tid].load_information_from_db(self.json_conf,
                                                        introns=self.locus_verified_introns,
@@ -409,10 +419,13 @@ class Superlocus(Abstractlocus):
         return to_remove, to_add
         # @profile
 
-    def _load_introns(self, data_dict):
+    def _load_introns(self, data_dict, junction_cache=None):
 
         """Private method to load the intron data into the locus.
         :param data_dict: Dictionary containing the preloaded data, if available.
+        :param junction_cache: optional per-process cache of the junctions, used instead
+        of querying the database when the data has not been preloaded.
+        :type junction_cache: (None|Mikado.picking.junction_cache.JunctionCache)
         :return:
         """
 
@@ -429,14 +442,17 @@ class Superlocus(Abstractlocus):
                 return  # No data to load
             # dbquery = self.db_baked(self.session).params(chrom_name=self.chrom).all()
 
-            ver_introns = self.engine.execute(" ".join([
-                "select junction_start, junction_end, strand from junctions where",
-                "chrom_id = (select chrom_id from chrom where name = \"{chrom}\")",
-                "and junction_start > {start} and junction_end < {end}"]).format(
-                    chrom=self.chrom, start=self.start, end=self.end
-            ))
-            ver_introns = dict(((junc.junction_start, junc.junction_end), junc.strand)
-                                for junc in ver_introns)
+            if junction_cache is not None:
+                ver_introns = junction_cache.verify(self.chrom, self.introns)
+            else:
+                ver_introns = self.engine.execute(" ".join([
+                    "select junction_start, junction_end, strand from junctions where",
+                    "chrom_id = (select chrom_id from chrom where name = \"{chrom}\")",
+                    "and junction_start > {start} and junction_end < {end}"]).format(
+                        chrom=self.chrom, start=self.start, end=self.end
+                ))
+                ver_introns = dict(((junc.junction_start, junc.junction_end), junc.strand)
+                                   for junc in ver_introns)
 
             # ver_introns = set((junc.junction_start, junc.junction_end) for junc in
             #                   self.junction_baked(self.session).params(
@@ -474,7 +490,7 @@ class Superlocus(Abstractlocus):
                                                      intron[1],
                                                      data_dict["junctions"][key]))
 
-    def load_all_transcript_data(self, engine=None, data_dict=None):
+    def load_all_transcript_data(self, engine=None, data_dict=None, junction_cache=None):
 
         """
         This method will load data into the transcripts instances,
@@ -489,6 +505,10 @@ class Superlocus(Abstractlocus):
         If None, a DB connection will be established to retrieve the necessary data.
         :type data_dict: (None | dict)
 
+        :param junction_cache: optional per-process cache of the junctions, to verify the introns
+        without querying the database for each superlocus.
+        :type junction_cache: (None | Mikado.picking.junction_cache.JunctionCache)
+
         """
 
         if self.__data_loaded is True:
@@ -501,7 +521,7 @@ class Superlocus(Abstractlocus):
                           type(data_dict))
         if isinstance(data_dict, dict):
             self.logger.debug("Length of data dict: %s", len(data_dict))
-        self._load_introns(data_dict)
+        self._load_introns(data_dict, junction_cache=junction_cache)
         self.logger.debug("Verified %d introns for %s",
                           len(self.locus_verified_introns),
                           self.id)
@@ -850,6 +870,7 @@ class Superlocus(Abstractlocus):
         transcript_graph = self.define_graph(self.transcripts,
                                              inters=self.is_intersecting,
                                              cds_only=cds_only)
+        self.graph_size = (transcript_graph.number_of_nodes(), transcript_graph.number_of_edges())
         transcript_graph = self.__reduce_complex_loci(transcript_graph)
         if len(self.transcripts) > len(transcript_graph):
             self.logger.warning("Discarded %d transcripts from %s due to approximation level %d",
@@ -1040,18 +1061,25 @@ class Superlocus(Abstractlocus):
         if self.loci_defined is True:
             return
 
+        start = time.perf_counter()
+        self.define_subloci()
+        self.timings["subloci"] += time.perf_counter() - start
+
+        start = time.perf_counter()
         self.logger.debug("Calculating monosubloci for %s, %d transcripts",
                           self.id, len(self.transcripts))
         self.define_monosubloci()
         self.logger.debug("Calculated monosubloci for %s, %d transcripts",
                           self.id, len(self.transcripts))
         self.calculate_mono_metrics()
+        self.timings["monosubloci"] += time.perf_counter() - start
 
         self.loci = SortedDict()
         if len(self.monoholders) == 0:
             self.loci_defined = True
             return
 
+        start = time.perf_counter()
         loci = []
         for monoholder in self.monoholders:
             monoholder.define_loci(purge=self.purge)
@@ -1060,11 +1088,17 @@ class Superlocus(Abstractlocus):
                 loci.append(monoholder.loci[locus_instance])
 
         for locus in sorted(loci):
+            locus.comparisons = self.comparisons
             self.loci[locus.id] = locus
+        self.timings["loci"] += time.perf_counter() - start
 
         self.loci_defined = True
         if self.json_conf["pick"]["alternative_splicing"]["report"] is True:
+            start = time.perf_counter()
             self.define_alternative_splicing()
+            padding = sum(locus.padding_time for locus in self.loci.values())
+            self.timings["padding"] += padding
+            self.timings["alternative_splicing"] += time.perf_counter() - start - padding
 
         return
 
@@ -1143,18 +1177,11 @@ class Superlocus(Abstractlocus):
             monoholder.calculate_scores()
 
     def compile_requirements(self):
-        """Quick function to evaluate the filtering expression, if it is present."""
+        """Quick function to compile the filtering expression, if it is present."""
 
         if "requirements" in self.json_conf:
-            if "compiled" in self.json_conf["requirements"]:
-                return
-            else:
-                self.json_conf["requirements"]["compiled"] = compile(
-                    self.json_conf["requirements"]["expression"],
-                    "<json>", "eval")
-                return
-        else:
-            return
+            get_expression(self.json_conf["requirements"])
+        return
 
     # ############ Class methods ###########
 
@@ -669,7 +669,7 @@ class Transcript:
         the strand will be removed from it.
         """
 
-        self.logger.debug("Stripping CDS from {0}".format(self.id))
+        self.logger.debug("Stripping CDS from %s", self.id)
         self.finalized = False
         assert len(self.exons) > 0
         if self.monoexonic is True and strand_specific is False:
@@ -971,7 +971,7 @@ class Transcript:
     def logger(self, logger):
         """Set a logger for the instance.
         :param logger: a Logger instance
-        :type logger: logging.Logger | None
+        :type logger: logging.Logger | logging.LoggerAdapter | None
         """
         if logger is None:
             if self.__logger is None:
@@ -980,7 +980,7 @@ class Transcript:
             else:
                 pass
         else:
-            assert isinstance(logger, logging.Logger)
+            assert isinstance(logger, (logging.Logger, logging.LoggerAdapter))
             self.__logger = logger
 
     @property
@@ -5,12 +5,13 @@ from the database/dictionary provided during the pick operation.
 
 
 from itertools import groupby
+from bisect import bisect_right
 from sqlalchemy.orm.session import sessionmaker
 from ...utilities import dbutils
-from ..clique_methods import define_graph, find_cliques, find_communities
 from ...serializers.junction import Junction
 from sqlalchemy import and_
 import operator
+import logging
 
 __author__ = 'Luca Venturini'
 
@@ -279,7 +280,7 @@ def load_information_from_db(transcript, json_conf, introns=None, session=None,
     Otherwise, they will be extracted from the database directly.
     """
 
-    transcript.logger.debug("Loading {0}".format(transcript.id))
+    transcript.logger.debug("Loading %s", transcript.id)
     transcript.json_conf = json_conf
 
     __load_verified_introns(transcript, data_dict, introns)
@@ -388,12 +389,8 @@ def retrieve_from_dict(transcript, data_dict):
 
 def find_overlapping_cds(transcript, candidates: list) -> list:
     """
-    Wrapper for the Abstractlocus method, used for finding overlapping ORFs.
-    It will pass to the function the class's "is_overlapping_cds" method
-    (which would be otherwise be inaccessible from the Abstractlocus class method).
-    As we are interested only in the communities, not the cliques,
-    this wrapper discards the cliques
-    (first element of the Abstractlocus.find_communities results)
+    Function to filter the candidate ORFs of a transcript and select the best
+    non-overlapping ones, using find_candidate_orfs.
 
     :param transcript: the Transcript instance
     :type transcript: Mikado.loci_objects.transcript.Transcript
@@ -415,7 +412,7 @@ def find_overlapping_cds(transcript, candidates: list) -> list:
         minimal_secondary_orf_length = 0
     transcript.logger.debug("Minimal orf loading: %d", minimal_secondary_orf_length)
 
-    transcript.logger.debug("{0} input ORFs for {1}".format(len(candidates), transcript.id))
+    transcript.logger.debug("%d input ORFs for %s", len(candidates), transcript.id)
     if any(corf.transcriptomic is False for corf in candidates):
         transcript.logger.debug("%d non-transcriptomic ORFs in the candidates",
                                 len([corf.transcriptomic is False for corf in candidates]))
@@ -429,34 +426,33 @@ def find_overlapping_cds(transcript, candidates: list) -> list:
     candidates = list(corf for corf in candidates if (
         corf.invalid is False and corf.transcriptomic is True))
 
-    transcript.logger.debug("{0} filtered ORFs for {1}".format(len(candidates), transcript.id))
+    transcript.logger.debug("%d filtered ORFs for %s", len(candidates), transcript.id)
     if len(candidates) == 0:
         return []
 
     orf_dictionary = dict((x.name, x) for x in candidates)
-
-    # First define the graph
-    graph = define_graph(orf_dictionary, inters=transcript.is_overlapping_cds)
-    candidate_orfs = find_candidate_orfs(transcript, graph, orf_dictionary)
-
-    transcript.logger.debug("{0} candidate retained ORFs for {1}: {2}".format(
-        len(candidate_orfs),
-        transcript.id,
-        [x.name for x in candidate_orfs]))
+    candidate_orfs = find_candidate_orfs(transcript, list(orf_dictionary.values()),
+                                         minimal_secondary_orf_length=minimal_secondary_orf_length)
+
+    if transcript.logger.isEnabledFor(logging.DEBUG):
+        transcript.logger.debug("%d candidate retained ORFs for %s: %s",
+                                len(candidate_orfs),
+                                transcript.id,
+                                [x.name for x in candidate_orfs])
     final_orfs = [candidate_orfs[0]]
     if len(candidate_orfs) > 1:
         others = list(corf for corf in candidate_orfs[1:] if
                       corf.cds_len >= minimal_secondary_orf_length)
-        transcript.logger.debug("Found {0} secondary ORFs for {1} of length >= {2}".format(
-            len(others), transcript.id,
-            minimal_secondary_orf_length
-        ))
+        transcript.logger.debug("Found %d secondary ORFs for %s of length >= %s",
+                                len(others), transcript.id,
+                                minimal_secondary_orf_length)
         final_orfs.extend(others)
 
-    transcript.logger.debug("Retained %d ORFs for %s: %s",
-                            len(final_orfs),
-                            transcript.id,
-                            [orf.name for orf in final_orfs])
+    if transcript.logger.isEnabledFor(logging.DEBUG):
+        transcript.logger.debug("Retained %d ORFs for %s: %s",
+                                len(final_orfs),
+                                transcript.id,
+                                [orf.name for orf in final_orfs])
     return final_orfs
 
 
@@ -548,12 +544,13 @@ def __load_verified_introns(transcript, data_dict=None, introns=None):
     :param data_dict: the dictionary with data to load
     :type data_dict: (dict | None)
 
-    :param introns: verified introns
+    :param introns: verified introns, as (start, end, strand) tuples. If provided, they will be
+    used instead of querying the database for each intron.
     :type introns: (set | None)
     """
 
     transcript.logger.debug("Checking introns; candidates %s", transcript.introns)
-    if data_dict is None:
+    if data_dict is None and introns is None:
         transcript.logger.debug("Checking introns using the database for %s",
                                 transcript.id)
 
@@ -654,53 +651,50 @@ def orf_sorter(orf):
             )
 
 
-def find_candidate_orfs(transcript, graph, orf_dictionary) -> list:
+def find_candidate_orfs(transcript, candidates, minimal_secondary_orf_length=0) -> list:
 
     """
-    Function that returns the best non-overlapping ORFs
+    Function that returns the best non-overlapping ORFs.
+    The ORFs are sorted once, using orf_sorter, and then selected greedily: an ORF is
+    retained unless it overlaps an ORF with a higher priority which has already been retained.
+    This gives the same selection as removing, in rounds, the best ORF of each group of
+    overlapping ORFs together with its neighbours. As the retained ORFs do not overlap each other,
+    each check only needs to look at the retained ORF which precedes the candidate.
+
+    ORFs shorter than the minimal secondary ORF length (apart from the best one)
+    are not considered, as they could only block other ORFs shorter than themselves.
 
     :param transcript: the Transcript instance
     :type transcript: Mikado.loci_objects.transcript.Transcript
 
-    :param graph: The NetworkX graph to be analysed
-    :type graph: networkx.Graph
+    :param candidates: the ORFs to select from
+    :type candidates: list[Mikado.serializers.orf.Orf]
 
-    :param orf_dictionary: a dictionary which contains the orf indexed by name
-    :type orf_dictionary: dict
+    :param minimal_secondary_orf_length: the minimal length of the ORFs after the first one.
+    :type minimal_secondary_orf_length: int
 
-    :return:
+    :return: the retained ORFs, sorted by decreasing priority
+    :rtype: list
     """
 
+    # Sorting is stable, so ties are resolved by the order of the candidates
+    ordered = sorted(candidates, key=orf_sorter, reverse=True)
+    ordered = ordered[:1] + [orf for orf in ordered[1:] if orf.cds_len >= minimal_secondary_orf_length]
+    transcript.logger.debug("Selecting the ORFs for %s out of %d candidates (%d total)",
+                            transcript.id, len(ordered), len(candidates))
+
     candidate_orfs = []
+    # Retained ORFs, sorted by their thick start
+    starts, retained = [], []
+    for orf in ordered:
+        index = bisect_right(starts, orf.thick_end)
+        if index > 0 and retained[index - 1].thick_end >= orf.thick_start:
+            # Identical ORFs are not considered to be overlapping (see Transcript.is_overlapping_cds)
+            if retained[index - 1] == orf:
+                candidate_orfs.append(orf)
+            continue
+        starts.insert(index, orf.thick_start)
+        retained.insert(index, orf)
+        candidate_orfs.append(orf)
 
-    while len(graph) > 0:
-        cliques = find_cliques(graph, logger=transcript.logger)
-        communities = find_communities(graph, logger=transcript.logger)
-        clique_str = []
-        for clique in cliques:
-            clique_str.append(str([(orf_dictionary[x].thick_start,
-                                    orf_dictionary[x].thick_end) for x in clique]))
-        comm_str = []
-        for comm in communities:
-            comm_str.append(str([(orf_dictionary[x].thick_start,
-                                  orf_dictionary[x].thick_end) for x in comm]))
-        transcript.logger.debug("{0} communities for {1}:\n\t{2}".format(
-            len(communities),
-            transcript.id,
-            "\n\t".join(comm_str)))
-        transcript.logger.debug("{0} cliques for {1}:\n\t{2}".format(
-            len(cliques),
-            transcript.id,
-            "\n\t".join(clique_str)))
-
-        to_remove = set()
-        for comm in communities:
-            comm = [orf_dictionary[x] for x in comm]
-            best_orf = sorted(comm, key=orf_sorter, reverse=True)[0]
-            candidate_orfs.append(best_orf)
-            for clique in iter(cl for cl in cliques if best_orf.name in cl):
-                to_remove.update(clique)
-        graph.remove_nodes_from(to_remove)
-
-    candidate_orfs = sorted(candidate_orfs, key=orf_sorter, reverse=True)
     return candidate_orfs
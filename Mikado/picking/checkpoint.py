@@ -0,0 +1,196 @@
+# coding: utf-8
+
+"""
+This module contains the classes used by Mikado pick to checkpoint a multiprocessing run,
+so that an interrupted run can be resumed without analysing again the superloci
+that had already been completed.
+
+Each worker process keeps a journal of the superloci it has completed. After each
+superlocus, the partial output files of the worker are flushed and a line with the
+counter of the superlocus and the size of each partial file is appended to the journal.
+When resuming, the partial files are truncated to the sizes recorded in the last complete
+line of their journal, so that any superlocus that was being written when the run was
+interrupted is discarded and analysed again.
+"""
+
+import os
+import json
+import shutil
+
+__author__ = 'Luca Venturini'
+
+
+CHECKPOINT_DIR = "mikado_pick_checkpoint"
+STATE_FILE = "checkpoint.json"
+JOURNAL = "journal"
+
+
+class CheckpointError(ValueError):
+    """Exception raised when an existing checkpoint cannot be used to resume a run."""
+    pass
+
+
+class Journal:
+
+    """
+    Class used by each worker process to record the superloci it has completed,
+    together with the size of its partial output files at that point.
+    """
+
+    def __init__(self, directory, identifier, handles):
+
+        """
+        :param directory: the checkpoint directory.
+        :type directory: str
+
+        :param identifier: the identifier of the worker process.
+        :type identifier: int
+
+        :param handles: the open partial output files of the worker.
+        :type handles: list
+        """
+
+        self.__handles = handles
+        self.__journal = open(os.path.join(directory, "{0}-{1}".format(JOURNAL, identifier)), "wt")
+        print(*[os.path.basename(handle.name) for handle in handles],
+              sep="\t", file=self.__journal)
+        self.__journal.flush()
+
+    def record(self, counter):
+
+        """
+        Method to record the completion of a superlocus. All the partial files are
+        flushed before writing to the journal, so that the recorded sizes are always valid.
+        :param counter: the counter of the completed superlocus.
+        :type counter: int
+        """
+
+        sizes = []
+        for handle in self.__handles:
+            handle.flush()
+            sizes.append(handle.tell())
+        print(counter, *sizes, sep="\t", file=self.__journal)
+        self.__journal.flush()
+
+    def close(self):
+        self.__journal.close()
+
+
+def recover_journal(filename):
+
+    """
+    This function reads the journal of a worker process, truncates its partial files to
+    the sizes recorded in the last complete line and returns the counters
+    of the completed superloci.
+
+    :param filename: the journal to recover.
+    :type filename: str
+
+    :returns: the set of the completed superloci.
+    :rtype: set
+    """
+
+    directory = os.path.dirname(filename)
+    done = set()
+    with open(filename) as journal:
+        header = journal.readline()
+        if not header.endswith("\n"):
+            # The worker was interrupted before writing the header: nothing was completed
+            return done
+        partials = header.rstrip("\n").split("\t")
+        sizes = [0] * len(partials)
+        for line in journal:
+            fields = line.rstrip("\n").split("\t")
+            if not line.endswith("\n") or len(fields) != len(partials) + 1:
+                # Incomplete last line
+                break
+            done.add(int(fields[0]))
+            sizes = [int(_) for _ in fields[1:]]
+
+    for partial, size in zip(partials, sizes):
+        partial = os.path.join(directory, partial)
+        if not os.path.exists(partial):
+            raise CheckpointError("Partial file {0} is missing from the checkpoint".format(partial))
+        with open(partial, "r+b") as handle:
+            handle.truncate(size)
+    return done
+
+
+class Checkpoint:
+
+    """
+    Class to manage the checkpoint directory of a Mikado pick run.
+    Workers are numbered progressively across resumed runs, so that the partial files of
+    previous runs are never overwritten and can be merged together with the new ones.
+    """
+
+    def __init__(self, directory, fingerprint, resume=False, logger=None):
+
+        """
+        :param directory: the checkpoint directory.
+        :type directory: str
+
+        :param fingerprint: a JSON-serialisable description of the input and of the run.
+        A checkpoint can only be resumed by a run with the same fingerprint.
+        :type fingerprint: dict
+
+        :param resume: if True, the completed superloci of a previous run will be recovered.
+        Otherwise, any previous checkpoint is discarded.
+        :type resume: bool
+
+        :param logger: optional logger.
+        """
+
+        self.directory = directory
+        self.fingerprint = fingerprint
+        self.done = set()
+        self.previous_workers = 0
+        state_file = os.path.join(self.directory, STATE_FILE)
+
+        if resume is True and os.path.exists(state_file):
+            with open(state_file) as state:
+                state = json.load(state)
+            if state["fingerprint"] != json.loads(json.dumps(fingerprint)):
+                raise CheckpointError(
+                    "The checkpoint in {0} was created for a different input or configuration; \
+please restart the run without resuming.".format(self.directory))
+            self.previous_workers = state["workers"]
+            for worker in range(1, self.previous_workers + 1):
+                journal = os.path.join(self.directory, "{0}-{1}".format(JOURNAL, worker))
+                if os.path.exists(journal):
+                    self.done.update(recover_journal(journal))
+            if logger is not None:
+                logger.info("Resuming from %s: %d superloci already analysed by %d previous workers",
+                            self.directory, len(self.done), self.previous_workers)
+        else:
+            if resume is True and logger is not None:
+                logger.warning("No checkpoint found in %s, starting from scratch", self.directory)
+            if os.path.exists(self.directory):
+                shutil.rmtree(self.directory)
+            os.makedirs(self.directory)
+
+    @property
+    def name(self):
+        """Alias of the directory, for compatibility with TemporaryDirectory."""
+        return self.directory
+
+    def register_workers(self, workers):
+
+        """
+        Method to record the number of workers of the current run, before they are started.
+        :param workers: the number of workers of the current run.
+        :type workers: int
+        :returns: the total number of workers, including those of the previous runs.
+        :rtype: int
+        """
+
+        total = self.previous_workers + workers
+        with open(os.path.join(self.directory, STATE_FILE + ".tmp"), "wt") as state:
+            json.dump({"fingerprint": self.fingerprint, "workers": total}, state)
+        os.replace(os.path.join(self.directory, STATE_FILE + ".tmp"),
+                   os.path.join(self.directory, STATE_FILE))
+        return total
+
+    def cleanup(self):
+        """Method to remove the checkpoint after a successful run."""
+        shutil.rmtree(self.directory)
@@ -0,0 +1,134 @@
+# coding: utf-8
+
+"""
+This module contains the per-process cache of the reliable junctions used by Mikado pick
+when the database has not been preloaded. Instead of querying the database for every
+superlocus and for every intron, the junctions of a chromosome are retrieved in a single
+query the first time the chromosome is encountered, and kept in sorted arrays.
+"""
+
+import collections
+from array import array
+from bisect import bisect_left
+from sqlalchemy import select
+from ..serializers.junction import Junction, Chrom
+
+__author__ = 'Luca Venturini'
+
+
+class _ChromJunctions:
+
+    """
+    Private class holding the junctions of a single chromosome, sorted by start and end.
+    """
+
+    __slots__ = ["starts", "ends", "strands"]
+
+    def __init__(self, rows):
+
+        """
+        :param rows: (junction_start, junction_end, strand) tuples, sorted by start and end.
+        If a junction is present more than once, the last occurrence is kept.
+        """
+
+        self.starts, self.ends, self.strands = array("l"), array("l"), []
+        for start, end, strand in rows:
+            if self.starts and self.starts[-1] == start and self.ends[-1] == end:
+                self.strands[-1] = strand
+                continue
+            self.starts.append(start)
+            self.ends.append(end)
+            self.strands.append(strand)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def find(self, start, end):
+
+        """
+        Method to find a junction by its coordinates.
+        :returns: the index of the junction, or -1 if it is not present.
+        """
+
+        index = bisect_left(self.starts, start)
+        while index < len(self.starts) and self.starts[index] == start:
+            if self.ends[index] == end:
+                return index
+            index += 1
+        return -1
+
+
+class JunctionCache:
+
+    """
+    Class to lazily load and cache the reliable junctions of each chromosome.
+    Only the most recently used chromosomes are kept in memory, as the input of Mikado pick
+    is sorted and each process analyses the chromosomes one after the other.
+    """
+
+    def __init__(self, engine, max_chroms=2):
+
+        """
+        :param engine: the engine connected to the Mikado database.
+        :type engine: sqlalchemy.engine.Engine
+
+        :param max_chroms: maximum number of chromosomes to keep in memory.
+        :type max_chroms: int
+        """
+
+        self.engine = engine
+        self.max_chroms = max(1, max_chroms)
+        self.__cache = collections.OrderedDict()
+
+    def __getstate__(self):
+        # The engine and the cache are specific to each process
+        state = self.__dict__.copy()
+        state["engine"] = None
+        state["_JunctionCache__cache"] = collections.OrderedDict()
+        return state
+
+    def __load(self, chrom):
+
+        query = select([Junction.junction_start, Junction.junction_end, Junction.strand]).where(
+            Junction.chrom_id == select([Chrom.chrom_id]).where(
+                Chrom.name == chrom).limit(1).as_scalar()).order_by(
+            Junction.junction_start, Junction.junction_end, Junction.id)
+        return _ChromJunctions(tuple(row) for row in self.engine.execute(query))
+
+    def get_chrom(self, chrom):
+
+        """
+        Method to retrieve the junctions of a chromosome, loading them from the database
+        if necessary.
+        :param chrom: the name of the chromosome.
+        :type chrom: str
+        """
+
+        if chrom in self.__cache:
+            self.__cache.move_to_end(chrom)
+        else:
+            while len(self.__cache) >= self.max_chroms:
+                self.__cache.popitem(last=False)
+            self.__cache[chrom] = self.__load(chrom)
+        return self.__cache[chrom]
+
+    def verify(self, chrom, introns):
+
+        """
+        Method to find which of the given introns are supported by a reliable junction.
+        :param chrom: the chromosome of the introns.
+        :type chrom: str
+
+        :param introns: an iterable of (start, end) intron coordinates.
+
+        :returns: a dictionary with the verified introns as keys and the strand of their junction as values.
+        :rtype: dict
+        """
+
+        junctions = self.get_chrom(chrom)
+        verified = dict()
+        for intron in introns:
+            index = junctions.find(intron[0], intron[1])
+            if index >= 0:
+                verified[(intron[0], intron[1])] = junctions.strands[index]
+        return verified
@@ -4,15 +4,22 @@ import logging
 import logging.handlers as logging_handlers
 import functools
 from ..utilities import dbutils
+from ..utilities.log_utils import LocusAdapter
+from ..utilities.intervaltree import IntervalTree
 from ..loci.superlocus import Superlocus
 from ..parsers.GFF import GffLine
+from .shards import Shard, parse_shard
+from .packing import PackedSuperlocus, unpack_superlocus
+from .timings import superlocus_timings, TIMING_FIELDS
+from .checkpoint import Journal
+from .junction_cache import JunctionCache
 import os
-import collections
 import csv
 import re
 import sys
 import pickle
-from itertools import zip_longest
+import heapq
+import time
 
 __author__ = 'Luca Venturini'
 
@@ -88,125 +95,170 @@ def print_gene(current_gene, gene_counter, handle, prefix):
     return tid_corrs
 
 
-def merge_loci_gff(gff_filenames, gff_handle, prefix=""):
+class _PartialFile:
 
     """
-    This function will merge different partial GFF files into a single loci file,
-    while changing the names to reflect the ordering.
-    :param gff_filenames:
-    :param gff_handle:
-    :param prefix:
-    :return:
+    Private class to read a temporary per-worker output file one superlocus at a time.
+    Each line of these files is prefixed by the counter of its superlocus ("<counter>/<line>"),
+    and the workers write the superloci in increasing counter order.
+    Only the line following the current superlocus is kept in memory.
     """
 
-    current_lines = dict()
-    gffs = [open(_) for _ in gff_filenames]
+    def __init__(self, filename):
+        self.__handle = open(filename)
+        self.counter, self.line = None, None
+        self.__advance()
 
-    for lines in zip_longest(*gffs):
-        for num, line in enumerate(lines):
-            if line is None:
-                continue
-            _ = line.split("/")
-            index = int(_[0])
-            if index not in current_lines:
-                current_lines[index] = {"filenum": num,
-                                        "lines": []}
-            else:
-                assert current_lines[index]["filenum"] == num, (num,
-                                                                current_lines[index])
-            current_lines[index]["lines"].append("/".join(_[1:]))
+    def __advance(self):
+        line = next(self.__handle, None)
+        if line is None:
+            self.counter, self.line = None, None
+            self.__handle.close()
+        else:
+            fields = line.split("/")
+            self.counter, self.line = int(fields[0]), "/".join(fields[1:])
+
+    def take(self, counter):
+        """
+        Method to retrieve all the lines of the superlocus with the given counter.
+        :param counter: the counter of the superlocus.
+        :type counter: int
+        :rtype: list[str]
+        """
+
+        lines = []
+        while self.counter is not None and self.counter == counter:
+            lines.append(self.line)
+            self.__advance()
+        return lines
 
-    [_.close() for _ in gffs]
+
+def _iter_partial_loci(num, gff, metrics, scores):
+
+    """
+    Private generator to iterate over the superloci written by a single worker, yielding
+    together the GFF lines, metrics rows and scores rows of each superlocus.
+    :param num: the index of the worker.
+    :param gff: the temporary GFF file of the worker.
+    :type gff: _PartialFile
+    :param metrics: the temporary metrics file of the worker.
+    :type metrics: _PartialFile
+    :param scores: the temporary scores file of the worker.
+    :type scores: _PartialFile
+    """
+
+    previous = None
+    while True:
+        counters = [_.counter for _ in (gff, metrics, scores) if _.counter is not None]
+        if len(counters) == 0:
+            break
+        counter = min(counters)
+        if previous is not None and counter <= previous:
+            raise ValueError(
+                "Superloci out of order in the temporary files of worker {0}: {1} after {2}".format(
+                    num + 1, counter, previous))
+        previous = counter
+        yield counter, num, gff.take(counter), metrics.take(counter), scores.take(counter)
+
+
+def merge_loci_gff(lines, gff_handle, prefix="", current_chrom=None, gene_counter=0):
+
+    """
+    This function will print the GFF lines of a single superlocus into the final loci file,
+    while changing the names to reflect the ordering.
+    :param lines: the GFF lines of the superlocus.
+    :type lines: list[str]
+    :param gff_handle: the handle to the output file.
+    :param prefix: the prefix to use for the gene names.
+    :param current_chrom: the chromosome of the previous superlocus.
+    :param gene_counter: the last gene counter used on the current chromosome.
+    :return: the current chromosome, the current gene counter, and the dictionaries
+    with the new names of the genes and transcripts of the superlocus.
+    """
 
     gid_to_new = dict()
     tid_to_new = dict()
 
-    with open(gff_handle, "a") as gff_handle:
-        current_gene = dict()
-        current_chrom = None
-        gene_counter = 0
-        for index in sorted(current_lines.keys()):
-            file_index = current_lines[index]["filenum"]
-            lines = [GffLine(_) for _ in current_lines[index]["lines"]]
-            for line in lines:
-                if line.header is True:
-                    continue
-                if current_chrom is not None and current_chrom != line.chrom:
-                    gene_counter = 0
-                    current_chrom = line.chrom
-                elif current_chrom is None:
-                    current_chrom = line.chrom
-                # Start the printing process
-                if line.is_gene:
-                    if current_gene != dict():
-                        tid_corrs = print_gene(current_gene,
-                                               gene_counter,
-                                               gff_handle,
-                                               prefix)
-                        for tid in tid_corrs:
-                            assert (file_index, tid) not in tid_to_new, (file_index, tid)
-                            tid_to_new[(file_index, tid)] = tid_corrs[tid]
-                        current_gene = dict()
-                    current_gene["transcripts"] = dict()
-
-                    # Create the correspondence for the new gene
-                    gene_counter += 1
-                    new_id = "{0}.{1}G{2}".format(prefix, line.chrom, gene_counter)
-                    assert (file_index, line.id) not in gid_to_new, ((file_index, line.id),
-                                                                     gid_to_new)
-                    gid_to_new[(file_index, line.id)] = new_id
-                    line.id = new_id
-                    current_gene["gene"] = line
-                elif line.is_transcript:
-                    assert current_gene != dict()
-                    current_gene["transcripts"][line.id] = dict()
-                    current_gene["transcripts"][line.id]["transcript"] = line
-                    current_gene["transcripts"][line.id]["exons"] = []
-                    if line.attributes["primary"].lower() in ("true", "false"):
-                        if line.attributes["primary"].lower() == "true":
-                            primary = True
-                        else:
-                            primary = False
-                        current_gene["transcripts"][line.id]["primary"] = primary
-                    else:
-                        raise ValueError("Invalid value for \"primary\" field: {0}".format(
-                            line.attributes["primary"]))
-                elif line.is_exon:
-                    for parent in line.parent:
-                        assert parent in current_gene["transcripts"]
-                        current_gene["transcripts"][parent]["exons"].append(line)
+    current_gene = dict()
+    for line in lines:
+        line = GffLine(line)
+        if line.header is True:
+            continue
+        if current_chrom is not None and current_chrom != line.chrom:
+            gene_counter = 0
+            current_chrom = line.chrom
+        elif current_chrom is None:
+            current_chrom = line.chrom
+        # Start the printing process
+        if line.is_gene:
+            if current_gene != dict():
+                tid_corrs = print_gene(current_gene,
+                                       gene_counter,
+                                       gff_handle,
+                                       prefix)
+                for tid in tid_corrs:
+                    assert tid not in tid_to_new, tid
+                    tid_to_new[tid] = tid_corrs[tid]
+                current_gene = dict()
+            current_gene["transcripts"] = dict()
+
+            # Create the correspondence for the new gene
+            gene_counter += 1
+            new_id = "{0}.{1}G{2}".format(prefix, line.chrom, gene_counter)
+            assert line.id not in gid_to_new, (line.id, gid_to_new)
+            gid_to_new[line.id] = new_id
+            line.id = new_id
+            current_gene["gene"] = line
+        elif line.is_transcript:
+            assert current_gene != dict()
+            current_gene["transcripts"][line.id] = dict()
+            current_gene["transcripts"][line.id]["transcript"] = line
+            current_gene["transcripts"][line.id]["exons"] = []
+            if line.attributes["primary"].lower() in ("true", "false"):
+                if line.attributes["primary"].lower() == "true":
+                    primary = True
                 else:
-                    if current_gene != dict():
-                        tid_corrs = print_gene(current_gene,
-                                               gene_counter,
-                                               gff_handle,
-                                               prefix)
-                        for tid in tid_corrs:
-                            assert (file_index, tid) not in tid_to_new, (file_index, tid)
-                            tid_to_new[(file_index, tid)] = tid_corrs[tid]
-                        current_gene = dict()
-                        print("###", file=gff_handle)
-
-                    print(line, file=gff_handle)
-                    continue
-
+                    primary = False
+                current_gene["transcripts"][line.id]["primary"] = primary
+            else:
+                raise ValueError("Invalid value for \"primary\" field: {0}".format(
+                    line.attributes["primary"]))
+        elif line.is_exon:
+            for parent in line.parent:
+                assert parent in current_gene["transcripts"]
+                current_gene["transcripts"][parent]["exons"].append(line)
+        else:
             if current_gene != dict():
-                tid_corrs = print_gene(current_gene, gene_counter, gff_handle, prefix)
+                tid_corrs = print_gene(current_gene,
+                                       gene_counter,
+                                       gff_handle,
+                                       prefix)
                 for tid in tid_corrs:
-                    assert (file_index, tid) not in tid_to_new, (file_index, tid)
-                    tid_to_new[(file_index, tid)] = tid_corrs[tid]
+                    assert tid not in tid_to_new, tid
+                    tid_to_new[tid] = tid_corrs[tid]
                 current_gene = dict()
                 print("###", file=gff_handle)
-            del current_lines[index]
 
-    # [os.remove(_) for _ in gff_filenames]
-    return gid_to_new, tid_to_new
+            print(line, file=gff_handle)
+            continue
+
+    if current_gene != dict():
+        tid_corrs = print_gene(current_gene, gene_counter, gff_handle, prefix)
+        for tid in tid_corrs:
+            assert tid not in tid_to_new, tid
+            tid_to_new[tid] = tid_corrs[tid]
+        print("###", file=gff_handle)
+
+    return current_chrom, gene_counter, gid_to_new, tid_to_new
 
 
 def merge_loci(num_temp, out_handles, prefix="", tempdir="mikado_pick_tmp"):
 
     """ Function to merge the temporary loci files into single output files,
       renaming the genes according to the preferred style.
+      The merge is a streaming k-way merge: as each worker writes its superloci in increasing
+      counter order, only the next pending superlocus of each worker is kept in memory, and the
+      GFF, metrics and scores of each superlocus are written out in the same pass.
     :param num_temp: number of temporary files.
     :param out_handles: The names of the output loci files.
     :param prefix: Prefix to use for the gene names.
@@ -216,56 +268,72 @@ def merge_loci(num_temp, out_handles, prefix="", tempdir="mikado_pick_tmp"):
 
     metrics_handle, scores_handle, gff_handle = out_handles
 
-    gff_filenames = [os.path.join(tempdir,
-                                  "{0}-{1}".format(os.path.basename(gff_handle),
-                                                   _))
-                     for _ in range(1, num_temp + 1)]
-
-    gid_to_new, tid_to_new = merge_loci_gff(gff_filenames, gff_handle, prefix)
-
-    for handle in metrics_handle, scores_handle:
-        filenames = [os.path.join(tempdir,
-                                  "{0}-{1}".format(os.path.basename(handle), _))
-                     for _ in range(1, num_temp + 1)]
-        handle = open(handle, "a")
-        current_lines = collections.defaultdict(list)
-        filenames = [open(_) for _ in filenames]
-        finished = set()
-        while len(finished) < len(filenames):
-            for num, _ in enumerate(filenames):
-                if _.name in finished:
-                    continue
-                else:
-                    try:
-                        line = next(_)
-                        fields = line.split("/")
-                        current_lines[int(fields[0])].append((num, "/".join(fields[1:])))
-                    except StopIteration:
-                        _.close()
-                        finished.add(_.name)
-
-        # Parsing scores and metrics
-        while len(current_lines) > 0:
-            current = min(current_lines.keys())
-            for index, line in current_lines[current]:
-                fields = line.split("\t")
-                tid, gid = fields[:2]
-                if (index, gid) not in gid_to_new:
-                    raise KeyError("GID {} not found in {}!".format(
-                        (index, gid), handle.name))
-                if (index, tid) not in tid_to_new:
-                    raise KeyError("TID {} not found in {}!".format(
-                        (index, tid), handle.name))
-
-                fields[0] = tid_to_new[(index, tid)]
-                fields[1] = gid_to_new[(index, gid)]
-                line = "\t".join(fields)
-                print(line, file=handle, end="")
-            del current_lines[current]
-        # [os.remove(_) for _ in finished]
+    workers = []
+    for num in range(num_temp):
+        partials = [_PartialFile(os.path.join(tempdir,
+                                              "{0}-{1}".format(os.path.basename(handle), num + 1)))
+                    for handle in (gff_handle, metrics_handle, scores_handle)]
+        workers.append(_iter_partial_loci(num, *partials))
+
+    current_chrom, gene_counter = None, 0
+    with open(gff_handle, "a") as gff_out, open(metrics_handle, "a") as metrics_out, \
+            open(scores_handle, "a") as scores_out:
+        for counter, num, gff_lines, metrics_lines, scores_lines in heapq.merge(*workers):
+            current_chrom, gene_counter, gid_to_new, tid_to_new = merge_loci_gff(
+                gff_lines, gff_out, prefix=prefix,
+                current_chrom=current_chrom, gene_counter=gene_counter)
+
+            for lines, handle in ((metrics_lines, metrics_out), (scores_lines, scores_out)):
+                for line in lines:
+                    fields = line.split("\t")
+                    tid, gid = fields[:2]
+                    if gid not in gid_to_new:
+                        raise KeyError("GID {} not found in {}!".format(
+                            (num, gid), handle.name))
+                    if tid not in tid_to_new:
+                        raise KeyError("TID {} not found in {}!".format(
+                            (num, tid), handle.name))
+
+                    fields[0] = tid_to_new[tid]
+                    fields[1] = gid_to_new[gid]
+                    line = "\t".join(fields)
+                    print(line, file=handle, end="")
     return
 
 
+def _fragment_references(locus_instance, not_fragments, index, flank):
+
+    """
+    Private function to select the loci against which a putative fragment has to be compared.
+    As Assigner.compare classifies any pair of non-overlapping transcripts as a run-on fragment
+    ("p" or "P"), a single locus lying outside of the flanking window is sufficient to decide;
+    otherwise, only the loci found in the window are returned.
+
+    :param locus_instance: the putative fragment.
+    :type locus_instance: Mikado.loci.Locus
+
+    :param not_fragments: the loci which are not putative fragments.
+    :type not_fragments: set
+
+    :param index: the interval tree of the loci which are not putative fragments.
+    :type index: IntervalTree
+
+    :param flank: the window to consider around the putative fragment.
+    :type flank: int
+    """
+
+    neighbours = set(index.find(locus_instance.start - flank, locus_instance.end + 1 + flank))
+    for other_locus in not_fragments:
+        if (other_locus not in neighbours and
+                other_locus.primary_transcript_id != locus_instance.primary_transcript_id):
+            yield other_locus
+            break
+
+    for other_locus in neighbours:
+        if other_locus.primary_transcript_id != locus_instance.primary_transcript_id:
+            yield other_locus
+
+
 def remove_fragments(stranded_loci, json_conf, logger):
 
     """This method checks which loci are possible fragments, according to the
@@ -303,6 +371,12 @@ def remove_fragments(stranded_loci, json_conf, logger):
         loci_to_check[False] = loci_to_check.pop(True)
         loci_to_check[True] = set()
 
+    # Index the loci which are not fragments, to compare each putative fragment only with its neighbours
+    index = IntervalTree()
+    for locus_instance in loci_to_check[False]:
+        index.insert(locus_instance.start, locus_instance.end + 1, locus_instance)
+    flank = json_conf["pick"]["run_options"]["flank"]
+
     bool_remove_fragments = json_conf["pick"]["run_options"]["remove_overlapping_fragments"]
     for stranded_locus in stranded_loci:
         to_remove = set()
@@ -310,9 +384,7 @@ def remove_fragments(stranded_loci, json_conf, logger):
             if locus_instance in loci_to_check[True]:
                 logger.debug("Checking if %s is a fragment", locus_instance.id)
 
-                for other_locus in iter(
-                        olocus for olocus in loci_to_check[False]
-                        if olocus.primary_transcript_id != locus_instance.primary_transcript_id):
+                for other_locus in _fragment_references(locus_instance, loci_to_check[False], index, flank):
                     if other_locus.other_is_fragment(
                             locus_instance) is True:
                         if bool_remove_fragments is False:
@@ -327,13 +399,33 @@ def remove_fragments(stranded_loci, json_conf, logger):
         yield stranded_locus
 
 
+def _queue_logger(logging_queue, level):
+
+    """
+    Private function to retrieve the logger used by analyse_locus when the caller does not provide one.
+    A single logger is created per process, and the handler to the logging queue is attached only once.
+    :param logging_queue: the logging queue
+    :param level: the logging level
+    :rtype: logging.Logger
+    """
+
+    logger = logging.getLogger("LociProcesser-{0}".format(os.getpid()))
+    if not logger.handlers:
+        logger.addHandler(logging_handlers.QueueHandler(logging_queue))
+        logger.propagate = False
+    logger.setLevel(level)
+    return logger
+
+
 def analyse_locus(slocus: Superlocus,
                   counter: int,
                   json_conf: dict,
                   printer_queue: [AutoProxy, None],
                   logging_queue: AutoProxy,
                   engine=None,
-                  data_dict=None) -> [Superlocus]:
+                  data_dict=None,
+                  junction_cache=None,
+                  logger=None) -> [Superlocus]:
 
     """
     :param slocus: a superlocus instance
@@ -357,6 +449,14 @@ def analyse_locus(slocus: Superlocus,
     :param data_dict: a dictionary of preloaded data
     :type data_dict: (None|dict)
 
+    :param junction_cache: the per-process cache of the junctions, used when the data
+    has not been preloaded.
+    :type junction_cache: (None|JunctionCache)
+
+    :param logger: the logger of the calling process. If None, a logger writing to the
+    logging queue is created once per process.
+    :type logger: (None|logging.Logger)
+
     This function takes as input a "superlocus" instance and the pipeline configuration.
     It also accepts as optional keywords a dictionary with the CDS information
     (derived from a Bed12Parser) and a "lock" used for avoiding writing collisions
@@ -370,22 +470,14 @@ def analyse_locus(slocus: Superlocus,
     if slocus is None:
         # printer_dict[counter] = []
         if printer_queue:
-            while printer_queue.qsize() >= json_conf["pick"]["run_options"]["procs"] * 10:
-                continue
             # printer_queue.put_nowait(([], counter))
             return
         else:
             return []
 
-    handler = logging_handlers.QueueHandler(logging_queue)
-    logger = logging.getLogger("{0}:{1}-{2}".format(
-        slocus.chrom, slocus.start, slocus.end))
-    logger.addHandler(handler)
-
-    # We need to set this to the lowest possible level,
-    # otherwise we overwrite the global configuration
-    logger.setLevel(json_conf["log_settings"]["log_level"])
-    logger.propagate = False
+    if logger is None:
+        logger = _queue_logger(logging_queue, json_conf["log_settings"]["log_level"])
+    logger = LocusAdapter(logger, "{0}:{1}-{2}".format(slocus.chrom, slocus.start, slocus.end))
     logger.debug("Started with %s, counter %d",
                  slocus.id, counter)
     if slocus.stranded is True:
@@ -396,14 +488,17 @@ def analyse_locus(slocus: Superlocus,
     slocus.logger = logger
     slocus.source = json_conf["pick"]["output_format"]["source"]
 
+    start = time.perf_counter()
     try:
         slocus.load_all_transcript_data(engine=engine,
-                                        data_dict=data_dict)
+                                        data_dict=data_dict,
+                                        junction_cache=junction_cache)
     except KeyboardInterrupt:
         raise
     except Exception as exc:
         logger.error("Error while loading data for %s", slocus.id)
         logger.exception(exc)
+    slocus.timings["loading"] += time.perf_counter() - start
     logger.debug("Loading transcript data for %s", slocus.id)
 
     # Load the CDS information if necessary
@@ -415,8 +510,6 @@ def analyse_locus(slocus: Superlocus,
             slocus.id)
         # printer_dict[counter] = []
         if printer_queue:
-            while printer_queue.qsize >= json_conf["pick"]["run_options"]["procs"] * 10:
-                continue
             # printer_queue.put_nowait(([], counter))
             return
         else:
@@ -453,28 +546,23 @@ def analyse_locus(slocus: Superlocus,
             loci_to_check[locus_instance.monoexonic].add(locus_instance)
 
     # Check if any locus is a fragment, if so, tag/remove it
+    start = time.perf_counter()
     stranded_loci = sorted(list(remove_fragments(stranded_loci, json_conf, logger)))
-    try:
-        logger.debug("Size of the loci to send: {0}, for {1} loci".format(
-            sys.getsizeof(stranded_loci),
-            len(stranded_loci)))
-    except Exception as err:
-        logger.error(err)
-        pass
+    slocus.timings["fragments"] += time.perf_counter() - start
+    if logger.isEnabledFor(logging.DEBUG):
+        try:
+            logger.debug("Size of the loci to send: %d, for %d loci",
+                         sys.getsizeof(stranded_loci),
+                         len(stranded_loci))
+        except Exception as err:
+            logger.error(err)
     # printer_dict[counter] = stranded_loci
+    logger.debug("Finished with %s, counter %d", slocus.id, counter)
     if printer_queue:
-        while printer_queue.qsize() >= json_conf["pick"]["run_options"]["procs"] * 10:
-            continue
         # printer_queue.put_nowait((stranded_loci, counter))
         # printer_queue.put((stranded_loci, counter))
-        logger.debug("Finished with %s, counter %d", slocus.id, counter)
-        logger.removeHandler(handler)
-        handler.close()
         return
     else:
-        logger.debug("Finished with %s, counter %d", slocus.id, counter)
-        logger.removeHandler(handler)
-        handler.close()
         return stranded_loci
 
 
@@ -490,7 +578,8 @@ class LociProcesser(Process):
                  locus_queue,
                  logging_queue,
                  identifier,
-                 tempdir="mikado_pick_tmp"
+                 tempdir="mikado_pick_tmp",
+                 done=None
                  ):
 
         # current_counter, gene_counter, current_chrom = shared_values
@@ -505,6 +594,10 @@ class LociProcesser(Process):
         self.logger.setLevel(self.json_conf["log_settings"]["log_level"])
         self.logger.propagate = False
         self._tempdir = tempdir
+        self._input_handle = None
+        # Counters of the superloci completed by a previous, interrupted run
+        self._done = done if done is not None else set()
+        self._journal = None
 
         self.__data_dict = data_dict
         self.locus_queue = locus_queue
@@ -526,6 +619,7 @@ class LociProcesser(Process):
                 self.exitcode = 9
                 self.join()
 
+        self.timings_out = None
         self._create_handles(self.__output_files)
         self.__gene_counter = 0
         assert self.locus_out is not None
@@ -535,8 +629,9 @@ class LociProcesser(Process):
         try:
             if self.json_conf["pick"]["run_options"]["preload"] is False:
                 self.engine = dbutils.connect(self.json_conf, self.logger)
+                self.junction_cache = JunctionCache(self.engine)
             else:
-                self.engine = None
+                self.engine = self.junction_cache = None
         except KeyboardInterrupt:
             raise
         except EOFError:
@@ -549,7 +644,9 @@ class LociProcesser(Process):
                                                json_conf=self.json_conf,
                                                data_dict=self.__data_dict,
                                                engine=self.engine,
-                                               logging_queue=self.logging_queue)
+                                               junction_cache=self.junction_cache,
+                                               logging_queue=self.logging_queue,
+                                               logger=self.logger)
 
     @property
     def identifier(self):
@@ -565,10 +662,13 @@ class LociProcesser(Process):
 
         for name in ["locus_metrics", "locus_scores", "locus_out",
                      "sub_metrics", "sub_scores", "sub_out",
-                     "mono_metrics", "mono_scores", "mono_out"]:
+                     "mono_metrics", "mono_scores", "mono_out", "timings_out"]:
             state[name] = None
         state["engine"] = None
+        state["junction_cache"] = None
         state["analyse_locus"] = None
+        state["_input_handle"] = None
+        state["_journal"] = None
         del state["handler"]
         del state["logger"]
         return state
@@ -585,14 +685,17 @@ class LociProcesser(Process):
         self._create_handles(self.__output_files)
         if self.json_conf["pick"]["run_options"]["preload"] is False:
             self.engine = dbutils.connect(self.json_conf, self.logger)
+            self.junction_cache = JunctionCache(self.engine)
         else:
-            self.engine = None
+            self.engine = self.junction_cache = None
         self.analyse_locus = functools.partial(analyse_locus,
                                                printer_queue=None,
                                                json_conf=self.json_conf,
                                                data_dict=self.__data_dict,
                                                engine=self.engine,
-                                               logging_queue=self.logging_queue)
+                                               junction_cache=self.junction_cache,
+                                               logging_queue=self.logging_queue,
+                                               logger=self.logger)
 
     def _create_handles(self, handles):
 
@@ -677,6 +780,23 @@ class LociProcesser(Process):
             self.mono_out = open(mono_out_file, "w")
             self._handles.extend([self.mono_metrics, self.mono_scores, self.mono_out])            
 
+        if self.json_conf["pick"]["files"]["timings_out"]:
+            self.timings_out = open(os.path.join(
+                self._tempdir,
+                "{0}-{1}".format(os.path.basename(self.json_conf["pick"]["files"]["timings_out"]),
+                                 self.identifier)), "w")
+            self._handles.append(self.timings_out)
+
+        if self.json_conf["pick"]["run_options"]["checkpoint"] is True:
+            partials = [self.locus_metrics.handle, self.locus_scores.handle, self.locus_out]
+            if self.sub_out is not None:
+                partials.extend([self.sub_metrics.handle, self.sub_scores.handle, self.sub_out])
+            if self.mono_out is not None:
+                partials.extend([self.mono_metrics.handle, self.mono_scores.handle, self.mono_out])
+            if self.timings_out is not None:
+                partials.append(self.timings_out)
+            self._journal = Journal(self._tempdir, self.identifier, partials)
+
         return
 
     def run(self):
@@ -699,20 +819,60 @@ class LociProcesser(Process):
                     self.sub_out.close()
                 if self.mono_out is not None:
                     self.mono_out.close()
+                if self._input_handle is not None:
+                    self._input_handle.close()
+                if self.timings_out is not None:
+                    self.timings_out.close()
+                if self._journal is not None:
+                    self._journal.close()
 
                 return
+            elif isinstance(slocus, Shard):
+                self.logger.debug("Analysing region %d-%d of the input for %s",
+                                  slocus.start, slocus.end, self.name)
+                if self._input_handle is None:
+                    self._input_handle = open(self.json_conf["pick"]["files"]["input"], "rb")
+                for shard_locus, shard_counter in parse_shard(self._input_handle,
+                                                              slocus,
+                                                              self.json_conf,
+                                                              self.logger):
+                    if shard_counter in self._done:
+                        continue
+                    current_chrom = self._analyse_and_print(shard_locus, shard_counter,
+                                                            current_chrom)
+            elif isinstance(slocus, PackedSuperlocus):
+                slocus = unpack_superlocus(slocus, self.json_conf)
+                current_chrom = self._analyse_and_print(slocus, counter, current_chrom)
             else:
-                if slocus is not None:
-                    if current_chrom != slocus.chrom:
-                        self.__gene_counter = 0
-                        current_chrom = slocus.chrom
-                    if self.regressor is not None:
-                        slocus.regressor = self.regressor
-                    stranded_loci = self.analyse_locus(slocus, counter)
-                else:
-                    stranded_loci = []
-                for stranded_locus in stranded_loci:
-                    self._print_locus(stranded_locus, counter)
+                current_chrom = self._analyse_and_print(slocus, counter, current_chrom)
+
+    def _analyse_and_print(self, slocus, counter, current_chrom):
+
+        """
+        Private method to analyse a superlocus and print out the results.
+        :param slocus: the superlocus to analyse
+        :param counter: the counter of the superlocus
+        :param current_chrom: the chromosome of the previous superlocus
+        :return: the chromosome of the current superlocus
+        """
+
+        if slocus is not None:
+            if current_chrom != slocus.chrom:
+                self.__gene_counter = 0
+                current_chrom = slocus.chrom
+            if self.regressor is not None:
+                slocus.regressor = self.regressor
+            stranded_loci = self.analyse_locus(slocus, counter)
+            if self.timings_out is not None:
+                row = superlocus_timings(slocus, stranded_loci, counter)
+                print(*[row[key] for key in TIMING_FIELDS], sep="\t", file=self.timings_out)
+        else:
+            stranded_loci = []
+        for stranded_locus in stranded_loci:
+            self._print_locus(stranded_locus, counter)
+        if self._journal is not None and slocus is not None:
+            self._journal.record(counter)
+        return current_chrom
 
     def _print_locus(self, stranded_locus, counter):
 
@@ -0,0 +1,72 @@
+# coding: utf-8
+
+"""
+This module contains the queue used by Mikado pick to send the superloci from the
+parsing process to the LociProcesser workers. The queue is bounded both by the number of
+superloci and by the number of transcripts they contain, so that the parser blocks,
+instead of buffering the input in memory, when the workers are slower than it.
+"""
+
+import multiprocessing
+
+__author__ = 'Luca Venturini'
+
+
+class LocusQueue:
+
+    """
+    Bounded multiprocessing queue with backpressure on the number of queued transcripts.
+    Each item is submitted together with its volume (the number of transcripts);
+    put() blocks while the queue is full, or while adding the item would bring the queued
+    volume above the maximum. An item larger than the maximum volume is accepted
+    as soon as the queue is otherwise empty, so that it can never block the submission forever.
+    """
+
+    def __init__(self, maxsize=0, max_volume=0):
+
+        """
+        :param maxsize: maximum number of items in the queue. 0 means unbounded.
+        :type maxsize: int
+
+        :param max_volume: maximum total volume of the items in the queue. 0 means unbounded.
+        :type max_volume: int
+        """
+
+        self.max_volume = max_volume
+        self.__queue = multiprocessing.Queue(maxsize)
+        self.__volume = multiprocessing.RawValue("l", 0)
+        self.__condition = multiprocessing.Condition()
+
+    @property
+    def volume(self):
+        """The total volume of the items currently in the queue."""
+        return self.__volume.value
+
+    def put(self, item, volume=0):
+
+        """
+        Method to put an item in the queue, blocking until there is space for it.
+        :param item: the item to submit.
+        :param volume: the volume of the item.
+        :type volume: int
+        """
+
+        if self.max_volume > 0 and volume > 0:
+            with self.__condition:
+                while 0 < self.__volume.value and self.__volume.value + volume > self.max_volume:
+                    self.__condition.wait()
+                self.__volume.value += volume
+        self.__queue.put((item, volume))
+
+    def get(self):
+
+        """
+        Method to retrieve an item from the queue, blocking until one is available.
+        """
+
+        item, volume = self.__queue.get()
+        if self.max_volume > 0 and volume > 0:
+            with self.__condition:
+                self.__volume.value -= volume
+                self.__condition.notify_all()
+        return item
@@ -0,0 +1,179 @@
+# coding: utf-8
+
+"""
+This module contains the functions used by Mikado pick to send the superloci
+from the parsing process to the LociProcesser workers in a compact form.
+Instead of pickling the whole Superlocus - with its transcripts, their loggers,
+the configuration and all the derived sets of exons, introns and splices -
+only the minimal data needed to rebuild the transcripts is sent: a table of
+the strings (chromosomes, IDs, attributes), a small tuple per transcript and
+a flat array with the coordinates of the exons and ORF segments.
+The workers then rebuild the Superlocus with their own copy of the configuration.
+"""
+
+import array
+import collections
+from ..loci.superlocus import Superlocus, Transcript
+
+__author__ = 'Luca Venturini'
+
+
+PackedSuperlocus = collections.namedtuple("PackedSuperlocus",
+                                          ["strings", "transcripts", "coordinates"])
+
+# Number of integers used to store each ORF segment: type, start, end and phase.
+_SEGMENT_SIZE = 4
+
+
+class _StringTable:
+
+    """
+    Private class to intern the strings of a superlocus into a list, so that
+    each string is sent only once and referenced by its index everywhere else.
+    """
+
+    def __init__(self):
+        self.strings = []
+        self.__indices = dict()
+
+    def __getitem__(self, string):
+        try:
+            return self.__indices[string]
+        except KeyError:
+            self.__indices[string] = len(self.strings)
+            self.strings.append(string)
+            return self.__indices[string]
+
+
+def pack_superlocus(superlocus):
+
+    """
+    This function converts an unanalysed superlocus into its compact representation.
+
+    :param superlocus: the superlocus to pack.
+    :type superlocus: Superlocus
+
+    :returns: the compact representation of the superlocus.
+    :rtype: PackedSuperlocus
+    """
+
+    table = _StringTable()
+    coordinates = array.array("l")
+    transcripts = []
+
+    for tid in superlocus.transcripts:
+        transcript = superlocus.transcripts[tid]
+        transcript.finalize()
+        attributes = []
+        for key, value in transcript.attributes.items():
+            if isinstance(value, str):
+                attributes.append((table[key], table[value], None))
+            else:
+                attributes.append((table[key], -1, value))
+
+        for exon in transcript.exons:
+            coordinates.extend((exon[0], exon[1]))
+
+        orfs = []
+        for orf in transcript.internal_orfs:
+            orfs.append(len(orf))
+            for segment in orf:
+                if segment[0] == "CDS":
+                    phase = segment[2]
+                else:
+                    phase = -1
+                coordinates.extend((table[segment[0]], segment[1][0], segment[1][1], phase))
+
+        transcripts.append((table[transcript.chrom],
+                            table[transcript.source],
+                            table[transcript.feature],
+                            table[transcript.id],
+                            tuple(table[_] for _ in transcript.parent),
+                            transcript.start,
+                            transcript.end,
+                            transcript.strand,
+                            transcript.score,
+                            tuple(attributes),
+                            len(transcript.exons),
+                            tuple(orfs),
+                            transcript.selected_internal_orf_index,
+                            transcript.has_start_codon,
+                            transcript.has_stop_codon))
+
+    return PackedSuperlocus(tuple(table.strings), tuple(transcripts), coordinates)
+
+
+def unpack_superlocus(packed, json_conf, logger=None):
+
+    """
+    This function rebuilds a superlocus from its compact representation.
+
+    :param packed: the compact representation of the superlocus.
+    :type packed: PackedSuperlocus
+
+    :param json_conf: the configuration dictionary.
+    :type json_conf: dict
+
+    :param logger: optional logger for the superlocus.
+
+    :returns: the rebuilt superlocus.
+    :rtype: Superlocus
+    """
+
+    strings, coordinates = packed.strings, packed.coordinates
+    intron_range = json_conf["pick"]["run_options"]["intron_range"]
+    position = 0
+    superlocus = None
+
+    for (chrom, source, feature, tid, parent, start, end, strand, score, attributes,
+         exon_number, orfs, selected_orf, has_start_codon, has_stop_codon) in packed.transcripts:
+
+        state = {"chrom": strings[chrom],
+                 "source": strings[source],
+                 "id": strings[tid],
+                 "parent": [strings[_] for _ in parent],
+                 "start": start,
+                 "end": end,
+                 "strand": strand,
+                 "score": score,
+                 "attributes": dict(),
+                 "exons": [],
+                 "orfs": dict(),
+                 "selected_orf": selected_orf}
+
+        for key, value, raw in attributes:
+            state["attributes"][strings[key]] = strings[value] if value >= 0 else raw
+
+        for _ in range(exon_number):
+            state["exons"].append((coordinates[position], coordinates[position + 1]))
+            position += 2
+
+        for index, segment_number in enumerate(orfs):
+            orf = []
+            for _ in range(segment_number):
+                segment_type, seg_start, seg_end, phase = coordinates[position:position + _SEGMENT_SIZE]
+                position += _SEGMENT_SIZE
+                if phase >= 0:
+                    orf.append([strings[segment_type], (seg_start, seg_end), phase])
+                else:
+                    orf.append([strings[segment_type], (seg_start, seg_end)])
+            # Zero-padded keys, as load_dict retrieves the ORFs in sorted order
+            state["orfs"]["{:06d}".format(index)] = orf
+
+        transcript = Transcript(intron_range=intron_range)
+        transcript.feature = strings[feature]
+        transcript.scores = dict()
+        transcript.has_start_codon = has_start_codon
+        transcript.has_stop_codon = has_stop_codon
+        transcript.load_dict(state)
+
+        if superlocus is None:
+            superlocus = Superlocus(transcript,
+                                    stranded=False,
+                                    json_conf=json_conf,
+                                    source=json_conf["pick"]["output_format"]["source"],
+                                    logger=logger)
+        else:
+            superlocus.add_transcript_to_locus(transcript, check_in_locus=False)
+
+    return superlocus
@@ -11,6 +11,7 @@ import csv
 import os
 import shutil
 import tempfile
+import time
 import logging
 from logging import handlers as logging_handlers
 import collections
@@ -27,15 +28,40 @@ from ..parsers.GTF import GTF
 from ..parsers.GFF import GFF3
 from ..serializers.blast_serializer import Hit, Query
 from ..serializers.junction import Junction, Chrom
-from ..serializers.orf import Orf
 from ..loci.superlocus import Superlocus, Transcript
 from ..configuration.configurator import to_json  # Necessary for nosetests
 from ..utilities import dbutils, merge_partial
 from ..exceptions import UnsortedInput, InvalidJson, InvalidTranscript
 from .loci_processer import analyse_locus, LociProcesser, merge_loci
+from .shards import find_split_points
+from .packing import pack_superlocus
+from .shared_store import SharedStore, OrfState, write_store
+from .locus_queue import LocusQueue
+from .timings import superlocus_timings, merge_timings, SlowLociReport, TIMING_FIELDS
+from .checkpoint import Checkpoint, CheckpointError, CHECKPOINT_DIR
+from .junction_cache import JunctionCache
 import multiprocessing.managers
 from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
 import pickle
+import hashlib
+import json
+
+
+# Options of pick which do not change the loci, and can therefore differ when resuming a run
+_EXECUTION_OPTIONS = ("checkpoint", "resume", "procs", "single_thread", "preload", "shm", "shm_db",
+                      "queue_size", "queue_transcripts", "giant_locus_procs", "shards")
+
+
+def _section_hash(section):
+
+    """
+    Private function to calculate a stable digest of a section of the configuration.
+    :param section: the section of the configuration.
+    :type section: dict
+    :rtype: str
+    """
+
+    return hashlib.md5(json.dumps(section, sort_keys=True, default=repr).encode()).hexdigest()
 
 
 # pylint: disable=too-many-instance-attributes
@@ -101,6 +127,14 @@ class Picker:
         self.locus_out = path_join(
             self.json_conf["pick"]["files"]["output_dir"],
             self.json_conf["pick"]["files"]["loci_out"])
+        if self.json_conf["pick"]["files"]["timings_out"]:
+            self.timings_out = path_join(
+                self.json_conf["pick"]["files"]["output_dir"],
+                self.json_conf["pick"]["files"]["timings_out"])
+        else:
+            self.timings_out = ""
+        self._timings_handle = None
+        self._slow_loci = SlowLociReport(self.json_conf["pick"]["run_options"]["timings_top"])
         # pylint: disable=no-member
         multiprocessing.set_start_method(self.json_conf["multiprocessing_method"],
                                          force=True)
@@ -150,10 +184,15 @@ class Picker:
         elif self.json_conf["pick"]["run_options"]["procs"] == 1:
             self.json_conf["pick"]["run_options"]["single_thread"] = True
 
-        if self.json_conf["pick"]["run_options"]["preload"] is True and self.procs > 1:
-            self.logger.warning(
-                "Preloading using multiple threads can be extremely \
-memory intensive, proceed with caution!")
+        if self.json_conf["pick"]["run_options"]["resume"] is True:
+            self.json_conf["pick"]["run_options"]["checkpoint"] = True
+        if (self.json_conf["pick"]["run_options"]["checkpoint"] is True and
+                self.json_conf["pick"]["run_options"]["single_thread"] is True):
+            self.main_logger.warning(
+                "Checkpointing is available only when using multiple processes, disabling it")
+            self.json_conf["pick"]["run_options"]["checkpoint"] = False
+            self.json_conf["pick"]["run_options"]["resume"] = False
+        self._done = set()
 
         if self.locus_out is None:
             raise InvalidJson(
@@ -636,17 +675,16 @@ memory intensive, proceed with caution!")
 
     def preload(self):
         """
-        This method preloads the data from the DB into a dictionary ("data_dict").
+        This method preloads the data from the DB into a read-only store ("data_dict"),
+        which is then memory-mapped by all the processes analysing the loci.
         The information on what to extract and how to connect to the
         DB is retrieved from the json_conf dictionary.
         :return: data_dict
-        :rtype: dict
+        :rtype: SharedStore
         """
 
         self.main_logger.info("Starting to preload the database into memory")
 
-        # data_dict = self.manager.dict(lock=False)
-        data_dict = dict()
         engine = create_engine("{0}://".format(self.json_conf["db_settings"]["dbtype"]),
                                creator=self.db_connection)
         session = sqlalchemy.orm.sessionmaker(bind=engine)()
@@ -656,58 +694,60 @@ memory intensive, proceed with caution!")
             key = (junc.chrom, junc.junction_start, junc.junction_end)
             assert key not in junc_dict
             junc_dict[key] = junc.strand
-        data_dict["junctions"] = junc_dict
-
-        # data_dict["junctions"] = self.manager.dict(data_dict["junctions"], lock=False)
 
         self.main_logger.info("%d junctions loaded",
-                              len(data_dict["junctions"]))
+                              len(junc_dict))
         self.main_logger.debug("Example junctions:\n{0}".format(
             "\n".join(str(junc) for junc in list(
-                data_dict["junctions"])[:min(10, len(data_dict["junctions"]))])))
+                junc_dict)[:min(10, len(junc_dict))])))
 
         queries = dict((que.query_id, que) for que in engine.execute("select * from query"))
 
-        # Then load ORFs
+        # Then load ORFs. Only the fields needed to create the BED12 objects are kept;
+        # the objects are created by the store when the ORFs are requested.
         orf_dict = collections.defaultdict(list)
 
         for orf in engine.execute("select * from orf"):
 
             query_name = queries[orf.query_id].query_name
-            orf_dict[query_name].append(
-                Orf.as_bed12_static(orf, query_name)
-            )
+            orf_dict[query_name].append(tuple(getattr(orf, _) for _ in OrfState._fields))
 
-        data_dict["orfs"] = orf_dict
-        assert len(data_dict["orfs"]) == engine.execute(
+        assert len(orf_dict) == engine.execute(
             "select count(distinct(query_id)) from orf").fetchone()[0]
 
-        # data_dict['orf'] = self.manager.dict(orfs, lock=False)
-
         self.main_logger.info("%d ORFs loaded",
-                              len(data_dict["orfs"]))
+                              len(orf_dict))
         self.main_logger.debug(",".join(
-            list(data_dict["orfs"].keys())[:10]
+            list(orf_dict.keys())[:10]
         ))
 
         # Finally load BLAST
 
         # if self.json_conf["pick"]["chimera_split"]["execute"] is True and \
         #         self.json_conf["pick"]["chimera_split"]["blast_check"] is True:
-        data_dict["hits"] = self.__preload_blast(engine, queries)
+        hits_dict = self.__preload_blast(engine, queries)
         # else:
         #     data_dict["hits"] = dict()
         #     self.main_logger.info("Skipping BLAST loading")
 
-        self.main_logger.info("Finished to preload the database into memory")
+        handle, store_name = tempfile.mkstemp(prefix="mikado_preload",
+                                              suffix=".store",
+                                              dir=self.json_conf["pick"]["files"]["output_dir"])
+        os.close(handle)
+        write_store(store_name, {"junctions": (junc_dict, None),
+                                 "orfs": (orf_dict, "orfs"),
+                                 "hits": (hits_dict, None)})
+        data_dict = SharedStore(store_name)
+        self.main_logger.info("Finished to preload the database into %s", store_name)
         return data_dict
 
-    def _submit_locus(self, slocus, counter, data_dict=None, engine=None):
+    def _submit_locus(self, slocus, counter, data_dict=None, engine=None, junction_cache=None):
         """
         Private method to submit / start the analysis of a superlocus in input.
         :param slocus: the locus to analyse.
         :param data_dict: the preloaded data in memory
         :param engine: connection engine
+        :param junction_cache: the cache of the junctions, used when the data is not preloaded
         :return: job object / None
         """
 
@@ -718,8 +758,11 @@ memory intensive, proceed with caution!")
             
         self.logger.debug("Loading data for %s", slocus.id)
         slocus.logger = self.logger
+        start = time.perf_counter()
         slocus.load_all_transcript_data(engine=engine,
-                                        data_dict=data_dict)
+                                        data_dict=data_dict,
+                                        junction_cache=junction_cache)
+        slocus.timings["loading"] += time.perf_counter() - start
         # slocus_id = slocus.id
         if slocus.initialized is False:
             # This happens when we have removed all transcripts from the locus
@@ -730,13 +773,19 @@ memory intensive, proceed with caution!")
             # Exit
             return []
 
-        return analyse_locus(slocus=slocus,
-                             counter=counter,
-                             json_conf=self.json_conf,
-                             printer_queue=None,
-                             logging_queue=self.logging_queue,
-                             data_dict=None,
-                             engine=None)
+        stranded_loci = analyse_locus(slocus=slocus,
+                                      counter=counter,
+                                      json_conf=self.json_conf,
+                                      printer_queue=None,
+                                      logging_queue=self.logging_queue,
+                                      data_dict=None,
+                                      engine=None,
+                                      logger=self.queue_logger)
+        if self._timings_handle is not None:
+            row = superlocus_timings(slocus, stranded_loci, counter)
+            print(*[row[key] for key in TIMING_FIELDS], sep="\t", file=self._timings_handle)
+            self._slow_loci.add(row)
+        return stranded_loci
 
     def __unsorted_interrupt(self, row, current_transcript):
         """
@@ -803,10 +852,20 @@ memory intensive, proceed with caution!")
         intron_range = self.json_conf["pick"]["run_options"]["intron_range"]
         self.logger.info("Intron range: %s", intron_range)
 
-        current_locus = None
-        current_transcript = None
-
-        locus_queue = multiprocessing.Queue(-1)
+        run_options = self.json_conf["pick"]["run_options"]
+        queue_size = run_options["queue_size"] or 10 * self.procs
+        queue_transcripts = run_options["queue_transcripts"] or 1000 * self.procs
+        locus_queue = LocusQueue(maxsize=queue_size, max_volume=queue_transcripts)
+        use_shards = run_options["shards"] > 0 and self.input_file.endswith(".gtf")
+        # When sharding, the superloci are created directly by the workers, so no routing is possible
+        if (use_shards is False and run_options["giant_locus_size"] > 0 and
+                run_options["giant_locus_procs"] > 0):
+            giant_queue = LocusQueue(maxsize=2 * run_options["giant_locus_procs"],
+                                     max_volume=queue_transcripts)
+            giant_procs = run_options["giant_locus_procs"]
+        else:
+            giant_queue, giant_procs = None, 0
+        workers = self.procs + giant_procs
 
         handles = list(self.__get_output_files())
         [_.close() for _ in handles[0]]
@@ -819,25 +878,183 @@ memory intensive, proceed with caution!")
             [_.close() for _ in handles[2]]
             handles[2] = [_.name for _ in handles[2]]
 
-        tempdir = tempfile.TemporaryDirectory(suffix="",
-                                              prefix="mikado_pick_tmp",
-                                              dir=self.json_conf["pick"]["files"]["output_dir"])
+        if run_options["checkpoint"] is True:
+            tempdir = Checkpoint(os.path.join(self.json_conf["pick"]["files"]["output_dir"],
+                                              CHECKPOINT_DIR),
+                                 self.__checkpoint_fingerprint(use_shards),
+                                 resume=run_options["resume"],
+                                 logger=self.main_logger)
+            self._done = tempdir.done
+            first_worker = tempdir.previous_workers + 1
+        else:
+            tempdir = tempfile.TemporaryDirectory(suffix="",
+                                                  prefix="mikado_pick_tmp",
+                                                  dir=self.json_conf["pick"]["files"]["output_dir"])
+            first_worker = 1
 
         self.logger.info("Creating the worker processes")
+        # Workers are numbered after those of any previous run, whose partial files are kept
         working_processes = [LociProcesser(self.json_conf,
                                            data_dict,
                                            handles,
-                                           locus_queue,
+                                           locus_queue if _ - first_worker < self.procs else giant_queue,
                                            self.logging_queue,
                                            _,
-                                           tempdir.name)
-                             for _ in range(1, self.procs+1)]
+                                           tempdir.name,
+                                           done=self._done)
+                             for _ in range(first_worker, first_worker + workers)]
+        if run_options["checkpoint"] is True:
+            workers = tempdir.register_workers(workers)
         # Start all processes
         [_.start() for _ in working_processes]
-        self.logger.info("Started all %d workers", self.procs)
+        self.logger.info("Started all %d workers", len(working_processes))
+        if giant_procs > 0:
+            self.logger.info("%d of the workers are dedicated to superloci with at least %d transcripts",
+                             giant_procs, run_options["giant_locus_size"])
         # No sense in keeping this data available on the main thread now
         del data_dict
 
+        if use_shards is True:
+            self.__submit_shards(locus_queue)
+        else:
+            if self.json_conf["pick"]["run_options"]["shards"] > 0:
+                self.logger.warning(
+                    "Sharded parsing is available only for uncompressed GTF files, disabling it for %s",
+                    self.input_file)
+            self.__submit_loci(locus_queue, giant_queue)
+
+        locus_queue.put(("EXIT", float("inf")))
+        if giant_queue is not None:
+            giant_queue.put(("EXIT", float("inf")))
+        self.logger.info("Joining children processes")
+        [_.join() for _ in working_processes]
+        self.logger.info("Joined children processes; starting to merge partial files")
+
+        # Merge loci
+        merge_loci(workers,
+                   handles[0],
+                   prefix=self.json_conf["pick"]["output_format"]["id_prefix"],
+                   tempdir=tempdir.name)
+
+        for handle in handles[1]:
+            if handle is not None:
+                with open(handle, "a") as output:
+                    partials = [os.path.join(tempdir.name,
+                                             "{0}-{1}".format(os.path.basename(handle), _))
+                                for _ in range(1, workers + 1)]
+                    merge_partial(partials, output)
+                    # [os.remove(_) for _ in partials]
+
+        for handle in handles[2]:
+            if handle is not None:
+                with open(handle, "a") as output:
+                    partials = [os.path.join(tempdir.name,
+                                             "{0}-{1}".format(os.path.basename(handle), _))
+                                for _ in range(1, workers + 1)]
+                    merge_partial(partials, output)
+                    # [os.remove(_) for _ in partials]
+
+        if self.timings_out:
+            merge_timings([os.path.join(tempdir.name,
+                                        "{0}-{1}".format(os.path.basename(self.timings_out), _))
+                           for _ in range(1, workers + 1)],
+                          self.timings_out,
+                          report=self._slow_loci)
+            self._slow_loci.log(self.main_logger)
+
+        self.logger.info("Finished merging partial files")
+        try:
+            tempdir.cleanup()
+        except (OSError, FileNotFoundError, FileExistsError) as exc:
+            self.logger.warning("Failed to clean up the temporary directory %s, error: %s",
+                                tempdir.name, exc)
+        except KeyboardInterrupt:
+            raise
+        except Exception as exc:
+            self.logger.exception("Failed to clean up the temporary directory %s, error: %s", exc)
+        finally:
+            return
+
+    def __checkpoint_fingerprint(self, use_shards):
+
+        """
+        Private method to describe the input and the options that determine the counters
+        and the content of the partial files, so that a checkpoint is resumed only by a compatible run.
+        :param use_shards: whether the input is being split into shards, which changes the counters.
+        :type use_shards: bool
+        :rtype: dict
+        """
+
+        stat = os.stat(self.input_file)
+        # The files are described separately, and the options which only change how the run
+        # is executed can differ when resuming
+        pick = dict((key, value) for key, value in self.json_conf["pick"].items()
+                    if key not in ("run_options", "files"))
+        pick["run_options"] = dict((key, value) for key, value in self.json_conf["pick"]["run_options"].items()
+                                   if key not in _EXECUTION_OPTIONS)
+        scoring = dict((key, self.json_conf.get(key)) for key in ("scoring", "requirements", "not_fragmentary"))
+        return {"input": os.path.abspath(self.input_file),
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "shards": use_shards,
+                "flank": self.json_conf["pick"]["run_options"]["flank"],
+                "outputs": [os.path.basename(_) for _ in (self.locus_out, self.sub_out,
+                                                          self.monolocus_out, self.timings_out)],
+                "pick": _section_hash(pick),
+                "scoring": _section_hash(scoring)}
+
+    def __submit_shards(self, locus_queue):
+
+        """
+        Private method to split the input file into independent regions, which are then
+        parsed and analysed directly by the worker processes.
+        :param locus_queue: the queue to which the regions will be sent.
+        """
+
+        shards = find_split_points(self.input_file,
+                                   flank=self.json_conf["pick"]["run_options"]["flank"],
+                                   shards=self.json_conf["pick"]["run_options"]["shards"])
+        self.logger.info("Split %s into %d regions", self.input_file, len(shards))
+        for shard in shards:
+            self.logger.debug("Submitting region %d-%d", shard.start, shard.end)
+            locus_queue.put((shard, None))
+
+    def __send_locus(self, current_locus, counter, locus_queue, giant_queue=None):
+
+        """
+        Private method to send a superlocus to the worker processes, in its packed form.
+        Superloci with at least "giant_locus_size" transcripts are sent to the dedicated queue,
+        if present.
+        :param current_locus: the superlocus to send.
+        :param counter: the counter of the superlocus.
+        :param locus_queue: the queue for the superloci.
+        :type locus_queue: LocusQueue
+        :param giant_queue: the optional queue for the largest superloci.
+        :type giant_queue: (LocusQueue|None)
+        """
+
+        if counter in self._done:
+            self.logger.debug("Skipping %s, already analysed in a previous run", current_locus.id)
+            return
+        volume = len(current_locus.transcripts)
+        if giant_queue is not None and volume >= self.json_conf["pick"]["run_options"]["giant_locus_size"]:
+            self.logger.debug("Sending %s (%d transcripts) to the dedicated workers",
+                              current_locus.id, volume)
+            locus_queue = giant_queue
+        locus_queue.put((pack_superlocus(current_locus), counter), volume=volume)
+
+    def __submit_loci(self, locus_queue, giant_queue=None):
+
+        """
+        Private method to parse the input file and send each superlocus to the worker processes.
+        :param locus_queue: the queue to which the superloci will be sent.
+        :param giant_queue: optional queue for the largest superloci, served by dedicated workers.
+        """
+
+        intron_range = self.json_conf["pick"]["run_options"]["intron_range"]
+        current_locus = None
+        current_transcript = None
+
         counter = 0
         invalid = False
         for row in self.define_input():
@@ -863,7 +1080,7 @@ memory intensive, proceed with caution!")
                             counter += 1
                             self.logger.debug("Submitting locus # %d (%s)", counter,
                                               None if not current_locus else current_locus.id)
-                            locus_queue.put((current_locus, counter))
+                            self.__send_locus(current_locus, counter, locus_queue, giant_queue)
                         current_locus = Superlocus(
                             current_transcript,
                             stranded=False,
@@ -892,7 +1109,7 @@ memory intensive, proceed with caution!")
                     counter += 1
                     self.logger.debug("Submitting locus #%d (%s)", counter,
                                       None if not current_locus else current_locus.id)
-                    locus_queue.put((current_locus, counter))
+                    self.__send_locus(current_locus, counter, locus_queue, giant_queue)
 
                 current_locus = Superlocus(
                     current_transcript,
@@ -905,55 +1122,14 @@ memory intensive, proceed with caution!")
             counter += 1
             self.logger.debug("Submitting locus #%d (%s)", counter,
                               None if not current_locus else current_locus.id)
-            locus_queue.put((current_locus, counter))
+            self.__send_locus(current_locus, counter, locus_queue, giant_queue)
 
         self.logger.info("Finished chromosome %s", current_locus.chrom)
 
         counter += 1
-        locus_queue.put((current_locus, counter))
+        self.__send_locus(current_locus, counter, locus_queue, giant_queue)
         self.logger.debug("Submitting locus %s, counter %d",
                           current_locus.id, counter)
-        locus_queue.put(("EXIT", float("inf")))
-        self.logger.info("Joining children processes")
-        [_.join() for _ in working_processes]
-        self.logger.info("Joined children processes; starting to merge partial files")
-
-        # Merge loci
-        merge_loci(self.procs,
-                   handles[0],
-                   prefix=self.json_conf["pick"]["output_format"]["id_prefix"],
-                   tempdir=tempdir.name)
-
-        for handle in handles[1]:
-            if handle is not None:
-                with open(handle, "a") as output:
-                    partials = [os.path.join(tempdir.name,
-                                             "{0}-{1}".format(os.path.basename(handle), _))
-                                for _ in range(1, self.procs + 1)]
-                    merge_partial(partials, output)
-                    # [os.remove(_) for _ in partials]
-
-        for handle in handles[2]:
-            if handle is not None:
-                with open(handle, "a") as output:
-                    partials = [os.path.join(tempdir.name,
-                                             "{0}-{1}".format(os.path.basename(handle), _))
-                                for _ in range(1, self.procs + 1)]
-                    merge_partial(partials, output)
-                    # [os.remove(_) for _ in partials]
-
-        self.logger.info("Finished merging partial files")
-        try:
-            tempdir.cleanup()
-        except (OSError, FileNotFoundError, FileExistsError) as exc:
-            self.logger.warning("Failed to clean up the temporary directory %s, error: %s",
-                                tempdir.name, exc)
-        except KeyboardInterrupt:
-            raise
-        except Exception as exc:
-            self.logger.exception("Failed to clean up the temporary directory %s, error: %s", exc)
-        finally:
-            return
 
     def __submit_single_threaded(self, data_dict):
 
@@ -977,6 +1153,9 @@ memory intensive, proceed with caution!")
         logger.info("Intron range: %s", intron_range)
 
         handles = self.__get_output_files()
+        if self.timings_out:
+            self._timings_handle = open(self.timings_out, "wt")
+            print(*TIMING_FIELDS, sep="\t", file=self._timings_handle)
 
         locus_printer = functools.partial(self._print_locus,
                                           logger=logger,
@@ -994,11 +1173,14 @@ memory intensive, proceed with caution!")
             #                                                  pool_size=1,
             #                                                  max_overflow=2)
             self.engine = dbutils.connect(json_conf=self.json_conf, logger=self.logger)
+            junction_cache = JunctionCache(self.engine)
         else:
             self.engine = None
+            junction_cache = None
 
         submit_locus = functools.partial(self._submit_locus, **{"data_dict": data_dict,
-                                                                "engine": self.engine})
+                                                                "engine": self.engine,
+                                                                "junction_cache": junction_cache})
 
         counter = -1
         invalid = False
@@ -1100,6 +1282,10 @@ memory intensive, proceed with caution!")
             gene_counter = locus_printer(stranded_locus, gene_counter)
         # submit_locus(current_locus, counter)
         logger.info("Final number of superloci: %d", counter)
+        if self._timings_handle is not None:
+            self._timings_handle.close()
+            self._timings_handle = None
+            self._slow_loci.log(self.main_logger)
 
     def _parse_and_submit_input(self, data_dict):
 
@@ -1145,6 +1331,13 @@ memory intensive, proceed with caution!")
             self.logger.error(
                 "The input files were not properly sorted! Please run prepare and retry.")
             sys.exit(1)
+        except CheckpointError as exc:
+            self.logger.error(exc)
+            sys.exit(1)
+        finally:
+            # The preload store can be as large as the whole database, so it must not be left behind
+            if data_dict is not None:
+                data_dict.remove()
 
         # list(map(job.get() for job in jobs if job is not None))
         # for job in iter(x for x in jobs if x is not None):
@@ -0,0 +1,175 @@
+# coding: utf-8
+
+"""
+This module contains the functions used by Mikado pick to split a sorted GTF input
+into independent regions ("shards"), which can then be parsed and analysed
+by each worker process without having to pass through a single parsing process.
+"""
+
+import os
+import collections
+from ..parsers.GTF import GtfLine
+from ..loci.superlocus import Superlocus, Transcript
+from ..exceptions import UnsortedInput, InvalidTranscript
+
+__author__ = 'Luca Venturini'
+
+
+Shard = collections.namedtuple("Shard", ["start", "end"])
+
+
+def find_split_points(input_file, flank=0, shards=1):
+
+    """
+    This function scans a sorted GTF file and finds the byte offsets at which
+    the file can be safely split into independent regions, i.e. positions of
+    transcript lines which are either on a new chromosome or start after
+    the end of all the preceding transcripts on the same chromosome by more than
+    twice the flank - so that they will never be part of the preceding superlocus.
+    The scan is performed on the raw lines, without creating any transcript object,
+    and verifies at the same time that the input is properly sorted.
+
+    :param input_file: the sorted, uncompressed GTF file to split.
+    :type input_file: str
+
+    :param flank: the flank used to group transcripts into superloci.
+    :type flank: int
+
+    :param shards: the number of regions the file should be split into, at most.
+    :type shards: int
+
+    :returns: a list of Shard tuples, with the start and end byte offsets of each region.
+    :rtype: list[Shard]
+    """
+
+    size = os.stat(input_file).st_size
+    target = max(1, size // max(1, shards))
+    splits = [0]
+
+    previous = None
+    current_chrom = None
+    max_end = 0
+    position = 0
+
+    with open(input_file, "rb") as handle:
+        for line in handle:
+            offset = position
+            position += len(line)
+            if line.startswith(b"#"):
+                continue
+            fields = line.split(b"\t", 5)
+            if len(fields) < 6:
+                continue
+            chrom, feature = fields[0], fields[2]
+            start, end = int(fields[3]), int(fields[4])
+            if feature == b"transcript" or b"RNA" in feature:
+                if previous is not None:
+                    _check_sortedness(previous, (chrom, start, end))
+                safe = current_chrom is not None and (
+                    chrom != current_chrom or start >= max_end + 2 * flank)
+                if safe is True and offset - splits[-1] >= target:
+                    splits.append(offset)
+                if chrom != current_chrom:
+                    current_chrom = chrom
+                    max_end = 0
+                previous = (chrom, start, end)
+            max_end = max(max_end, end)
+
+    splits.append(position)
+    return [Shard(start, end) for start, end in zip(splits[:-1], splits[1:]) if start < end]
+
+
+def _check_sortedness(previous, current):
+
+    """
+    Private function to verify that two consecutive transcript lines are in the expected order.
+    :param previous: (chrom, start, end) of the previous transcript line.
+    :param current: (chrom, start, end) of the current transcript line.
+    """
+
+    if previous[0] > current[0] or (previous[0] == current[0] and previous[1:] > current[1:]):
+        error_msg = "CRITICAL - Unsorted input file, the results will not be correct. \
+Please provide a properly sorted input. Error: {0} {1}".format(
+            "\t".join(str(_) for _ in (current[0].decode(),) + current[1:]),
+            "\t".join(str(_) for _ in (previous[0].decode(),) + previous[1:]))
+        raise UnsortedInput(error_msg)
+
+
+def parse_shard(handle, shard, json_conf, logger):
+
+    """
+    Generator which parses a region of a sorted GTF file and yields
+    the superloci contained in it, together with their counter.
+    The counter of each superlocus is derived from the byte offset of its first transcript line
+    in the file, which is unique and increasing across the whole input; this allows
+    to merge the results of different regions without any further bookkeeping.
+
+    :param handle: a binary handle to the input GTF file.
+    :param shard: the region to analyse.
+    :type shard: Shard
+    :param json_conf: the configuration dictionary.
+    :type json_conf: dict
+    :param logger: the logger to use.
+    :type logger: logging.Logger
+    """
+
+    intron_range = json_conf["pick"]["run_options"]["intron_range"]
+    flank = json_conf["pick"]["run_options"]["flank"]
+    source = json_conf["pick"]["output_format"]["source"]
+
+    current_locus = None
+    current_transcript = None
+    locus_counter = transcript_counter = None
+    invalid = False
+
+    handle.seek(shard.start)
+    position = shard.start
+
+    while position < shard.end:
+        line = handle.readline()
+        if not line:
+            break
+        offset = position
+        position += len(line)
+        row = GtfLine(line.decode())
+        if row.header is True:
+            continue
+        if row.is_exon is True and invalid is False:
+            try:
+                current_transcript.add_exon(row)
+            except InvalidTranscript as exc:
+                logger.error("Transcript %s is invalid;\n%s",
+                             current_transcript.id,
+                             exc)
+                invalid = True
+        elif row.is_transcript is True:
+            if current_transcript is not None and invalid is False:
+                if Superlocus.in_locus(current_locus, current_transcript, flank=flank) is True:
+                    current_locus.add_transcript_to_locus(current_transcript,
+                                                          check_in_locus=False)
+                else:
+                    if current_locus is not None:
+                        yield current_locus, locus_counter
+                    current_locus = Superlocus(current_transcript,
+                                               stranded=False,
+                                               json_conf=json_conf,
+                                               source=source)
+                    locus_counter = transcript_counter
+            invalid = False
+            current_transcript = Transcript(row, intron_range=intron_range)
+            transcript_counter = offset + 1
+
+    if current_transcript is not None and invalid is False:
+        if Superlocus.in_locus(current_locus, current_transcript, flank=flank) is True:
+            current_locus.add_transcript_to_locus(current_transcript, check_in_locus=False)
+        else:
+            if current_locus is not None:
+                yield current_locus, locus_counter
+            current_locus = Superlocus(current_transcript,
+                                       stranded=False,
+                                       json_conf=json_conf,
+                                       source=source)
+            locus_counter = transcript_counter
+
+    if current_locus is not None:
+        yield current_locus, locus_counter
@@ -0,0 +1,216 @@
+# coding: utf-8
+
+"""
+This module contains the read-only store used by Mikado pick to share the
+preloaded data (junctions, ORFs and BLAST hits) among the worker processes.
+The data is written once by the main process into a single file, made of
+packed arrays of offsets plus the serialised keys and values of each table;
+the workers then memory-map the file, so that all of them share the same physical
+pages instead of holding a private copy of the whole database.
+"""
+
+import os
+import mmap
+import array
+import pickle
+import struct
+import collections
+import collections.abc
+from ..serializers.orf import Orf
+
+__author__ = 'Luca Venturini'
+
+
+_MAGIC = b"MIKSTOR1"
+_FOOTER = struct.Struct("<Q")
+
+# Fields of the ORF rows used to build the BED12 objects, in the order they are stored
+OrfState = collections.namedtuple("OrfState", ["start", "end", "orf_name", "score", "strand",
+                                               "thick_start", "thick_end", "phase",
+                                               "has_start_codon", "has_stop_codon"])
+
+
+def _encode_key(key):
+
+    """
+    Private function to convert a key (a string or a tuple, eg for junctions)
+    into the bytes used for the sorted index.
+    """
+
+    if isinstance(key, tuple):
+        key = "\t".join(str(_) for _ in key)
+    return str(key).encode()
+
+
+def _decode_orfs(values, key):
+    return [Orf.as_bed12_static(OrfState(*value), key) for value in values]
+
+
+_DECODERS = {"orfs": _decode_orfs}
+
+
+def write_store(filename, tables):
+
+    """
+    Function to write the shared store to a file.
+
+    :param filename: the name of the file to create.
+    :type filename: str
+
+    :param tables: a dictionary of {table name: (mapping, decoder)}. The decoder, if not None,
+    must be one of the keys of _DECODERS and will be used to convert the stored values
+    back into the objects expected by the consumers.
+    :type tables: dict
+    """
+
+    directory = dict()
+    with open(filename, "wb") as out:
+        out.write(_MAGIC)
+        for name, (mapping, decoder) in tables.items():
+            if decoder is not None and decoder not in _DECODERS:
+                raise KeyError("Unknown decoder for table {0}: {1}".format(name, decoder))
+            entries = sorted((_encode_key(key), key) for key in mapping)
+            key_offsets, value_offsets = array.array("Q", [0]), array.array("Q", [0])
+            keys = bytearray()
+            # The values are written directly to the file, as they constitute the bulk of the data
+            out.write(b"\0" * (-out.tell() % 8))
+            values_position = out.tell()
+            for encoded, key in entries:
+                keys.extend(encoded)
+                key_offsets.append(len(keys))
+                out.write(pickle.dumps(mapping[key], protocol=pickle.HIGHEST_PROTOCOL))
+                value_offsets.append(out.tell() - values_position)
+
+            positions = []
+            for block in (key_offsets.tobytes(), value_offsets.tobytes(), keys):
+                # Keep all blocks aligned to 8 bytes, so that the offsets can be cast in place
+                out.write(b"\0" * (-out.tell() % 8))
+                positions.append(out.tell())
+                out.write(block)
+            positions.append(values_position)
+            directory[name] = (len(entries), decoder, positions)
+
+        out.write(b"\0" * (-out.tell() % 8))
+        position = out.tell()
+        out.write(pickle.dumps(directory, protocol=pickle.HIGHEST_PROTOCOL))
+        out.write(_FOOTER.pack(position))
+
+
+class SharedTable(collections.abc.Mapping):
+
+    """
+    Read-only mapping over a single table of the shared store.
+    Lookups are performed with a binary search on the sorted keys,
+    reading keys and values directly from the memory-mapped file.
+    """
+
+    def __init__(self, buffer, length, decoder, positions):
+
+        self.__length = length
+        self.__decoder = _DECODERS[decoder] if decoder is not None else None
+        key_offsets, value_offsets, self.__keys, self.__values = positions
+        self.__key_offsets = buffer[key_offsets:key_offsets + 8 * (length + 1)].cast("Q")
+        self.__value_offsets = buffer[value_offsets:value_offsets + 8 * (length + 1)].cast("Q")
+        self.__buffer = buffer
+
+    def __len__(self):
+        return self.__length
+
+    def release(self):
+        """Method to release the views on the memory-mapped file."""
+        self.__key_offsets.release()
+        self.__value_offsets.release()
+
+    def __key_at(self, index):
+        return bytes(self.__buffer[self.__keys + self.__key_offsets[index]:
+                                   self.__keys + self.__key_offsets[index + 1]])
+
+    def __find(self, key):
+        """Private method to retrieve the index of a key, or None if it is absent."""
+        encoded = _encode_key(key)
+        low, high = 0, self.__length
+        while low < high:
+            middle = (low + high) // 2
+            if self.__key_at(middle) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.__length and self.__key_at(low) == encoded:
+            return low
+        return None
+
+    def __contains__(self, key):
+        return self.__find(key) is not None
+
+    def __getitem__(self, key):
+        index = self.__find(key)
+        if index is None:
+            raise KeyError(key)
+        value = pickle.loads(self.__buffer[self.__values + self.__value_offsets[index]:
+                                           self.__values + self.__value_offsets[index + 1]])
+        if self.__decoder is not None:
+            value = self.__decoder(value, key)
+        return value
+
+    def __iter__(self):
+        for index in range(self.__length):
+            yield self.__key_at(index).decode()
+
+
+class SharedStore(collections.abc.Mapping):
+
+    """
+    Read-only, memory-mapped store of the preloaded data. It behaves like the dictionary
+    of dictionaries ("data_dict") used by the loci for loading their data.
+    When pickled (eg when sent to a worker process) only the file name is transferred,
+    and the file is mapped again, lazily, by the receiving process.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.__handle, self.__mmap, self.__buffer, self.__tables = None, None, None, None
+
+    def __open(self):
+        if self.__tables is not None:
+            return
+        self.__handle = open(self.filename, "rb")
+        self.__mmap = mmap.mmap(self.__handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.__mmap[:len(_MAGIC)] != _MAGIC:
+            raise ValueError("{0} is not a valid Mikado store".format(self.filename))
+        self.__buffer = buffer = memoryview(self.__mmap)
+        position = _FOOTER.unpack(self.__mmap[-_FOOTER.size:])[0]
+        directory = pickle.loads(self.__mmap[position:-_FOOTER.size])
+        self.__tables = dict((name, SharedTable(buffer, *directory[name])) for name in directory)
+
+    def __getitem__(self, table):
+        self.__open()
+        return self.__tables[table]
+
+    def __iter__(self):
+        self.__open()
+        return iter(self.__tables)
+
+    def __len__(self):
+        self.__open()
+        return len(self.__tables)
+
+    def __getstate__(self):
+        return {"filename": self.filename}
+
+    def __setstate__(self, state):
+        self.__init__(state["filename"])
+
+    def close(self):
+        """Method to release the memory map of the store, if it has been opened."""
+        if self.__tables is not None:
+            [table.release() for table in self.__tables.values()]
+            self.__tables = None
+            self.__buffer.release()
+            self.__mmap.close()
+            self.__handle.close()
+
+    def remove(self):
+        """Method to close the store and delete its file."""
+        self.close()
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
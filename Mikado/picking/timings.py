@@ -0,0 +1,141 @@
+# coding: utf-8
+
+"""
+This module contains the functions used by Mikado pick to record how long each
+superlocus took in each stage of the analysis, and to report the slowest ones.
+"""
+
+import os
+import heapq
+
+__author__ = 'Luca Venturini'
+
+
+STAGES = ["loading", "subloci", "monosubloci", "loci",
+          "alternative_splicing", "padding", "fragments"]
+
+TIMING_FIELDS = (["counter", "superlocus", "transcripts", "approximation_level",
+                  "graph_nodes", "graph_edges", "comparison_hits", "comparison_misses"] +
+                 STAGES + ["total"])
+
+
+def superlocus_timings(slocus, stranded_loci, counter):
+
+    """
+    This function collects the timings of an analysed superlocus and of its stranded
+    components into a single row.
+
+    :param slocus: the superlocus, as it was received for the analysis.
+    :type slocus: Mikado.loci.Superlocus
+
+    :param stranded_loci: the stranded superloci derived from it.
+    :type stranded_loci: list[Mikado.loci.Superlocus]
+
+    :param counter: the counter of the superlocus.
+    :type counter: int
+
+    :returns: a dictionary with the values for each of the TIMING_FIELDS.
+    :rtype: dict
+    """
+
+    row = dict((stage, slocus.timings[stage]) for stage in STAGES)
+    row["counter"] = counter
+    row["superlocus"] = "{0}:{1}-{2}".format(slocus.chrom, slocus.start, slocus.end)
+    row["transcripts"] = len(slocus.transcripts)
+    row["approximation_level"] = 0
+    row["graph_nodes"] = row["graph_edges"] = 0
+    # The comparison cache is shared between the superlocus and its stranded components
+    row["comparison_hits"] = slocus.comparisons.hits
+    row["comparison_misses"] = slocus.comparisons.misses
+    for stranded_locus in stranded_loci:
+        for stage in STAGES:
+            row[stage] += stranded_locus.timings[stage]
+        row["approximation_level"] = max(row["approximation_level"],
+                                         stranded_locus.approximation_level)
+        row["graph_nodes"] = max(row["graph_nodes"], stranded_locus.graph_size[0])
+        row["graph_edges"] = max(row["graph_edges"], stranded_locus.graph_size[1])
+
+    row["total"] = sum(row[stage] for stage in STAGES)
+    for key in STAGES + ["total"]:
+        row[key] = round(row[key], 4)
+    return row
+
+
+class SlowLociReport:
+
+    """
+    Class to keep track of the slowest superloci analysed during a run.
+    Only the top N rows are kept in memory.
+    """
+
+    def __init__(self, top=10):
+        self.top = top
+        self.__heap = []
+        self.__counter = 0
+
+    def add(self, row):
+        """
+        Method to add the timings of a superlocus to the report.
+        :param row: the row created by superlocus_timings.
+        :type row: dict
+        """
+
+        if self.top == 0:
+            return
+        # The counter is used to break ties without comparing the dictionaries
+        self.__counter += 1
+        item = (float(row["total"]), self.__counter, row)
+        if len(self.__heap) < self.top:
+            heapq.heappush(self.__heap, item)
+        else:
+            heapq.heappushpop(self.__heap, item)
+
+    @property
+    def rows(self):
+        """The rows of the slowest superloci, in decreasing order of total time."""
+        return [item[2] for item in sorted(self.__heap, reverse=True)]
+
+    def log(self, logger):
+        """
+        Method to print the report of the slowest superloci to the log.
+        :param logger: the logger to use.
+        """
+
+        rows = self.rows
+        if len(rows) == 0:
+            return
+        logger.info("Slowest %d superloci:", len(rows))
+        for row in rows:
+            slowest = max(STAGES, key=lambda stage: float(row[stage]))
+            logger.info("%s: %s seconds, %s transcripts, approximation level %s, graph %s nodes/%s edges; "
+                        "slowest stage: %s (%s seconds)",
+                        row["superlocus"], row["total"], row["transcripts"],
+                        row["approximation_level"], row["graph_nodes"], row["graph_edges"],
+                        slowest, row[slowest])
+
+
+def merge_timings(filenames, output, report=None):
+
+    """
+    This function merges the partial timings files created by the worker processes into
+    the final TSV, in increasing counter order.
+
+    :param filenames: the partial files to merge. They will be removed after merging.
+    :type filenames: list[str]
+
+    :param output: the name of the final timings file.
+    :type output: str
+
+    :param report: optional SlowLociReport to update with the merged rows.
+    :type report: (SlowLociReport|None)
+    """
+
+    handles = [open(_) for _ in filenames]
+    with open(output, "wt") as out:
+        print(*TIMING_FIELDS, sep="\t", file=out)
+        for line in heapq.merge(*handles, key=lambda line: int(line.split("\t", 1)[0])):
+            print(line, end="", file=out)
+            if report is not None:
+                report.add(dict(zip(TIMING_FIELDS, line.rstrip("\n").split("\t"))))
+    [_.close() for _ in handles]
+    [os.remove(_) for _ in filenames]
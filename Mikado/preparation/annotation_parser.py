@@ -5,7 +5,9 @@ import logging
 import logging.handlers
 from .. import exceptions
 from sys import intern
-import shelve
+from .transcript_store import TranscriptStore, max_records as default_max_records
+import functools
+from .chunking import open_chunk
 
 __author__ = 'Luca Venturini'
 
@@ -17,11 +19,13 @@ class AnnotationParser(multiprocessing.Process):
                  logging_queue,
                  identifier,
                  log_level="WARNING",
-                 strip_cds=False):
+                 strip_cds=False,
+                 max_records=None):
 
         super().__init__()
         self.submission_queue = submission_queue
         self.__strip_cds = strip_cds
+        self.__max_records = max_records
         self.logging_queue = logging_queue
         self.log_level = log_level
         self.__identifier = identifier
@@ -54,37 +58,46 @@ class AnnotationParser(multiprocessing.Process):
         while True:
             results = self.submission_queue.get()
             try:
-                label, handle, strand_specific, shelf_name = results
+                label, handle, strand_specific, store_name, chunk = results
             except ValueError as exc:
                 raise ValueError("{}.\tValues: {}".format(exc, ", ".join([str(_) for _ in results])))
             if handle == "EXIT":
-                self.submission_queue.put(("EXIT", "EXIT", "EXIT", "EXIT"))
+                self.submission_queue.put(("EXIT", "EXIT", "EXIT", "EXIT", "EXIT"))
                 break
             counter += 1
-            self.logger.debug("Received %s (label: %s; SS: %s, shelf_name: %s)",
+            self.logger.debug("Received %s (label: %s; SS: %s, store_name: %s, chunk: %s)",
                               handle,
                               label,
                               strand_specific,
-                              shelf_name)
+                              store_name,
+                              chunk)
             try:
-                gff_handle = to_gff(handle)
+                if chunk is None:
+                    gff_handle = to_gff(handle)
+                else:
+                    annot_type, chunk = chunk
+                    gff_handle = open_chunk(handle, annot_type, chunk)
                 if gff_handle.__annot_type__ == "gff3":
-                    new_ids = load_from_gff(shelf_name,
-                                            gff_handle,
-                                            label,
-                                            found_ids,
-                                            self.logger,
-                                            strip_cds=self.__strip_cds,
-                                            strand_specific=strand_specific)
+                    loaded = load_from_gff(store_name,
+                                           gff_handle,
+                                           label,
+                                           found_ids,
+                                           self.logger,
+                                           strip_cds=self.__strip_cds,
+                                           strand_specific=strand_specific,
+                                           chunked=(chunk is not None),
+                                           max_records=self.__max_records)
                 else:
-                    new_ids = load_from_gtf(shelf_name,
-                                            gff_handle,
-                                            label,
-                                            found_ids,
-                                            self.logger,
-                                            strip_cds=self.__strip_cds,
-                                            strand_specific=strand_specific)
-                if len(new_ids) == 0:
+                    loaded = load_from_gtf(store_name,
+                                           gff_handle,
+                                           label,
+                                           found_ids,
+                                           self.logger,
+                                           strip_cds=self.__strip_cds,
+                                           strand_specific=strand_specific,
+                                           max_records=self.__max_records)
+                # Chunks are checked once they have been merged together
+                if loaded == 0 and chunk is None:
                     raise exceptions.InvalidAssembly(
                         "No valid transcripts found in {0}{1}!".format(
                             handle, " (label: {0})".format(label) if label != "" else ""
@@ -136,16 +149,60 @@ def __raise_invalid(row_id, name, label):
             "(label: {0})".format(label) if label != '' else ""))
 
 
-def load_from_gff(shelf_name,
+def merge_records(tid, first, second, name, label):
+
+    """
+    Function to merge the records of a transcript whose lines have been found in two
+    different chunks of the same file, in the same way as if the lines had been parsed together.
+    :param tid: the transcript ID.
+    :param first: the record of the first chunk.
+    :type first: dict
+    :param second: the record of the following chunk.
+    :type second: dict
+    :param name: the name of the file.
+    :param label: the label of the file.
+    :returns: the merged record.
+    :rtype: dict
+    """
+
+    if first["chrom"] != second["chrom"] or first["strand"] != second["strand"]:
+        __raise_invalid(tid, name, label)
+    attributes = second["attributes"].copy()
+    if "exon_number" in attributes:
+        del attributes["exon_number"]
+    first["attributes"].update(attributes)
+    for feature, intervals in second["features"].items():
+        first["features"].setdefault(feature, []).extend(intervals)
+    return first
+
+
+def __flush_records(store, exon_lines, reconcile, transcript2genes=None):
+
+    """
+    Private function to write the records kept in memory by the parsers to the store, and forget them.
+    Lines of these transcripts found later on start new records, which are reconciled with the
+    stored ones when they are written in turn.
+    """
+
+    store.write(exon_lines, reconcile)
+    if transcript2genes is not None:
+        for tid in exon_lines:
+            transcript2genes.pop(tid, None)
+    exon_lines.clear()
+
+
+def load_from_gff(store_name,
                   gff_handle,
                   label,
                   found_ids,
                   logger,
                   strip_cds=False,
-                  strand_specific=False):
+                  strand_specific=False,
+                  chunked=False,
+                  max_records=None):
     """
     Method to load the exon lines from GFF3 files.
-    :param shelf_name: the name of the shelf DB to use.
+    :param store_name: the name of the transcript store to create.
     :param gff_handle: The handle for the GTF to be parsed.
     :param label: label to be attached to all transcripts.
     :type label: str
@@ -157,124 +214,137 @@ def load_from_gff(shelf_name,
     :type strip_cds: bool
     :param strand_specific: whether the assembly is strand-specific or not.
     :type strand_specific: bool
-    :return:
+    :param chunked: whether the handle covers only a chunk of the file, so that the mRNA line
+    of a transcript might be in a previous chunk.
+    :type chunked: bool
+    :param max_records: maximum number of transcript records kept in memory before
+    writing them to the store.
+    :type max_records: (int|None)
+    :return: the number of transcripts loaded.
+    :rtype: int
     """
 
     exon_lines = dict()
 
     transcript2genes = dict()
-    new_ids = set()
 
     to_ignore = set()
-
-    for row in gff_handle:
-        if row.is_transcript is True:
-            if label != '':
-                row.id = "{0}_{1}".format(label, row.id)
-                row.source = label
-            if row.id in found_ids:
+    if max_records is None:
+        max_records = default_max_records()
+    reconcile = functools.partial(merge_records, name=gff_handle.name, label=label)
+
+    # The features are written to the store as they are found, and the records
+    # of the transcripts, without their features, in batches of at most max_records
+    with TranscriptStore(store_name, flag="n") as store:
+        for row in gff_handle:
+            if len(exon_lines) >= max_records:
+                __flush_records(store, exon_lines, reconcile, transcript2genes)
+            if row.is_transcript is True:
+                if label != '':
+                    row.id = "{0}_{1}".format(label, row.id)
+                    row.source = label
+                if row.id in found_ids:
+                        __raise_redundant(row.id, gff_handle.name, label)
+                elif row.id in exon_lines or row.id in store:
+                    # This might sometimes happen in GMAP
+                    logger.warning(
+                        "Multiple instance of %s found, skipping any subsequent entry",
+                        row.id)
+                    to_ignore.add(row.id)
+                    continue
+                if row.id not in exon_lines:
+                    exon_lines[row.id] = dict()
+                exon_lines[row.id]["source"] = row.source
+                transcript2genes[row.id] = row.parent[0]
+                if row.id in found_ids:
                     __raise_redundant(row.id, gff_handle.name, label)
-            elif row.id in exon_lines:
-                # This might sometimes happen in GMAP
-                logger.warning(
-                    "Multiple instance of %s found, skipping any subsequent entry",
-                    row.id)
-                to_ignore.add(row.id)
+                # elif row.id in exon_lines:
+                #     # This might sometimes happen in GMAP
+                #     logger.warning(
+                #         "Multiple instance of %s found, skipping any subsequent entry",
+                #         row.id)
+                #     to_ignore.add(row.id)
+                #     continue
+                    # __raise_invalid(row.id, gff_handle.name, label)
+
+                exon_lines[row.id]["attributes"] = row.attributes.copy()
+                exon_lines[row.id]["chrom"] = row.chrom
+                exon_lines[row.id]["strand"] = row.strand
+                exon_lines[row.id]["tid"] = row.transcript
+                exon_lines[row.id]["parent"] = row.parent
+                exon_lines[row.id]["features"] = dict()
+                exon_lines[row.id]["strand_specific"] = strand_specific
+                exon_lines[row.id]["transcript_line"] = True
                 continue
-            if row.id not in exon_lines:
-                exon_lines[row.id] = dict()
-            exon_lines[row.id]["source"] = row.source
-            transcript2genes[row.id] = row.parent[0]
-            if row.id in found_ids:
-                __raise_redundant(row.id, gff_handle.name, label)
-            # elif row.id in exon_lines:
-            #     # This might sometimes happen in GMAP
-            #     logger.warning(
-            #         "Multiple instance of %s found, skipping any subsequent entry",
-            #         row.id)
-            #     to_ignore.add(row.id)
-            #     continue
-                # __raise_invalid(row.id, gff_handle.name, label)
-
-            exon_lines[row.id]["attributes"] = row.attributes.copy()
-            exon_lines[row.id]["chrom"] = row.chrom
-            exon_lines[row.id]["strand"] = row.strand
-            exon_lines[row.id]["tid"] = row.transcript
-            exon_lines[row.id]["parent"] = row.parent
-            exon_lines[row.id]["features"] = dict()
-            exon_lines[row.id]["strand_specific"] = strand_specific
-            continue
-        elif not row.is_exon:
-            continue
-        elif row.is_exon is True:
-            if not row.is_cds or (row.is_cds is True and strip_cds is False):
-                if len(row.parent) == 0 and "match" in row.feature:
-                    if label == '':
-                        __tid = row.id
-                    else:
-                        __tid = "{0}_{1}".format(label, row.id)
-                    row.parent = __tid
-                    transcript2genes[__tid] = "{}_match".format(row.transcript)
-                    row.feature = "exon"
-                elif label != '':
-                    row.transcript = ["{0}_{1}".format(label, tid) for tid in row.transcript]
-
-                parents = row.transcript[:]
-                for tid in parents:
-                    if tid in found_ids:
-                        __raise_redundant(tid, gff_handle.name, label)
-                    elif tid in to_ignore:
-                        continue
-                    if tid not in exon_lines:
-                        exon_lines[tid] = dict()
-                        exon_lines[tid]["attributes"] = row.attributes.copy()
-                        if label:
-                            exon_lines[tid]["source"] = label
-                        else:
-                            exon_lines[tid]["source"] = row.source
-                        exon_lines[tid]["chrom"] = row.chrom
-                        exon_lines[tid]["strand"] = row.strand
-                        exon_lines[tid]["features"] = dict()
-                        exon_lines[tid]["tid"] = tid
-                        exon_lines[tid]["parent"] = transcript2genes[tid]
-                        exon_lines[tid]["strand_specific"] = strand_specific
-                    else:
-                        if "exon_number" in row.attributes:
-                            del row.attributes["exon_number"]
-                        if (exon_lines[tid]["chrom"] != row.chrom or
-                                exon_lines[tid]["strand"] != row.strand):
-                            __raise_invalid(tid, gff_handle.name, label)
-                        exon_lines[tid]["attributes"].update(row.attributes)
-
-                    if row.feature not in exon_lines[tid]["features"]:
-                        exon_lines[tid]["features"][row.feature] = []
-                    exon_lines[tid]["features"][row.feature].append((row.start, row.end))
-                    new_ids.add(tid)
-            else:
+            elif not row.is_exon:
                 continue
-    gff_handle.close()
-
-    with shelve.open(shelf_name, flag="n", writeback=True) as shelf:
-        shelf.update(exon_lines)
-    # if shelf_name is not None:
-    #     with shelve.open(shelf_name, flag="n") as shelf:
-    #         for tid in exon_lines:
-    #             shelf[tid] = exon_lines[tid]
-    #     exon_lines = collections.defaultdict(dict)
+            elif row.is_exon is True:
+                if not row.is_cds or (row.is_cds is True and strip_cds is False):
+                    if len(row.parent) == 0 and "match" in row.feature:
+                        if label == '':
+                            __tid = row.id
+                        else:
+                            __tid = "{0}_{1}".format(label, row.id)
+                        row.parent = __tid
+                        transcript2genes[__tid] = "{}_match".format(row.transcript)
+                        row.feature = "exon"
+                    elif label != '':
+                        row.transcript = ["{0}_{1}".format(label, tid) for tid in row.transcript]
+
+                    parents = row.transcript[:]
+                    for tid in parents:
+                        if tid in found_ids:
+                            __raise_redundant(tid, gff_handle.name, label)
+                        elif tid in to_ignore:
+                            continue
+                        if tid not in exon_lines:
+                            exon_lines[tid] = dict()
+                            exon_lines[tid]["attributes"] = row.attributes.copy()
+                            if label:
+                                exon_lines[tid]["source"] = label
+                            else:
+                                exon_lines[tid]["source"] = row.source
+                            exon_lines[tid]["chrom"] = row.chrom
+                            exon_lines[tid]["strand"] = row.strand
+                            exon_lines[tid]["features"] = dict()
+                            exon_lines[tid]["tid"] = tid
+                            if chunked or tid in store:
+                                # In sorted files with overlapping genes, the mRNA line might
+                                # have been in a previous chunk, or its record already written
+                                # to the store; the records are merged later
+                                exon_lines[tid]["parent"] = transcript2genes.get(tid)
+                            else:
+                                exon_lines[tid]["parent"] = transcript2genes[tid]
+                            exon_lines[tid]["strand_specific"] = strand_specific
+                        else:
+                            if "exon_number" in row.attributes:
+                                del row.attributes["exon_number"]
+                            if (exon_lines[tid]["chrom"] != row.chrom or
+                                    exon_lines[tid]["strand"] != row.strand):
+                                __raise_invalid(tid, gff_handle.name, label)
+                            exon_lines[tid]["attributes"].update(row.attributes)
+
+                        store.add_feature(tid, row.feature, row.start, row.end)
+                else:
+                    continue
+        gff_handle.close()
+        store.write(exon_lines, reconcile)
+        loaded = len(store)
 
-    return new_ids
+    return loaded
 
 
-def load_from_gtf(shelf_name,
+def load_from_gtf(store_name,
                   gff_handle,
                   label,
                   found_ids,
                   logger,
                   strip_cds=False,
-                  strand_specific=False):
+                  strand_specific=False,
+                  max_records=None):
     """
     Method to load the exon lines from GTF files.
-    :param shelf_name: the name of the shelf DB to use.
+    :param store_name: the name of the transcript store to create.
     :param gff_handle: The handle for the GTF to be parsed.
     :param label: label to be attached to all transcripts.
     :type label: str
@@ -286,7 +356,11 @@ def load_from_gtf(shelf_name,
     :type strip_cds: bool
     :param strand_specific: whether the assembly is strand-specific or not.
     :type strand_specific: bool
-    :return:
+    :param max_records: maximum number of transcript records kept in memory before
+    writing them to the store.
+    :type max_records: (int|None)
+    :return: the number of transcripts loaded.
+    :rtype: int
     """
 
     exon_lines = dict()
@@ -294,75 +368,80 @@ def load_from_gtf(shelf_name,
     # Reduce memory footprint
     [intern(_) for _ in ["chrom", "features", "strand", "attributes", "tid", "parent", "attributes"]]
 
-    new_ids = set()
     to_ignore = set()
-    for row in gff_handle:
-        if row.is_transcript is True:
+    if max_records is None:
+        max_records = default_max_records()
+    reconcile = functools.partial(merge_records, name=gff_handle.name, label=label)
+
+    # The features are written to the store as they are found, and the records
+    # of the transcripts, without their features, in batches of at most max_records
+    with TranscriptStore(store_name, flag="n") as store:
+        for row in gff_handle:
+            if len(exon_lines) >= max_records:
+                __flush_records(store, exon_lines, reconcile)
+            if row.is_transcript is True:
+                if label != '':
+                    row.transcript = "{0}_{1}".format(label, row.transcript)
+                if row.transcript in found_ids:
+                    __raise_redundant(row.transcript, gff_handle.name, label)
+                if row.transcript in exon_lines or row.transcript in store:
+                    logger.warning(
+                        "Multiple instance of %s found, skipping any subsequent entry", row.id)
+                    to_ignore.add(row.id)
+                    continue
+                    # __raise_invalid(row.transcript, gff_handle.name, label)
+                if row.transcript not in exon_lines:
+                    exon_lines[row.transcript] = dict()
+                if label:
+                    exon_lines[row.transcript]["source"] = label
+                else:
+                    exon_lines[row.transcript]["source"] = row.source
+
+                exon_lines[row.transcript]["features"] = dict()
+                exon_lines[row.transcript]["chrom"] = row.chrom
+                exon_lines[row.transcript]["strand"] = row.strand
+                exon_lines[row.transcript]["attributes"] = row.attributes.copy()
+                exon_lines[row.transcript]["tid"] = row.id
+                exon_lines[row.transcript]["parent"] = row.gene
+                exon_lines[row.transcript]["strand_specific"] = strand_specific
+                exon_lines[row.transcript]["transcript_line"] = True
+                if "exon_number" in exon_lines[row.transcript]["attributes"]:
+                    del exon_lines[row.id]["attributes"]["exon_number"]
+                continue
+
+            if row.is_exon is False or (row.is_cds is True and strip_cds is True):
+                continue
             if label != '':
                 row.transcript = "{0}_{1}".format(label, row.transcript)
             if row.transcript in found_ids:
                 __raise_redundant(row.transcript, gff_handle.name, label)
-            if row.transcript in exon_lines:
-                logger.warning(
-                    "Multiple instance of %s found, skipping any subsequent entry", row.id)
-                to_ignore.add(row.id)
+            assert row.transcript is not None
+            if row.transcript in to_ignore:
                 continue
-                # __raise_invalid(row.transcript, gff_handle.name, label)
-            if row.transcript not in exon_lines:
+            elif row.transcript not in exon_lines:
                 exon_lines[row.transcript] = dict()
-            if label:
-                exon_lines[row.transcript]["source"] = label
-            else:
-                exon_lines[row.transcript]["source"] = row.source
-
-            exon_lines[row.transcript]["features"] = dict()
-            exon_lines[row.transcript]["chrom"] = row.chrom
-            exon_lines[row.transcript]["strand"] = row.strand
-            exon_lines[row.transcript]["attributes"] = row.attributes.copy()
-            exon_lines[row.transcript]["tid"] = row.id
-            exon_lines[row.transcript]["parent"] = row.gene
-            exon_lines[row.transcript]["strand_specific"] = strand_specific
-            if "exon_number" in exon_lines[row.transcript]["attributes"]:
-                del exon_lines[row.id]["attributes"]["exon_number"]
-            continue
-
-        if row.is_exon is False or (row.is_cds is True and strip_cds is True):
-            continue
-        if label != '':
-            row.transcript = "{0}_{1}".format(label, row.transcript)
-        if row.transcript in found_ids:
-            __raise_redundant(row.transcript, gff_handle.name, label)
-        assert row.transcript is not None
-        if row.transcript not in exon_lines:
-            exon_lines[row.transcript] = dict()
-            if label:
-                exon_lines[row.transcript]["source"] = label
+                if label:
+                    exon_lines[row.transcript]["source"] = label
+                else:
+                    exon_lines[row.transcript]["source"] = row.source
+                exon_lines[row.transcript]["chrom"] = row.chrom
+                exon_lines[row.transcript]["strand"] = row.strand
+                exon_lines[row.transcript]["features"] = dict()
+                exon_lines[row.transcript]["attributes"] = row.attributes.copy()
+                exon_lines[row.transcript]["tid"] = row.transcript
+                exon_lines[row.transcript]["parent"] = row.gene
+                exon_lines[row.transcript]["strand_specific"] = strand_specific
             else:
-                exon_lines[row.transcript]["source"] = row.source
-            exon_lines[row.transcript]["chrom"] = row.chrom
-            exon_lines[row.transcript]["strand"] = row.strand
-            exon_lines[row.transcript]["exon"] = []
-            exon_lines[row.transcript]["attributes"] = row.attributes.copy()
-            exon_lines[row.id]["tid"] = row.transcript
-            exon_lines[row.id]["parent"] = row.gene
-            exon_lines[row.id]["strand_specific"] = strand_specific
-        else:
-            if row.transcript in to_ignore:
-                continue
-            if "exon_number" in row.attributes:
-                del row.attributes["exon_number"]
-            if ("chrom" not in exon_lines[row.transcript] or
-                    exon_lines[row.transcript]["chrom"] != row.chrom or
-                    exon_lines[row.transcript]["strand"] != row.strand):
-                __raise_invalid(row.transcript, gff_handle.name, label)
-            exon_lines[row.transcript]["attributes"].update(row.attributes)
-        if row.feature not in exon_lines[row.transcript]["features"]:
-            exon_lines[row.transcript]["features"][row.feature] = []
-        exon_lines[row.transcript]["features"][row.feature].append((row.start, row.end))
-        new_ids.add(row.transcript)
-    gff_handle.close()
-
-    with shelve.open(shelf_name, flag="n", writeback=True) as shelf:
-        shelf.update(exon_lines)
-
-    return new_ids
+                if "exon_number" in row.attributes:
+                    del row.attributes["exon_number"]
+                if ("chrom" not in exon_lines[row.transcript] or
+                        exon_lines[row.transcript]["chrom"] != row.chrom or
+                        exon_lines[row.transcript]["strand"] != row.strand):
+                    __raise_invalid(row.transcript, gff_handle.name, label)
+                exon_lines[row.transcript]["attributes"].update(row.attributes)
+            store.add_feature(row.transcript, row.feature, row.start, row.end)
+        gff_handle.close()
+        store.write(exon_lines, reconcile)
+        loaded = len(store)
+
+    return loaded
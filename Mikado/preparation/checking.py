@@ -1,7 +1,7 @@
 from ..loci import Transcript
 from ..loci.transcriptchecker import TranscriptChecker
 from ..utilities.log_utils import create_null_logger, create_queue_logger
-import pyfaidx
+from ..utilities.genome_cache import get_genome, SequenceView
 import os
 from .. import exceptions
 import multiprocessing
@@ -10,6 +10,12 @@ import functools
 __author__ = 'Luca Venturini'
 
 
+# Maximum number of transcripts sent together to a checking process
+BATCH_SIZE = 100
+# Maximum size of the genomic window retrieved for a batch of transcripts
+MAX_WINDOW = 2**20
+
+
 def create_transcript(lines,
                       fasta_seq,
                       start,
@@ -93,6 +99,43 @@ def create_transcript(lines,
     return transcript_object
 
 
+def batch_sequences(genome, chrom, batch, max_window=MAX_WINDOW):
+
+    """
+    Function to retrieve the genomic sequences of a batch of transcripts on the same chromosome.
+    The genomic window spanning the batch is read only once, and each transcript receives a view
+    over its own region of the window. Batches spanning more than the maximum window (ie those
+    made of a single, very long transcript) are not read as a whole; rather, only the exons and
+    splice sites of the transcript will be retrieved from the genome.
+    :param genome: the genome cache.
+    :type genome: Mikado.utilities.genome_cache.GenomeCache
+
+    :param chrom: the chromosome of the batch.
+    :type chrom: str
+
+    :param batch: list of (lines, start, end, counter) tuples, sorted by position.
+    :type batch: list
+
+    :param max_window: the maximum size of the window to read.
+    :type max_window: int
+
+    :returns: (lines, sequence, start, end, counter) tuples
+    """
+
+    window_start = min(_[1] for _ in batch)
+    window_end = max(_[2] for _ in batch)
+    if window_end - window_start + 1 > max_window:
+        for lines, start, end, counter in batch:
+            yield lines, genome.region(chrom, start, end), start, end, counter
+    else:
+        window = genome.fetch(chrom, window_start, window_end)
+        for lines, start, end, counter in batch:
+            # The window is clamped to the end of the chromosome, so must be the views
+            offset = start - window_start
+            length = max(min(end - start + 1, len(window) - offset), 0)
+            yield lines, SequenceView(window, offset, length), start, end, counter
+
+
 class CheckingProcess(multiprocessing.Process):
 
     def __init__(self,
@@ -108,6 +151,7 @@ class CheckingProcess(multiprocessing.Process):
                  canonical_splices=(("GT", "AG"),
                                     ("GC", "AG"),
                                     ("AT", "AC")),
+                 memory_map=False,
                  log_level="WARNING"
                  ):
 
@@ -122,8 +166,9 @@ class CheckingProcess(multiprocessing.Process):
         create_queue_logger(self)
         self.lenient = lenient
         self.__fasta = fasta
+        self.__memory_map = memory_map
         self.submission_queue = submission_queue
-        self.fasta = pyfaidx.Fasta(self.__fasta)
+        self.fasta = None
         self.fasta_out = os.path.join(tmpdir, "{0}-{1}".format(
             fasta_out, self.identifier
         ))
@@ -140,34 +185,33 @@ class CheckingProcess(multiprocessing.Process):
                                     canonical_splices=self.canonical,
                                     logger=self.logger)
 
+        self.fasta = get_genome(self.__fasta, memory_map=self.__memory_map)
         fasta_out = open(self.fasta_out, "w")
         gtf_out = open(self.gtf_out, "w")
 
         while True:
-            lines, start, end, counter = self.submission_queue.get()
-            if lines == "EXIT":
+            chrom, batch = self.submission_queue.get()
+            if chrom == "EXIT":
                 self.logger.debug("Finished for %s", self.name)
-                self.submission_queue.put((lines,
-                                           start,
-                                           end,
-                                           counter))
+                self.submission_queue.put((chrom, batch))
                 break
-            self.logger.debug("Checking %s", lines["tid"])
-            transcript = checker(lines,
-                                 str(self.fasta[lines["chrom"]][start-1:end]),
-                                 start,
-                                 end,
-                                 strand_specific=lines["strand_specific"])
-
-            if transcript is None:
-                self.logger.debug("%s failed the check", lines["tid"])
-                continue
-            else:
-                self.logger.debug("Printing %s", lines["tid"])
-                print("\n".join(["{0}/{1}".format(counter, line) for line in
-                                 transcript.format("gtf").split("\n")]), file=gtf_out)
-                print("\n".join(["{0}/{1}".format(counter, line) for line in
-                                 transcript.fasta.split("\n")]), file=fasta_out)
+            for lines, sequence, start, end, counter in batch_sequences(self.fasta, chrom, batch):
+                self.logger.debug("Checking %s", lines["tid"])
+                transcript = checker(lines,
+                                     sequence,
+                                     start,
+                                     end,
+                                     strand_specific=lines["strand_specific"])
+
+                if transcript is None:
+                    self.logger.debug("%s failed the check", lines["tid"])
+                    continue
+                else:
+                    self.logger.debug("Printing %s", lines["tid"])
+                    print("\n".join(["{0}/{1}".format(counter, line) for line in
+                                     transcript.format("gtf").split("\n")]), file=gtf_out)
+                    print("\n".join(["{0}/{1}".format(counter, line) for line in
+                                     transcript.fasta.split("\n")]), file=fasta_out)
 
         fasta_out.close()
         gtf_out.close()
@@ -183,7 +227,7 @@ class CheckingProcess(multiprocessing.Process):
     def __setstate__(self, state):
         self.__dict__.update(state)
         create_queue_logger(self)
-        self.fasta = pyfaidx.Fasta(self.__fasta)
+        self.fasta = None
 
     @property
     def identifier(self):
@@ -0,0 +1,153 @@
+# coding: utf-8
+
+"""
+This module contains the functions used by Mikado prepare to split a large annotation
+file into byte ranges which can be parsed in parallel. Each range begins at the start
+of a transcript (GTF) or of a top-level feature (GFF3). The lines of a transcript can
+still be split between two ranges, e.g. in GFF3 files sorted by coordinate where genes
+overlap; such transcripts are reconciled when the results of the ranges are merged.
+"""
+
+import io
+import os
+from ..parsers import GTF, GFF
+
+__author__ = 'Luca Venturini'
+
+
+# Files smaller than this will not be split
+MIN_CHUNK_SIZE = 2**26
+
+
+class FileChunk(io.TextIOBase):
+
+    """
+    Read-only text handle over a byte range of a file, which can be given to the GTF/GFF3 parsers.
+    """
+
+    def __init__(self, filename, start, end):
+
+        """
+        :param filename: the name of the file.
+        :type filename: str
+
+        :param start: the offset of the first byte of the range.
+        :type start: int
+
+        :param end: the offset of the end of the range (excluded).
+        :type end: int
+        """
+
+        super().__init__()
+        self.__name = filename
+        self.__end = end
+        self.__handle = open(filename, "rb")
+        self.__handle.seek(start)
+
+    @property
+    def name(self):
+        return self.__name
+
+    def readable(self):
+        return True
+
+    def readline(self, *args):
+        if self.__handle.tell() >= self.__end:
+            return ""
+        return self.__handle.readline().decode()
+
+    def close(self):
+        self.__handle.close()
+        super().close()
+
+
+def _is_boundary(line, annot_type, previous):
+
+    """
+    Private function to determine whether a line can be the first one of a chunk.
+    :returns: a flag, and the transcript ID of the line (for GTF files).
+    """
+
+    if line.startswith("#"):
+        return annot_type == "gff3" and line.startswith("###"), previous
+    elif annot_type == "gff3":
+        return "Parent=" not in line.rstrip().split("\t")[-1], previous
+    else:
+        transcript = GTF.GtfLine(line).transcript
+        return previous is not None and transcript != previous, transcript
+
+
+def _next_boundary(handle, offset, annot_type):
+
+    """
+    Private function to find the first valid start of a chunk at or after the given offset.
+    :returns: the offset of the boundary, or None if the end of the file is reached.
+    """
+
+    # Move to the beginning of the first line starting at or after the offset
+    handle.seek(max(offset - 1, 0))
+    if offset > 0:
+        handle.readline()
+    previous = None
+    while True:
+        position = handle.tell()
+        line = handle.readline()
+        if not line:
+            return None
+        is_boundary, previous = _is_boundary(line.decode(), annot_type, previous)
+        if is_boundary:
+            return position
+
+
+def find_chunks(filename, annot_type, chunks, min_size=None):
+
+    """
+    Function to split a GTF/GFF3 file into byte ranges of approximately equal size.
+    Compressed files and files smaller than the minimum size are never split.
+    :param filename: the name of the file.
+    :type filename: str
+
+    :param annot_type: the type of the file, either "gtf" or "gff3".
+    :type annot_type: str
+
+    :param chunks: the maximum number of ranges to create.
+    :type chunks: int
+
+    :param min_size: the minimum size of a file to be split. Default: MIN_CHUNK_SIZE.
+    :type min_size: (int|None)
+
+    :returns: a list of (start, end) offsets
+    :rtype: list
+    """
+
+    if min_size is None:
+        min_size = MIN_CHUNK_SIZE
+    size = os.path.getsize(filename)
+    if chunks <= 1 or size < min_size or filename.endswith((".gz", ".bz2")):
+        return [(0, size)]
+
+    starts = [0]
+    with open(filename, "rb") as handle:
+        for index in range(1, chunks):
+            target = max(size * index // chunks, starts[-1] + 1)
+            boundary = _next_boundary(handle, target, annot_type)
+            if boundary is None:
+                break
+            starts.append(boundary)
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def open_chunk(filename, annot_type, chunk):
+
+    """
+    Function to open a parser over a byte range of a file.
+    :param filename: the name of the file.
+    :param annot_type: the type of the file, either "gtf" or "gff3".
+    :param chunk: the (start, end) offsets of the range.
+    :rtype: (Mikado.parsers.GTF.GTF | Mikado.parsers.GFF.GFF3)
+    """
+
+    handle = FileChunk(filename, *chunk)
+    if annot_type == "gff3":
+        return GFF.GFF3(handle)
+    return GTF.GTF(handle)
@@ -2,34 +2,61 @@ import os
 import sys
 import tempfile
 import gc
-from .checking import create_transcript, CheckingProcess
-from .annotation_parser import AnnotationParser, load_from_gtf, load_from_gff
-import operator
+from .checking import create_transcript, CheckingProcess, batch_sequences, BATCH_SIZE, MAX_WINDOW
+from .annotation_parser import AnnotationParser, load_from_gtf, load_from_gff, merge_records
+from .chunking import find_chunks
+from .transcript_store import TranscriptStore, max_records
+from .redundancy import Candidate, clusters, remove_redundant
 import collections
 import io
 from .. import exceptions
 import logging.handlers
-import random
 import functools
+import heapq
 import multiprocessing
 import multiprocessing.connection
 import multiprocessing.sharedctypes
-import pyfaidx
-import shelve
 import logging
 from ..utilities import path_join, to_gff, merge_partial
-from collections import Counter
+from ..utilities.genome_cache import get_genome
 
 __author__ = 'Luca Venturini'
 
 
-def store_transcripts(shelf_stacks, logger, min_length=0):
+def _positions(store_name, store, priority, logger, min_length=0):
 
     """
-    Function that analyses the exon lines from the original file
-    and organises the data into a proper dictionary.
-    :param shelf_stacks: dictionary containing the name and the handles of the shelf DBs
-    :type shelf_stacks: dict
+    Private function to iterate over the sorted positions of the valid transcripts in a store.
+    :returns: (chrom, Candidate) tuples.
+    """
+
+    for tid, chrom, start, end, tlength, chain in store.positions():
+        if start is None:
+            logger.warning("No valid exon feature for %s, continuing", tid)
+            continue
+
+        # Discard transcript under a certain size
+        if tlength < min_length:
+            logger.debug("Discarding %s because its size (%d) is under the minimum of %d",
+                         tid, tlength, min_length)
+            continue
+
+        yield chrom, Candidate(start, end, chain, priority, tid, store_name)
+
+
+def store_transcripts(stores, logger, min_length=0, remove_contained=False, tolerance=0):
+
+    """
+    Function that analyses the transcripts in the stores, removes the redundant ones
+    and yields the others sorted by position.
+    Each store is already sorted on disk, so the transcripts are merged from the stores
+    as a stream, and in this phase only the current cluster of overlapping transcripts
+    is kept in memory.
+    When more transcripts are redundant, the one to retain is chosen deterministically,
+    preferring the transcripts from the input files which come first.
+    :param stores: dictionary containing the name and the handles of the transcript stores,
+    in the order of the input files.
+    :type stores: dict
 
     :param logger: logger instance.
     :type logger: logging.Logger
@@ -38,82 +65,64 @@ def store_transcripts(shelf_stacks, logger, min_length=0):
     If it is not met, the transcript will be discarded.
     :type min_length: int
 
-    :return: transcripts: dictionary which will be the final output
-    :rtype: transcripts
+    :param remove_contained: flag. If set, transcripts contained within another transcript
+    with the same intron chain will be discarded as well.
+    :type remove_contained: bool
+
+    :param tolerance: the maximum number of bases by which a contained transcript can
+    extend past the ends of its container.
+    :type tolerance: int
+
+    :return: lists of [(tid, store name), chrom, (start, end)]
+    """
+
+    positions = heapq.merge(
+        *[_positions(store_name, store, priority, logger, min_length=min_length)
+          for priority, (store_name, store) in enumerate(stores.items())],
+        key=lambda position: (position[0], position[1].start, position[1].end))
+
+    total, retained, current = 0, 0, None
+    for chrom, cluster in clusters(positions, tolerance=tolerance):
+        if chrom != current:
+            logger.debug("Starting with %s", chrom)
+            current = chrom
+        total += len(cluster)
+        for candidate in remove_redundant(cluster, logger,
+                                          remove_contained=remove_contained,
+                                          tolerance=tolerance):
+            retained += 1
+            yield [(candidate.tid, candidate.store), chrom, (candidate.start, candidate.end)]
+
+    logger.info("%d redundant transcripts removed, %d retained", total - retained, retained)
+
+
+def _batch_keys(keys, stores, batch_size=BATCH_SIZE, max_window=MAX_WINDOW):
+
+    """
+    Private function to group the sorted transcripts into batches of neighbouring transcripts,
+    on the same chromosome and within a genomic window of limited size.
+    :param keys: sorted lists of [(tid, store name), chrom, (start, end)]
+    :param stores: dictionary containing the name and the handles of the transcript stores
+    :param batch_size: maximum number of transcripts per batch.
+    :param max_window: maximum size of the genomic window spanned by a batch.
+    :returns: (chrom, batch) tuples, where the batch is a list of (lines, start, end, counter) tuples.
     """
 
-    transcripts = collections.defaultdict(dict)
-
-    for shelf_name, exon_lines in shelf_stacks.items():
-        for tid in exon_lines:
-            if "features" not in exon_lines[tid]:
-                raise KeyError("{0}: {1}\n{2}".format(tid, "features", exon_lines[tid]))
-
-            if ("exon" not in exon_lines[tid]["features"] or
-                    len(exon_lines[tid]["features"]["exon"]) == 0):
-                logger.warning("No valid exon feature for %s, continuing", tid)
-
-            chrom = exon_lines[tid]["chrom"]
-            start = min((_[0] for _ in exon_lines[tid]["features"]["exon"]))
-            end = max((_[1] for _ in exon_lines[tid]["features"]["exon"]))
-            tlength = sum(exon[1] + 1 - exon[0] for exon in exon_lines[tid]["features"]["exon"])
-            # Discard transcript under a certain size
-            if tlength < min_length:
-                logger.debug("Discarding %s because its size (%d) is under the minimum of %d",
-                             tid, tlength, min_length)
-                continue
-
-            if (start, end) not in transcripts[chrom]:
-                transcripts[chrom][(start, end)] = []
-            transcripts[chrom][(start, end)].append((tid, shelf_name))
-
-    # logger.info("Starting to sort %d transcripts", len(exon_lines))
-    # keys = []
-    # counter = 0
-
-    for chrom in sorted(transcripts.keys()):
-
-        logger.debug("Starting with %s (%d positions)",
-                     chrom,
-                     len(transcripts[chrom]))
-
-        for key in sorted(transcripts[chrom].keys(),
-                          key=operator.itemgetter(0, 1)):
-            tids = transcripts[chrom][key]
-            if len(tids) > 1:
-                exons = collections.defaultdict(list)
-                for tid, shelf in tids:
-                    exon_set = tuple(sorted(
-                        [(exon[0], exon[1], shelf_stacks[shelf][tid]["strand"]) for exon in
-                         shelf_stacks[shelf][tid]["features"]["exon"]],
-                        key=operator.itemgetter(0, 1)))
-                    exons[exon_set].append((tid, shelf))
-                tids = []
-                logger.debug("%d intron chains for pos %s",
-                             len(exons), "{}:{}-{}".format(chrom, key[0], key[1]))
-                for tid_list in exons.values():
-                    if len(tid_list) > 1:
-                        logger.debug("The following transcripts are redundant: %s",
-                                     ",".join([_[0] for _ in tid_list]))
-                        to_keep = random.choice(tid_list)
-                        logger.debug("Keeping only %s out of the list",
-                                     to_keep)
-                        tids.append(to_keep)
-                    else:
-                        tids.extend(tid_list)
-
-            # seq = chrom_seq[key[0]-1:key[1]]
-            for tid in tids:
-                # counter += 1
-                yield [tid, chrom, key]
-            # keys.extend([tid, seq] for tid in tids)
-
-    # logger.info("Finished to sort %d transcripts, %d remain", len(exon_lines), counter)
-
-    # return keys
-
-
-def perform_check(keys, shelve_stacks, args, logger):
+    batch, batch_chrom, batch_start, batch_end = [], None, None, None
+    for counter, ((tid, store_name), chrom, (start, end)) in enumerate(keys, 1):
+        if batch and (chrom != batch_chrom or len(batch) >= batch_size or
+                      max(batch_end, end) - batch_start + 1 > max_window):
+            yield batch_chrom, batch
+            batch = []
+        if not batch:
+            batch_chrom, batch_start, batch_end = chrom, start, end
+        batch_end = max(batch_end, end)
+        batch.append((stores[store_name][tid], start, end, counter))
+    if batch:
+        yield batch_chrom, batch
+
+
+def perform_check(keys, stores, args, logger):
 
     """
     This is the most important method. After preparing the data structure,
@@ -122,7 +131,7 @@ def perform_check(keys, shelve_stacks, args, logger):
     This is also the point at which we start using multithreading, if
     so requested.
     :param keys: sorted list of [tid, sequence]
-    :param shelve_stacks: dictionary containing the name and the handles of the shelf DBs
+    :param stores: dictionary containing the name and the handles of the transcript stores
     :param args: the namespace
     :param logger: logger
     :return:
@@ -144,24 +153,25 @@ def perform_check(keys, shelve_stacks, args, logger):
             canonical_splices=args.json_conf["prepare"]["canonical"],
             logger=logger)
 
-        for tid, chrom, key in keys:
-            tid, shelf_name = tid
-            transcript_object = partial_checker(
-                shelve_stacks[shelf_name][tid],
-                str(args.json_conf["reference"]["genome"][chrom][key[0]-1:key[1]]),
-                key[0], key[1],
-                strand_specific=shelve_stacks[shelf_name][tid]["strand_specific"])
-            if transcript_object is None:
-                continue
-            counter += 1
-            if counter >= 10**4 and counter % (10**4) == 0:
-                logger.info("Retrieved %d transcript positions", counter)
-            elif counter >= 10**3 and counter % (10**3) == 0:
-                logger.debug("Retrieved %d transcript positions", counter)
-            print(transcript_object.format("gtf"),
-                  file=args.json_conf["prepare"]["files"]["out"])
-            print(transcript_object.fasta,
-                  file=args.json_conf["prepare"]["files"]["out_fasta"])
+        for chrom, batch in _batch_keys(keys, stores):
+            for lines, sequence, start, end, _ in batch_sequences(
+                    args.json_conf["reference"]["genome"], chrom, batch):
+                transcript_object = partial_checker(
+                    lines,
+                    sequence,
+                    start, end,
+                    strand_specific=lines["strand_specific"])
+                if transcript_object is None:
+                    continue
+                counter += 1
+                if counter >= 10**4 and counter % (10**4) == 0:
+                    logger.info("Retrieved %d transcript positions", counter)
+                elif counter >= 10**3 and counter % (10**3) == 0:
+                    logger.debug("Retrieved %d transcript positions", counter)
+                print(transcript_object.format("gtf"),
+                      file=args.json_conf["prepare"]["files"]["out"])
+                print(transcript_object.fasta,
+                      file=args.json_conf["prepare"]["files"]["out_fasta"])
     else:
         # pylint: disable=no-member
 
@@ -178,16 +188,15 @@ def perform_check(keys, shelve_stacks, args, logger):
             lenient=args.json_conf["prepare"]["lenient"],
             # strand_specific=args.json_conf["prepare"]["strand_specific"],
             canonical_splices=args.json_conf["prepare"]["canonical"],
+            memory_map=args.json_conf["reference"].get("memory_map", False),
             log_level=args.level) for _ in range(args.procs)]
 
         [_.start() for _ in working_processes]
 
-        for counter, keys in enumerate(keys):
-            tid, chrom, (pos) = keys
-            tid, shelf_name = tid
-            submission_queue.put((shelve_stacks[shelf_name][tid], pos[0], pos[1], counter + 1))
+        for chrom, batch in _batch_keys(keys, stores):
+            submission_queue.put((chrom, batch))
 
-        submission_queue.put(tuple(["EXIT"]*4))
+        submission_queue.put(("EXIT", "EXIT"))
 
         [_.join() for _ in working_processes]
 
@@ -213,52 +222,138 @@ def perform_check(keys, shelve_stacks, args, logger):
     return
 
 
-def load_exon_lines(args, shelve_names, logger):
+def _split_inputs(args, store_names, logger):
+
+    """
+    Private function to create the tasks for the AnnotationParser processes. Large input files
+    are split into chunks, each of which is parsed into its own store.
+    :param args: the Namespace from the command line.
+    :param store_names: list of names of the transcript store files.
+    :param logger: the logger instance.
+    :returns: the list of the tasks, and a dictionary of the chunked files, with the
+    store of the file as key and the file name, label, type and additional chunk stores as values.
+    :rtype: (list, dict)
+    """
+
+    tasks, split_files = [], dict()
+    for new_store, label, strand_specific, gff_name in zip(
+            store_names,
+            args.json_conf["prepare"]["files"]["labels"],
+            args.json_conf["prepare"]["files"]["strand_specific_assemblies"],
+            args.json_conf["prepare"]["files"]["gff"]):
+        gff_handle = to_gff(gff_name)
+        annot_type = gff_handle.__annot_type__
+        gff_handle.close()
+        chunks = find_chunks(gff_name, annot_type, args.procs)
+        if len(chunks) == 1:
+            tasks.append((label, gff_name, strand_specific, new_store, None))
+            continue
+        logger.info("Splitting %s into %d chunks", gff_name, len(chunks))
+        # The first chunk is loaded directly into the store of the file
+        chunk_stores = [new_store] + [
+            os.path.join(args.tempdir.name, "{0}.{1}".format(os.path.basename(new_store), index))
+            for index in range(1, len(chunks))]
+        split_files[new_store] = (gff_name, label, annot_type, chunk_stores[1:])
+        tasks.extend((label, gff_name, strand_specific, chunk_store, (annot_type, chunk))
+                     for chunk_store, chunk in zip(chunk_stores, chunks))
+    return tasks, split_files
+
+
+def _max_records(args, parsers):
+
+    """
+    Private function to calculate how many transcript records each annotation parser can keep
+    in memory, dividing the memory ceiling of the configuration between the parsers.
+    :param args: the Namespace from the command line.
+    :param parsers: the number of parsers running at the same time.
+    :rtype: int
+    """
+
+    cache_size = args.json_conf["prepare"]["store_cache_size"]
+    return max_records((cache_size * 1024 // max(parsers, 1)) if cache_size > 0 else None)
+
+
+def _check_redundant(args, store_names, logger):
+
+    """
+    Private function to verify that no transcript ID is present in more than one input file.
+    The stores are joined two at a time on disk, rather than collecting all the IDs in memory.
+    :param args: the Namespace from the command line.
+    :param store_names: list of names of the transcript store files.
+    :param logger: the logger instance.
+    """
+
+    for index, store_name in enumerate(store_names):
+        with TranscriptStore(store_name, flag="r") as store:
+            for previous in range(index):
+                tid = store.shared(store_names[previous])
+                if tid is None:
+                    continue
+                files = args.json_conf["prepare"]["files"]["gff"]
+                if set(args.json_conf["prepare"]["files"]["labels"]) == {""}:
+                    exception = exceptions.RedundantNames(
+                        """{0} is present both in {1} and in {2}; this will cause unsolvable collisions.
+                        Please repeat using distinct labels for your input files. Aborting.""".format(
+                            tid, files[previous], files[index]))
+                else:
+                    exception = exceptions.RedundantNames(
+                        """{0} is present both in {1} and in {2}, even if unique labels were provided.
+                        Please try to repeat with a different and more unique set of labels. Aborting.""".format(
+                            tid, files[previous], files[index]))
+                logger.exception(exception)
+                raise exception
+
+
+def load_exon_lines(args, store_names, logger):
 
     """This function loads all exon lines from the GFF inputs into a
      defaultdict instance.
     :param args: the Namespace from the command line.
-    :param shelve_names: list of names of the shelf DB files.
+    :param store_names: list of names of the transcript store files.
     :param logger: the logger instance.
     :type logger: logging.Logger
     :return: exon_lines
     :rtype: collections.defaultdict[list]
     """
 
-    threads = min([len(args.json_conf["prepare"]["files"]["gff"]), args.procs])
     strip_cds = args.json_conf["prepare"]["strip_cds"]
+    if args.json_conf["prepare"]["single"] is False and args.procs > 1:
+        tasks, split_files = _split_inputs(args, store_names, logger)
+    else:
+        tasks, split_files = [], dict()
+    threads = min([len(tasks), args.procs])
 
-    if args.json_conf["prepare"]["single"] is True or threads == 1:
+    if threads <= 1:
 
         logger.info("Starting to load lines from %d files (single-threaded)",
                     len(args.json_conf["prepare"]["files"]["gff"]))
-        previous_file_ids = collections.defaultdict(set)
-        for new_shelf, label, strand_specific, gff_name in zip(
-                shelve_names,
+        records = _max_records(args, 1)
+        for new_store, label, strand_specific, gff_name in zip(
+                store_names,
                 args.json_conf["prepare"]["files"]["labels"],
                 args.json_conf["prepare"]["files"]["strand_specific_assemblies"],
                 args.json_conf["prepare"]["files"]["gff"]):
             logger.info("Starting with %s", gff_name)
             gff_handle = to_gff(gff_name)
-            found_ids = set.union(set(), *previous_file_ids.values())
+            # Redundant IDs among the files are checked on the stores once all files are loaded
             if gff_handle.__annot_type__ == "gff3":
-                new_ids = load_from_gff(new_shelf,
-                                        gff_handle,
-                                        label,
-                                        found_ids,
-                                        logger,
-                                        strip_cds=strip_cds,
-                                        strand_specific=strand_specific)
+                load_from_gff(new_store,
+                              gff_handle,
+                              label,
+                              set(),
+                              logger,
+                              strip_cds=strip_cds,
+                              strand_specific=strand_specific,
+                              max_records=records)
             else:
-                new_ids = load_from_gtf(new_shelf,
-                                        gff_handle,
-                                        label,
-                                        found_ids,
-                                        logger,
-                                        strip_cds=strip_cds,
-                                        strand_specific=strand_specific)
-
-            previous_file_ids[gff_handle.name] = new_ids
+                load_from_gtf(new_store,
+                              gff_handle,
+                              label,
+                              set(),
+                              logger,
+                              strip_cds=strip_cds,
+                              strand_specific=strand_specific,
+                              max_records=records)
     else:
         logger.info("Starting to load lines from %d files (using %d processes)",
                     len(args.json_conf["prepare"]["files"]["gff"]), threads)
@@ -269,41 +364,48 @@ def load_exon_lines(args, shelve_names, logger):
             args.logging_queue,
             _ + 1,
             log_level=args.level,
-            strip_cds=strip_cds) for _ in range(threads)]
+            strip_cds=strip_cds,
+            max_records=_max_records(args, threads)) for _ in range(threads)]
 
         [_.start() for _ in working_processes]
-        for new_shelf, label, strand_specific, gff_name in zip(
-                shelve_names,
-                args.json_conf["prepare"]["files"]["labels"],
-                args.json_conf["prepare"]["files"]["strand_specific_assemblies"],
-                args.json_conf["prepare"]["files"]["gff"]):
-
-            submission_queue.put((label, gff_name, strand_specific, new_shelf))
+        for task in tasks:
+            submission_queue.put(task)
 
-        submission_queue.put(("EXIT", "EXIT", "EXIT", "EXIT"))
+        submission_queue.put(("EXIT", "EXIT", "EXIT", "EXIT", "EXIT"))
 
         [_.join() for _ in working_processes]
 
-        tid_counter = Counter()
-        for shelf in shelve_names:
-            with shelve.open(shelf, flag="r") as shelf_handle:
-                tid_counter.update(shelf_handle.keys())
-                if tid_counter.most_common()[0][1] > 1:
-                    if set(args.json_conf["prepare"]["files"]["labels"]) == {""}:
-                        exception = exceptions.RedundantNames(
-                            """Found redundant names during multiprocessed file analysis.
-                            Please repeat using distinct labels for your input files. Aborting.""")
-                    else:
-                        exception = exceptions.RedundantNames(
-                            """Found redundant names during multiprocessed file analysis, even if
-                            unique labels were provided. Please try to repeat with a different and
-                            more unique set of labels. Aborting.""")
+        for new_store, (gff_name, label, annot_type, chunk_stores) in split_files.items():
+            label_string = " (label: {0})".format(label) if label != "" else ""
+            # A missing store means that the parsing of its chunk failed
+            missing = [_ for _ in [new_store] + chunk_stores if not os.path.exists(_)]
+            if len(missing) > 0:
+                exception = exceptions.InvalidAssembly(
+                    "Failed to parse {0} out of {1} chunks of {2}{3}!".format(
+                        len(missing), len(chunk_stores) + 1, gff_name, label_string))
+                logger.exception(exception)
+                raise exception
+            with TranscriptStore(new_store, flag="w") as store:
+                store.merge(chunk_stores, functools.partial(merge_records, name=gff_name, label=label),
+                            logger=logger)
+                # GFF3 exons still without their mRNA after the merge have none in the whole file
+                orphan = next(store.orphans(), None) if annot_type == "gff3" else None
+                if orphan is not None:
+                    exception = exceptions.InvalidAssembly(
+                        "No mRNA line found for {0} in {1}{2}!".format(orphan, gff_name, label_string))
+                    logger.exception(exception)
+                    raise exception
+                if len(store) == 0:
+                    exception = exceptions.InvalidAssembly(
+                        "No valid transcripts found in {0}{1}!".format(gff_name, label_string))
                     logger.exception(exception)
                     raise exception
 
         del working_processes
         gc.collect()
 
+    _check_redundant(args, store_names, logger)
+
     logger.info("Finished loading lines from %d files",
                 len(args.json_conf["prepare"]["files"]["gff"]))
 
@@ -341,8 +443,8 @@ def prepare(args, logger):
             (member in args.json_conf["prepare"]["files"]["strand_specific_assemblies"])
             for member in args.json_conf["prepare"]["files"]["gff"]]
 
-    shelve_names = [path_join(args.json_conf["prepare"]["files"]["output_dir"],
-                              "mikado_shelf_{}.shelf".format(str(_).zfill(5))) for _ in
+    store_names = [path_join(args.json_conf["prepare"]["files"]["output_dir"],
+                             "mikado_store_{}.db".format(str(_).zfill(5))) for _ in
                     range(len(args.json_conf["prepare"]["files"]["gff"]))]
 
     logger.propagate = False
@@ -366,13 +468,15 @@ def prepare(args, logger):
         args.json_conf["prepare"]["files"]["out"]), 'w')
 
     logger.info("Loading reference file")
-    args.json_conf["reference"]["genome"] = pyfaidx.Fasta(args.json_conf["reference"]["genome"])
+    args.json_conf["reference"]["genome"] = get_genome(
+        args.json_conf["reference"]["genome"],
+        memory_map=args.json_conf["reference"].get("memory_map", False))
 
     logger.info("Finished loading genome file")
     logger.info("Started loading exon lines")
 
     try:
-        load_exon_lines(args, shelve_names, logger)
+        load_exon_lines(args, store_names, logger)
 
         logger.info("Finished loading exon lines")
 
@@ -380,22 +484,24 @@ def prepare(args, logger):
         sorter = functools.partial(
             store_transcripts,
             logger=logger,
-            min_length=args.json_conf["prepare"]["minimum_length"]
+            min_length=args.json_conf["prepare"]["minimum_length"],
+            remove_contained=args.json_conf["prepare"]["remove_contained"],
+            tolerance=args.json_conf["prepare"]["contained_tolerance"]
         )
 
+        # The memory available for caching is divided between the stores
+        cache_size = args.json_conf["prepare"]["store_cache_size"]
+        cache_size = (cache_size * 1024 // len(store_names)) if cache_size > 0 else None
         try:
-            shelf_stacks = dict((_, shelve.open(_, flag="r")) for _ in shelve_names)
+            stores = collections.OrderedDict(
+                (_, TranscriptStore(_, flag="r", cache_size=cache_size)) for _ in store_names)
         except Exception as exc:
-            raise TypeError((shelve_names, exc))
-        perform_check(sorter(shelf_stacks), shelf_stacks, args, logger)
+            raise TypeError((store_names, exc))
+        perform_check(sorter(stores), stores, args, logger)
+        [store.close() for store in stores.values()]
     except Exception as exc:
         logger.exception(exc)
-        for fn in os.listdir(args.json_conf["prepare"]["files"]["output_dir"]):
-            if ("shelf" in fn and
-                    (path_join(args.json_conf["prepare"]["files"]["output_dir"], fn) in shelve_names or
-                     path_join(args.json_conf["prepare"]["files"]["output_dir"],
-                              os.path.splitext(os.path.basename(fn))[0]) in shelve_names)):
-                os.remove(path_join(args.json_conf["prepare"]["files"]["output_dir"], os.path.basename(fn)))
+        [os.remove(_) for _ in store_names if os.path.exists(_)]
 
         logger.error("Mikado has encountered an error, exiting")
         sys.exit(1)
@@ -408,12 +514,7 @@ def prepare(args, logger):
         args.listener.enqueue_sentinel()
 
     logger.setLevel(logging.INFO)
-    for fn in os.listdir(args.json_conf["prepare"]["files"]["output_dir"]):
-        if ("shelf" in fn and
-                (path_join(args.json_conf["prepare"]["files"]["output_dir"], fn) in shelve_names or
-                         path_join(args.json_conf["prepare"]["files"]["output_dir"],
-                                   os.path.splitext(os.path.basename(fn))[0]) in shelve_names)):
-            os.remove(path_join(args.json_conf["prepare"]["files"]["output_dir"], os.path.basename(fn)))
+    [os.remove(_) for _ in store_names if os.path.exists(_)]
     logger.info("Finished")
     sys.exit(0)
     # for handler in logger.handlers:
@@ -0,0 +1,133 @@
+# coding: utf-8
+
+"""
+This module contains the functions used by Mikado prepare to remove the redundant transcripts
+before they are checked. Each transcript is reduced to a hash of its strand and intron chain,
+computed once when the transcript is stored; transcripts with the same coordinates and hash
+are identical, and only one of them is retained. Optionally, transcripts contained within
+another transcript with the same intron chain (or within another monoexonic transcript on the
+same strand) can be removed as well.
+The transcripts are read as a sorted stream, and only the clusters of overlapping transcripts
+are kept in memory, one at a time.
+The choice of the transcript to retain is deterministic: longer transcripts are preferred,
+then transcripts from the input files which come first in the configuration, and finally
+transcripts with the lexicographically lowest ID.
+"""
+
+import collections
+import hashlib
+import operator
+from ..utilities.intervaltree import IntervalTree
+
+__author__ = 'Luca Venturini'
+
+
+Candidate = collections.namedtuple("Candidate", ["start", "end", "chain", "priority", "tid", "store"])
+
+
+def chain_hash(strand, exons):
+
+    """
+    Function to calculate the hash of the intron chain of a transcript, together with its strand.
+    The hash is stable across processes and runs.
+    :param strand: the strand of the transcript.
+    :param exons: the exons of the transcript, in any order.
+    :type exons: list
+
+    :rtype: bytes
+    """
+
+    exons = sorted(exons)
+    introns = [(first[1] + 1, second[0] - 1) for first, second in zip(exons, exons[1:])]
+    return hashlib.md5("{0}:{1}".format(strand, introns).encode()).digest()
+
+
+def clusters(positions, tolerance=0):
+
+    """
+    Function to group a sorted stream of transcripts into clusters of overlapping transcripts.
+    Only the current cluster is kept in memory.
+    :param positions: iterable of (chrom, Candidate) tuples, sorted by chromosome, start and end.
+    :param tolerance: transcripts which start within this distance from the end of the cluster
+    will be added to the cluster.
+    :type tolerance: int
+
+    :returns: (chrom, cluster) tuples.
+    """
+
+    cluster, cluster_chrom, cluster_end = [], None, None
+    for chrom, candidate in positions:
+        if cluster and (chrom != cluster_chrom or candidate.start > cluster_end + tolerance):
+            yield cluster_chrom, cluster
+            cluster = []
+        if not cluster:
+            cluster_chrom, cluster_end = chrom, candidate.end
+        cluster_end = max(cluster_end, candidate.end)
+        cluster.append(candidate)
+    if cluster:
+        yield cluster_chrom, cluster
+
+
+def _remove_contained(candidates, tolerance, logger):
+
+    """
+    Private function to remove, from a list of transcripts sharing the same intron chain,
+    those contained within another transcript.
+    """
+
+    retained = []
+    tree = IntervalTree()
+    for candidate in sorted(candidates, key=lambda _: (_.start - _.end, _.priority, _.tid)):
+        container = next((found for found in tree.find(candidate.start, candidate.end + 1)
+                          if found.start <= candidate.start + tolerance and
+                          found.end >= candidate.end - tolerance), None)
+        if container is not None:
+            logger.debug("%s is contained within %s, removing it", candidate.tid, container.tid)
+            continue
+        retained.append(candidate)
+        tree.insert(candidate.start, candidate.end + 1, candidate)
+    return retained
+
+
+def remove_redundant(candidates, logger, remove_contained=False, tolerance=0):
+
+    """
+    Function to remove the redundant transcripts from a cluster of transcripts on the same chromosome.
+    :param candidates: the transcripts of the cluster.
+    :type candidates: list[Candidate]
+
+    :param logger: logger instance.
+    :type logger: logging.Logger
+
+    :param remove_contained: flag. If set, transcripts contained within another with the same intron chain
+    will be removed as well.
+    :type remove_contained: bool
+
+    :param tolerance: the maximum distance by which the ends of a contained transcript can exceed
+    those of the container.
+    :type tolerance: int
+
+    :returns: the retained transcripts, sorted by position.
+    :rtype: list[Candidate]
+    """
+
+    identical = dict()
+    for candidate in candidates:
+        key = (candidate.start, candidate.end, candidate.chain)
+        if key not in identical:
+            identical[key] = candidate
+            continue
+        first, second = sorted([identical[key], candidate], key=operator.attrgetter("priority", "tid"))
+        logger.debug("%s and %s are redundant, keeping only %s", first.tid, second.tid, first.tid)
+        identical[key] = first
+
+    retained = list(identical.values())
+    if remove_contained is True:
+        chains = collections.defaultdict(list)
+        for candidate in retained:
+            chains[candidate.chain].append(candidate)
+        retained = []
+        for chain in chains.values():
+            retained.extend(_remove_contained(chain, tolerance, logger))
+
+    return sorted(retained, key=operator.attrgetter("start", "end", "priority", "tid"))
@@ -0,0 +1,360 @@
+# coding: utf-8
+
+"""
+This module contains the intermediate store used by Mikado prepare to hold the transcripts
+loaded from each input file. Each store is a SQLite database with one row per feature
+(exon, CDS, UTR, etc.), which the annotation parsers write as they read the file, and one row
+per transcript. In the latter, the coordinates needed to sort the transcripts and the hash of
+the intron chain needed to identify the redundant ones are kept in their own columns, while the
+rest of the record (attributes, parent, etc.) is serialised separately; the complete record is
+assembled again only when the transcript is checked.
+"""
+
+import os
+import pickle
+import sqlite3
+from .redundancy import chain_hash
+from ..utilities.log_utils import create_null_logger
+
+__author__ = 'Luca Venturini'
+
+
+_SCHEMA = ["""CREATE TABLE IF NOT EXISTS transcripts (
+    tid TEXT PRIMARY KEY,
+    chrom TEXT NOT NULL,
+    start INTEGER,
+    end INTEGER,
+    length INTEGER NOT NULL,
+    strand TEXT,
+    transcript_line INTEGER NOT NULL,
+    chain BLOB NOT NULL,
+    record BLOB NOT NULL)""",
+           """CREATE TABLE IF NOT EXISTS features (
+    tid TEXT NOT NULL,
+    feature TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL)"""]
+
+_INDEX = ["CREATE INDEX IF NOT EXISTS transcripts_position ON transcripts (chrom, start, end)",
+          "CREATE INDEX IF NOT EXISTS features_tid ON features (tid)"]
+
+# Number of features kept in memory before being written to the store
+_BUFFER_SIZE = 10**5
+# Number of transcript records kept in memory by the parsers, when no memory ceiling is given
+_RECORD_BUFFER = 10**5
+# Approximate size, in bytes, of a transcript record (ID, location and attributes) in memory
+_RECORD_SIZE = 1024
+
+
+def max_records(cache_size=None):
+
+    """
+    Function to calculate how many transcript records the annotation parsers can keep in memory
+    before writing them to the store.
+    :param cache_size: the memory available to each parser, in KiB, or None for the default.
+    :type cache_size: (int|None)
+
+    :rtype: int
+    """
+
+    if cache_size is None:
+        return _RECORD_BUFFER
+    return max(cache_size * 1024 // _RECORD_SIZE, 1)
+
+
+def _features(exon_lines):
+
+    """
+    Private function to iterate over the features of the transcript records, as rows of the store.
+    """
+
+    for tid, record in exon_lines.items():
+        if "features" not in record:
+            raise KeyError("{0}: {1}\n{2}".format(tid, "features", record))
+        for feature, intervals in record["features"].items():
+            for start, end in intervals:
+                yield tid, feature, start, end
+
+
+def _row(tid, record, exons, transcript_line):
+
+    """
+    Private function to convert a transcript record, as created by the annotation parsers,
+    into a row of the store.
+    :param exons: the exons of the transcript.
+    :param transcript_line: whether the transcript/mRNA line of the transcript was found,
+    rather than only its exons.
+    """
+
+    if exons:
+        start, end = min(_[0] for _ in exons), max(_[1] for _ in exons)
+    else:
+        start, end = None, None
+    length = sum(exon[1] + 1 - exon[0] for exon in exons)
+    record = dict((key, value) for key, value in record.items()
+                  if key not in ("features", "transcript_line"))
+    return (tid, record["chrom"], start, end, length, record["strand"], int(transcript_line),
+            chain_hash(record["strand"], exons),
+            pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class TranscriptStore:
+
+    """
+    Class representing the store of the transcripts loaded from a single input file.
+    It behaves like a read-only dictionary of the transcript records, keyed by transcript ID.
+    When pickled, only the file name is transferred and the store is opened again.
+    A new store which is not completed, because of an exception within its context, is deleted.
+    """
+
+    def __init__(self, filename, flag="r", cache_size=None):
+
+        """
+        :param filename: the name of the database file.
+        :type filename: str
+
+        :param flag: "r" to open an existing store, "w" to open an existing store for updating,
+        "n" to create a new, empty store.
+        :type flag: str
+
+        :param cache_size: optional maximum size, in KiB, of the page cache of the database.
+        :type cache_size: (int|None)
+        """
+
+        self.filename = filename
+        self.cache_size = cache_size
+        self.__new = (flag == "n")
+        self.__buffer = []
+        if flag == "n":
+            if os.path.exists(filename):
+                os.remove(filename)
+        elif flag not in ("r", "w"):
+            raise ValueError("Invalid flag for the transcript store: {0}".format(flag))
+        elif not os.path.exists(filename):
+            raise OSError("Transcript store not found: {0}".format(filename))
+        self.__connection = sqlite3.connect(filename)
+        if cache_size is not None:
+            # Negative values are interpreted by SQLite as KiB rather than pages
+            self.__connection.execute("PRAGMA cache_size = {0:d}".format(-max(cache_size, 1)))
+        if flag == "n":
+            # The store is temporary, so we can avoid the overhead of journaling
+            self.__connection.execute("PRAGMA journal_mode = OFF")
+            self.__connection.execute("PRAGMA synchronous = OFF")
+            [self.__connection.execute(_) for _ in _SCHEMA]
+
+    def __getstate__(self):
+        return {"filename": self.filename, "cache_size": self.cache_size}
+
+    def __setstate__(self, state):
+        self.__init__(state["filename"], flag="r", cache_size=state.get("cache_size"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is not None and self.__new is True:
+            self.remove()
+        else:
+            self.close()
+
+    def add_feature(self, tid, feature, start, end):
+
+        """
+        Method to add a feature of a transcript to the store. The features are written to disk
+        in batches, so that they are never all kept in memory; the transcripts themselves are
+        added with the write method, which also takes care of transcripts written before
+        all their features had been found.
+        :param tid: the transcript ID.
+        :param feature: the type of the feature, eg "exon".
+        :param start: the start of the feature.
+        :param end: the end of the feature.
+        """
+
+        self.__buffer.append((tid, feature, start, end))
+        if len(self.__buffer) >= _BUFFER_SIZE:
+            self.__flush()
+
+    def __flush(self):
+        with self.__connection:
+            self.__connection.executemany("INSERT INTO features VALUES (?, ?, ?, ?)", self.__buffer)
+        self.__buffer = []
+
+    def write(self, exon_lines, reconcile=None):
+
+        """
+        Method to add the transcripts to the store, and index them by position.
+        The features of each record are added to those already written with add_feature.
+        The parsers can write their records in batches: the records of transcripts already
+        in the store, whose lines were found again after they had been written, are passed
+        to the reconcile function together with the stored record.
+        :param exon_lines: a dictionary of the transcript records, keyed by transcript ID.
+        :type exon_lines: dict
+
+        :param reconcile: function that takes the transcript ID, the stored record and the new one,
+        and returns the merged record. If None, the transcripts must not be in the store already.
+        """
+
+        self.__flush()
+        with self.__connection:
+            self.__connection.executemany("INSERT INTO features VALUES (?, ?, ?, ?)", _features(exon_lines))
+            [self.__connection.execute(_) for _ in _INDEX]
+            rows = []
+            for tid, record in exon_lines.items():
+                previous = self.__connection.execute(
+                    "SELECT transcript_line FROM transcripts WHERE tid = ?", (tid,)).fetchone()
+                if previous is None or reconcile is None:
+                    rows.append(_row(tid, record, self.__exons(tid), record.get("transcript_line", False)))
+                    continue
+                # The features of both records are already in the store, under the same ID
+                merged = reconcile(tid, self[tid], dict(record, features=dict()))
+                self.__connection.execute(
+                    "REPLACE INTO transcripts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    _row(tid, merged, self.__exons(tid),
+                         previous[0] or record.get("transcript_line", False)))
+            self.__connection.executemany(
+                "INSERT INTO transcripts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def __exons(self, tid):
+        return [(start, end) for start, end in self.__connection.execute(
+            "SELECT start, end FROM features WHERE tid = ? AND feature = 'exon'", (tid,))]
+
+    def __features(self, tid, schema="main"):
+        features = dict()
+        for feature, start, end in self.__connection.execute(
+                "SELECT feature, start, end FROM {0}.features WHERE tid = ? ORDER BY rowid".format(schema),
+                (tid,)):
+            features.setdefault(feature, []).append((start, end))
+        return features
+
+    def merge(self, filenames, reconcile, logger=None):
+
+        """
+        Method to move into this store the transcripts of other stores (e.g. those created
+        by parsing different chunks of the same file), which are then deleted.
+        The transcripts present in both stores are passed to the reconcile function, unless
+        the transcript line is present again in the other store: as when parsing the file in
+        a single pass, in this case the transcript is considered as duplicated, and only its
+        first instance is retained.
+        :param filenames: the names of the other stores, in the order of the file.
+        :type filenames: list
+
+        :param reconcile: function that takes the transcript ID and the two records,
+        and returns the merged record.
+
+        :param logger: optional logger.
+        :type logger: logging.Logger
+        """
+
+        if logger is None:
+            logger = create_null_logger()
+
+        duplicated = set()
+        for filename in filenames:
+            self.__connection.execute("ATTACH DATABASE ? AS chunk", (filename,))
+            with self.__connection:
+                shared = self.__connection.execute(
+                    """SELECT chunk.transcripts.tid, chunk.transcripts.transcript_line, chunk.transcripts.record,
+                    main.transcripts.transcript_line FROM chunk.transcripts
+                    JOIN main.transcripts ON chunk.transcripts.tid = main.transcripts.tid""").fetchall()
+                for tid, transcript_line, record, previous_line in shared:
+                    if tid in duplicated:
+                        continue
+                    elif transcript_line:
+                        # This might sometimes happen in GMAP
+                        logger.warning("Multiple instance of %s found, skipping any subsequent entry", tid)
+                        duplicated.add(tid)
+                        continue
+                    record = pickle.loads(record)
+                    record["features"] = self.__features(tid, schema="chunk")
+                    merged = reconcile(tid, self[tid], record)
+                    self.__connection.execute("DELETE FROM main.features WHERE tid = ?", (tid,))
+                    self.__connection.executemany("INSERT INTO main.features VALUES (?, ?, ?, ?)",
+                                                  _features({tid: merged}))
+                    self.__connection.execute(
+                        "REPLACE INTO main.transcripts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        _row(tid, merged, merged["features"].get("exon", []), previous_line))
+                self.__connection.execute(
+                    """INSERT INTO main.features SELECT * FROM chunk.features
+                    WHERE tid NOT IN (SELECT tid FROM main.transcripts)""")
+                self.__connection.execute(
+                    """INSERT INTO main.transcripts SELECT * FROM chunk.transcripts
+                    WHERE tid NOT IN (SELECT tid FROM main.transcripts)""")
+            self.__connection.execute("DETACH DATABASE chunk")
+            os.remove(filename)
+
+    def shared(self, filename):
+
+        """
+        Method to find a transcript ID present both in this store and in another one,
+        through a join of the two stores rather than by loading their IDs in memory.
+        :param filename: the name of the other store.
+        :type filename: str
+
+        :returns: one of the shared IDs, or None if there is none.
+        :rtype: (str|None)
+        """
+
+        self.__connection.execute("ATTACH DATABASE ? AS other", (filename,))
+        try:
+            row = self.__connection.execute(
+                """SELECT main.transcripts.tid FROM main.transcripts
+                JOIN other.transcripts ON main.transcripts.tid = other.transcripts.tid LIMIT 1""").fetchone()
+        finally:
+            self.__connection.execute("DETACH DATABASE other")
+        return row[0] if row is not None else None
+
+    def orphans(self):
+
+        """
+        Method to iterate over the IDs of the transcripts for which neither the transcript line
+        nor the parent were found, e.g. GFF3 exons whose mRNA line is missing from the file.
+        """
+
+        for tid, record in self.__connection.execute(
+                "SELECT tid, record FROM transcripts WHERE transcript_line = 0"):
+            if pickle.loads(record).get("parent") is None:
+                yield tid
+
+    def __getitem__(self, tid):
+        row = self.__connection.execute(
+            "SELECT record FROM transcripts WHERE tid = ?", (tid,)).fetchone()
+        if row is None:
+            raise KeyError(tid)
+        record = pickle.loads(row[0])
+        record["features"] = self.__features(tid)
+        return record
+
+    def __contains__(self, tid):
+        return self.__connection.execute(
+            "SELECT 1 FROM transcripts WHERE tid = ?", (tid,)).fetchone() is not None
+
+    def __iter__(self):
+        return (row[0] for row in self.__connection.execute("SELECT tid FROM transcripts"))
+
+    def keys(self):
+        """Iterator over the IDs of the transcripts."""
+        return iter(self)
+
+    def __len__(self):
+        return self.__connection.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+
+    def positions(self):
+
+        """
+        Method to iterate over the positions of the transcripts, sorted by chromosome and coordinates.
+        Transcripts without exons have None as start and end.
+        :returns: tuples of (tid, chrom, start, end, length, chain)
+        """
+
+        return iter(self.__connection.execute(
+            "SELECT tid, chrom, start, end, length, chain FROM transcripts ORDER BY chrom, start, end"))
+
+    def close(self):
+        """Method to close the connection to the database."""
+        self.__connection.close()
+
+    def remove(self):
+        """Method to close the store and delete its file."""
+        self.close()
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
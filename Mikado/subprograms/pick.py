@@ -57,6 +57,14 @@ def check_run_options(args):
     if args.preload is True:
         args.json_conf["pick"]["run_options"]["preload"] = True
 
+    if args.shards is not None:
+        args.json_conf["pick"]["run_options"]["shards"] = args.shards
+
+    if args.checkpoint is True:
+        args.json_conf["pick"]["run_options"]["checkpoint"] = True
+    if args.resume is True:
+        args.json_conf["pick"]["run_options"]["resume"] = True
+
     args.json_conf["pick"]["run_options"]["single_thread"] = args.single
 
     if args.no_cds is not None:
@@ -93,7 +101,7 @@ def check_run_options(args):
     if args.intron_range is not None:
         args.json_conf["pick"]["run_options"]["intron_range"] = tuple(sorted(args.intron_range))
 
-    for key in ["loci_out", "gff", "monoloci_out", "subloci_out", "log"]:
+    for key in ["loci_out", "gff", "monoloci_out", "subloci_out", "timings_out", "log"]:
         if getattr(args, key):
             if key == "gff":
                 args.json_conf["pick"]["files"]["input"] = getattr(
@@ -155,6 +163,9 @@ def pick_parser():
                         Default: (60, 900)""")
     parser.add_argument("--subloci_out", type=str, default=None)
     parser.add_argument("--monoloci_out", type=str, default=None)
+    parser.add_argument("--timings_out", type=str, default=None,
+                        help="""Optional TSV file with the time spent by each superlocus
+                        in each stage of the analysis.""")
     parser.add_argument("--loci_out", type=str, default=None,
                         help="""This output file is mandatory.
                         If it is not specified in the configuration file,
@@ -182,6 +193,16 @@ def pick_parser():
                         help='''Flag. If set, the Mikado DB will be pre-loaded
                         into memory for faster access. WARNING: this option will
                         increase memory usage and the preloading might be quite slow.''')
+    parser.add_argument("--shards", type=int, default=None,
+                        help="""Number of independent regions in which to split the input GTF,
+                        so that each worker process can parse and analyse its own regions.
+                        Default: determined by the configuration file (0, disabled).""")
+    parser.add_argument("--checkpoint", action="store_true", default=False,
+                        help="""Flag. If set, the partial results will be kept in the output directory
+                        until the end of the run, so that an interrupted run can be resumed.""")
+    parser.add_argument("--resume", action="store_true", default=False,
+                        help="""Flag. If set, Mikado will resume an interrupted run from its checkpoint,
+                        skipping the superloci that had already been analysed. It implies --checkpoint.""")
     parser.add_argument("-db", "--sqlite-db", dest="sqlite_db",
                         default=None, type=str,
                         help="Location of an SQLite database to overwrite what is specified \
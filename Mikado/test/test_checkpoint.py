@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+from Mikado.picking.checkpoint import Checkpoint, CheckpointError, Journal, recover_journal
+from Mikado.picking.picker import _section_hash
+from Mikado.configuration import configurator
+import copy
+import unittest
+import tempfile
+import os
+
+__author__ = 'Luca Venturini'
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    """Tests for the checkpointing of multiprocessing Mikado pick runs."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tempdir.name, "checkpoint")
+        self.fingerprint = {"input": "input.gtf", "size": 100, "shards": False}
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def __write_worker(self, identifier, counters, interrupted=False):
+
+        handles = [open(os.path.join(self.directory, "{0}-{1}".format(name, identifier)), "wt")
+                   for name in ("loci.gff3", "loci.metrics.tsv")]
+        journal = Journal(self.directory, identifier, handles)
+        for counter in counters:
+            for handle in handles:
+                print("{0}/line".format(counter), file=handle)
+            journal.record(counter)
+        if interrupted is True:
+            # Superlocus written only in part, never recorded as completed
+            print("1000/partial", file=handles[0])
+        [_.close() for _ in handles]
+        journal.close()
+
+    def test_recover(self):
+
+        checkpoint = Checkpoint(self.directory, self.fingerprint)
+        self.assertEqual(checkpoint.previous_workers, 0)
+        self.__write_worker(1, [1, 3, 4], interrupted=True)
+        journal = os.path.join(self.directory, "journal-1")
+        with open(journal, "at") as handle:
+            print("5\t12", end="", file=handle)  # Incomplete line
+
+        self.assertEqual(recover_journal(journal), {1, 3, 4})
+        for name in ("loci.gff3", "loci.metrics.tsv"):
+            with open(os.path.join(self.directory, "{0}-1".format(name))) as partial:
+                self.assertEqual(partial.read(), "1/line\n3/line\n4/line\n")
+
+    def test_resume(self):
+
+        checkpoint = Checkpoint(self.directory, self.fingerprint)
+        self.assertEqual(checkpoint.register_workers(2), 2)
+        self.__write_worker(1, [1, 4], interrupted=True)
+        self.__write_worker(2, [2])
+
+        resumed = Checkpoint(self.directory, self.fingerprint, resume=True)
+        self.assertEqual(resumed.done, {1, 2, 4})
+        self.assertEqual(resumed.previous_workers, 2)
+        self.assertEqual(resumed.register_workers(3), 5)
+        with open(os.path.join(self.directory, "loci.gff3-1")) as partial:
+            self.assertEqual(partial.read(), "1/line\n4/line\n")
+
+        with self.assertRaises(CheckpointError):
+            Checkpoint(self.directory, {"input": "other.gtf", "size": 100, "shards": False}, resume=True)
+
+        # Without resuming, the previous checkpoint must be discarded
+        restarted = Checkpoint(self.directory, self.fingerprint)
+        self.assertEqual(restarted.done, set())
+        self.assertEqual(os.listdir(self.directory), [])
+        restarted.cleanup()
+        self.assertFalse(os.path.exists(self.directory))
+
+    def test_configuration_hash(self):
+
+        json_conf = configurator.to_json(None)
+        digest = _section_hash(json_conf["scoring"])
+        self.assertEqual(_section_hash(copy.deepcopy(json_conf["scoring"])), digest)
+        changed = copy.deepcopy(json_conf["scoring"])
+        changed["cdna_length"]["multiplier"] = 100
+        self.assertNotEqual(_section_hash(changed), digest)
+        pad = copy.deepcopy(json_conf["pick"])
+        pad["alternative_splicing"]["pad"] = not pad["alternative_splicing"]["pad"]
+        self.assertNotEqual(_section_hash(pad), _section_hash(json_conf["pick"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
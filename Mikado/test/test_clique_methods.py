@@ -1,7 +1,10 @@
 from Mikado.loci.clique_methods import find_cliques, find_communities
 from Mikado.loci.clique_methods import _get_unvisited_neighbours, reid_daid_hurley
 from Mikado.loci.clique_methods import define_graph
+from Mikado.loci.transcript import Transcript
+from itertools import combinations
 import networkx
+import random
 import unittest
 
 
@@ -80,5 +83,51 @@ class TestCliques(unittest.TestCase):
         with self.assertRaises(networkx.NetworkXError):
             _ = reid_daid_hurley(self.graph, 1)
 
+
+class TestDefineGraph(unittest.TestCase):
+
+    @staticmethod
+    def brute_force(objects, inters):
+
+        graph = networkx.Graph()
+        graph.add_nodes_from(objects.keys())
+        for obj, other_obj in combinations(objects.keys(), 2):
+            if inters(objects[obj], objects[other_obj]):
+                graph.add_edge(*tuple(sorted([obj, other_obj])))
+        return graph
+
+    def test_exons(self):
+
+        random.seed(1)
+        objects = dict()
+        for num in range(200):
+            start = random.randint(1, 10000)
+            objects[num] = (start, start + random.randint(0, 300))
+        objects[200] = (100, 200)
+        objects[201] = (200, 300)  # Touching
+        objects[202] = (301, 400)  # Adjacent but not touching
+
+        graph = define_graph(objects, inters=Transcript.is_intersecting)
+        correct = self.brute_force(objects, Transcript.is_intersecting)
+        self.assertEqual(sorted(graph.nodes()), sorted(correct.nodes()))
+        self.assertEqual(sorted(graph.edges()), sorted(correct.edges()))
+        self.assertIn(201, graph.neighbors(200))
+        self.assertNotIn(202, graph.neighbors(201))
+
+    def test_no_span(self):
+
+        objects = dict((num, str(num)) for num in range(10))
+        graph = define_graph(objects, inters=lambda first, second: int(first) % 2 == int(second) % 2)
+        self.assertEqual(graph.number_of_edges(), 20)
+
+    def test_kwargs(self):
+
+        objects = {"a": (10, 20), "b": (15, 30), "c": (100, 200)}
+        graph = define_graph(objects, inters=lambda first, second, flag=False: flag)
+        self.assertEqual(graph.number_of_edges(), 0)
+        graph = define_graph(objects, inters=lambda first, second, flag=False: flag, flag=True)
+        self.assertEqual(sorted(graph.edges()), [("a", "b")])
+
+
 if __name__ == '__main__':
     unittest.main()
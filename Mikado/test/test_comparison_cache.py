@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+from Mikado.loci import Transcript
+from Mikado.loci.comparison_cache import ComparisonCache
+from Mikado.scales.assigner import Assigner
+import unittest
+import pickle
+
+__author__ = 'Luca Venturini'
+
+
+class TestComparisonCache(unittest.TestCase):
+
+    """Tests for the memoisation of the comparisons between transcripts."""
+
+    @staticmethod
+    def __create(tid, exons):
+        transcript = Transcript()
+        transcript.chrom, transcript.strand, transcript.id = "Chr1", "+", tid
+        transcript.add_exons(exons)
+        transcript.finalize()
+        return transcript
+
+    def setUp(self):
+        self.t1 = self.__create("t1", [(101, 500), (801, 1000), (1201, 1600)])
+        self.t2 = self.__create("t2", [(101, 500), (801, 1000)])
+
+    def test_hits(self):
+
+        cache = ComparisonCache()
+        first, _ = cache.compare(self.t2, self.t1)
+        self.assertEqual(first.ccode, Assigner.compare(self.t2, self.t1)[0].ccode)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        self.assertIs(cache.compare(self.t2, self.t1)[0], first)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        # The comparison is not symmetrical
+        reverse, _ = cache.compare(self.t1, self.t2)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        self.assertNotEqual(reverse.ccode, first.ccode)
+        self.assertEqual(len(cache), 2)
+
+    def test_modified(self):
+
+        cache = ComparisonCache()
+        cache.compare(self.t2, self.t1)
+        # A transcript with the same ID but a different exon chain must be compared again
+        modified = self.__create("t2", [(101, 500), (801, 1000), (1201, 1400)])
+        result, _ = cache.compare(modified, self.t1)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+        self.assertEqual(result.ccode, Assigner.compare(modified, self.t1)[0].ccode)
+
+    def test_pickle(self):
+
+        cache = ComparisonCache()
+        cache.compare(self.t2, self.t1)
+        cache.compare(self.t2, self.t1)
+        copy = pickle.loads(pickle.dumps(cache))
+        self.assertEqual(len(copy), 0)
+        self.assertEqual((copy.hits, copy.misses), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+from Mikado.loci import expression_engine
+from Mikado.configuration import configurator
+import collections
+import unittest
+import pickle
+
+__author__ = 'Luca Venturini'
+
+
+class TestExpressionEngine(unittest.TestCase):
+
+    """Tests for the compiled filtering expressions."""
+
+    Metrics = collections.namedtuple("Metrics", ["cdna_length", "exon_num", "source"])
+
+    def setUp(self):
+        self.section = {
+            "expression": "(evaluated[\"exon_num.multi\"] and evaluated[\"cdna_length\"]) or "
+                          "not evaluated[\"exon_num.multi\"] and evaluated[\"source\"]",
+            "parameters": {"exon_num.multi": {"name": "exon_num", "operator": "gt", "value": 1},
+                           "cdna_length": {"name": "cdna_length", "operator": "ge", "value": 1000},
+                           "source": {"name": "source", "operator": "not in", "value": ["foo"]}}}
+        self.transcripts = {"t1": self.Metrics(1000, 2, "bar"),
+                            "t2": self.Metrics(500, 3, "bar"),
+                            "t3": self.Metrics(500, 1, "bar"),
+                            "t4": self.Metrics(1500, 1, "foo")}
+        self.tids = ["t1", "t2", "t3", "t4"]
+
+    def test_cache(self):
+
+        expression = expression_engine.get_expression(self.section)
+        self.assertIs(expression_engine.get_expression(dict(self.section)), expression)
+        self.assertIsNotNone(expression.vectorised)
+        self.assertIs(pickle.loads(pickle.dumps(expression)), expression)
+        changed = dict(self.section)
+        changed["parameters"] = dict(self.section["parameters"],
+                                     cdna_length={"name": "cdna_length", "operator": "ge", "value": 500})
+        self.assertIsNot(expression_engine.get_expression(changed), expression)
+
+    def test_evaluate(self):
+
+        expression = expression_engine.get_expression(self.section)
+        expected = [True, False, True, False]
+        self.assertEqual([expression.evaluate(self.transcripts[tid]) for tid in self.tids], expected)
+        self.assertEqual(expression.evaluate_all(self.transcripts, self.tids), expected)
+        self.assertEqual(expression.evaluate_all(self.transcripts, []), [])
+
+    def test_fallback(self):
+
+        # Non-numeric values for a comparison operator are evaluated one transcript at a time
+        transcripts = dict(self.transcripts)
+        transcripts["t5"] = self.Metrics("2000", 2, "bar")
+        expression = expression_engine.get_expression(self.section)
+        self.assertEqual(expression.evaluate_all(transcripts, ["t1", "t5"]), [True, True])
+
+        # Expressions with anything else than the logical operators are not vectorised
+        section = {"expression": "evaluated[\"cdna_length\"] == True",
+                   "parameters": {"cdna_length": {"name": "cdna_length", "operator": "ge", "value": 1000}}}
+        expression = expression_engine.get_expression(section)
+        self.assertIsNone(expression.vectorised)
+        self.assertEqual(expression.evaluate_all(self.transcripts, self.tids), [True, False, False, True])
+
+    def test_configuration(self):
+
+        json_conf = configurator.to_json(None)
+        for section in ("requirements", "not_fragmentary"):
+            with self.subTest(section=section):
+                expression = expression_engine.get_expression(json_conf[section])
+                self.assertIsNotNone(expression.vectorised)
+
+
+if __name__ == "__main__":
+    unittest.main()
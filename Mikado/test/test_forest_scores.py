@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+from Mikado.configuration import configurator
+from Mikado.loci import Transcript, Sublocus, Locus
+from Mikado.utilities.log_utils import create_null_logger
+from sklearn.ensemble import RandomForestClassifier
+import numpy
+import unittest
+
+__author__ = 'Luca Venturini'
+
+
+class TestForestScores(unittest.TestCase):
+
+    """Tests for the scoring of the transcripts with a random forest classifier."""
+
+    logger = create_null_logger("test_forest_scores")
+
+    @staticmethod
+    def __create(tid, exons):
+        transcript = Transcript()
+        transcript.chrom, transcript.strand, transcript.id = "Chr1", "+", tid
+        transcript.add_exons(exons)
+        transcript.finalize()
+        return transcript
+
+    def setUp(self):
+        self.json_conf = configurator.to_json(None)
+        if "requirements" in self.json_conf:
+            del self.json_conf["requirements"]
+        self.transcripts = [self.__create("t1", [(101, 500), (801, 1000), (1201, 1600)]),
+                            self.__create("t2", [(101, 500), (801, 1000), (1201, 1300), (1501, 2800)]),
+                            self.__create("t3", [(101, 500), (701, 1000)])]
+        state = numpy.random.RandomState(0)
+        training = state.rand(100, 2) * [3000, 5]
+        self.classifier = RandomForestClassifier(n_estimators=10, random_state=0)
+        self.classifier.fit(training, state.rand(100) > 0.5)
+        self.classifier.metrics = ["cdna_length", "exon_num"]
+
+    def __expected(self, transcripts):
+        # The score is the probability of the positive class, not the predicted class
+        return dict((transcript.id, self.classifier.predict_proba(
+            [[transcript.cdna_length, transcript.exon_num]])[0][1]) for transcript in transcripts)
+
+    def test_sublocus(self):
+
+        sublocus = Sublocus(self.transcripts[0], json_conf=self.json_conf, logger=self.logger)
+        for transcript in self.transcripts[1:]:
+            sublocus.add_transcript_to_locus(transcript)
+        sublocus.regressor = self.classifier
+        sublocus.calculate_scores()
+        self.assertEqual(dict((tid, sublocus.scores[tid]["score"]) for tid in sublocus.transcripts),
+                         self.__expected(self.transcripts))
+
+    def test_locus(self):
+
+        locus = Locus(self.transcripts[0], logger=self.logger)
+        locus.json_conf = self.json_conf
+        locus.regressor = self.classifier
+        locus.calculate_scores()
+        self.assertEqual(locus.scores["t1"]["score"], self.__expected(self.transcripts[:1])["t1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+from Mikado.utilities import genome_cache
+from Mikado.preparation.checking import batch_sequences, create_transcript
+import pickle
+import pyfaidx
+import random
+import tempfile
+import os
+import unittest
+
+__author__ = 'Luca Venturini'
+
+
+class TestGenomeCache(unittest.TestCase):
+
+    """Tests for the shared access to the genome sequence."""
+
+    @classmethod
+    def setUpClass(cls):
+        generator = random.Random(0)
+        cls.sequences = {"Chr1": "".join(generator.choice("ACGTacgtN") for _ in range(1000)),
+                         "Chr2": "".join(generator.choice("ACGT") for _ in range(77))}
+        cls.genome = tempfile.NamedTemporaryFile(mode="wt", suffix=".fa", delete=False)
+        for chrom, seq in cls.sequences.items():
+            print(">{}".format(chrom), file=cls.genome)
+            for pos in range(0, len(seq), 60):
+                print(seq[pos:pos + 60], file=cls.genome)
+        cls.genome.close()
+        cls.fasta = pyfaidx.Fasta(cls.genome.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fasta.close()
+        os.remove(cls.genome.name)
+        os.remove(cls.genome.name + ".fai")
+
+    def __check(self, cache):
+        generator = random.Random(1)
+        for _ in range(500):
+            chrom = generator.choice(sorted(self.sequences))
+            start = generator.randint(1, len(self.sequences[chrom]) + 10)
+            end = start + generator.randint(-5, 200)
+            with self.subTest(chrom=chrom, start=start, end=end):
+                self.assertEqual(cache.fetch(chrom, start, end),
+                                 str(self.fasta[chrom][start - 1:end]))
+
+    def test_windows(self):
+        cache = genome_cache.GenomeCache(self.genome.name, window_size=64, max_windows=3)
+        self.assertFalse(cache.memory_mapped)
+        self.__check(cache)
+        self.assertLessEqual(len(cache), 3)
+        self.assertEqual(cache.fetch("Chr1", 100, 300), self.sequences["Chr1"][99:300])
+        cache.close()
+
+    def test_memory_map(self):
+        cache = genome_cache.GenomeCache(self.genome.name, memory_map=True)
+        self.assertTrue(cache.memory_mapped)
+        self.__check(cache)
+        self.assertEqual(len(cache), 0)
+        cache.close()
+
+    def test_eviction(self):
+        cache = genome_cache.GenomeCache(self.genome.name, window_size=100, max_windows=2)
+        cache.fetch("Chr1", 1, 10)
+        cache.fetch("Chr1", 101, 110)
+        cache.fetch("Chr1", 1, 10)
+        cache.fetch("Chr1", 201, 210)
+        self.assertEqual(len(cache), 2)
+        # The least recently used window must be the one discarded
+        self.assertEqual([key for key in cache._GenomeCache__windows], [("Chr1", 0), ("Chr1", 2)])
+        cache.close()
+
+    def test_shared(self):
+        cache = genome_cache.get_genome(self.genome.name)
+        self.assertIs(genome_cache.get_genome(self.genome.name), cache)
+        self.assertIs(genome_cache.get_genome(self.fasta), cache)
+        self.assertIs(pickle.loads(pickle.dumps(cache)), cache)
+        self.assertIn("Chr2", cache)
+        self.assertEqual(cache.fetch("Chr2", 1, 77), self.sequences["Chr2"])
+        # The genome must be opened again when requested with a different access mode
+        mapped = genome_cache.get_genome(self.genome.name, memory_map=True)
+        self.assertIsNot(mapped, cache)
+        self.assertTrue(mapped.memory_mapped)
+        self.assertFalse(genome_cache.get_genome(self.genome.name).memory_mapped)
+        self.assertIs(pickle.loads(pickle.dumps(mapped)), mapped)
+
+    def test_views(self):
+        cache = genome_cache.GenomeCache(self.genome.name, window_size=64, max_windows=4)
+        region = cache.region("Chr1", 201, 900)
+        self.assertEqual(len(region), 700)
+        # Slicing the region must not read the whole of it
+        self.assertEqual(region[10:12], self.sequences["Chr1"][210:212])
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(region[:], self.sequences["Chr1"][200:900])
+        self.assertEqual(region[690:800], self.sequences["Chr1"][890:900])
+        self.assertEqual(len(cache.region("Chr2", 50, 100)), 28)
+        view = genome_cache.SequenceView("ACGTACGT", 2, 4)
+        self.assertEqual((len(view), view[0:2], view[1:], view[3:1]), (4, "GT", "TAC", ""))
+        with self.assertRaises(TypeError):
+            _ = view[0]
+        cache.close()
+
+    def test_batches(self):
+        cache = genome_cache.GenomeCache(self.genome.name)
+        lines = {"tid": "t1", "chrom": "Chr1", "strand": "+", "attributes": {}, "parent": "g1",
+                 "source": "test", "features": {"exon": [(101, 200), (301, 400)]}}
+        other = dict(lines, tid="t2", features={"exon": [(151, 250), (501, 600)]})
+        batch = [(lines, 101, 400, 1), (other, 151, 600, 2)]
+        for max_window in (1000, 100):
+            with self.subTest(max_window=max_window):
+                for record, sequence, start, end, counter in batch_sequences(cache, "Chr1", batch,
+                                                                            max_window=max_window):
+                    self.assertEqual(sequence[:], self.sequences["Chr1"][start - 1:end])
+                    transcript = create_transcript(record, sequence, start, end, lenient=True)
+                    exons = record["features"]["exon"]
+                    self.assertEqual("".join(transcript.fasta.split("\n")[1:]).upper(),
+                                     "".join(self.sequences["Chr1"][exon[0] - 1:exon[1]]
+                                             for exon in exons).upper())
+        cache.close()
+
+    def test_batches_past_end(self):
+        # Transcripts running past the end of the chromosome must be discarded by the check
+        cache = genome_cache.GenomeCache(self.genome.name)
+        lines = {"tid": "t1", "chrom": "Chr1", "strand": "+", "attributes": {}, "parent": "g1",
+                 "source": "test", "features": {"exon": [(901, 950), (991, 1100)]}}
+        batch = [(lines, 901, 1100, 1)]
+        for max_window in (1000, 100):
+            with self.subTest(max_window=max_window):
+                results = list(batch_sequences(cache, "Chr1", batch, max_window=max_window))
+                self.assertEqual(len(results), 1)
+                record, sequence, start, end, counter = results[0]
+                self.assertEqual(len(sequence), 100)
+                self.assertEqual(sequence[:], self.sequences["Chr1"][900:])
+                self.assertIsNone(create_transcript(record, sequence, start, end, lenient=True))
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+from Mikado.picking.junction_cache import JunctionCache
+from Mikado.serializers.junction import Junction, Chrom
+from Mikado.utilities.dbutils import DBBASE
+import sqlalchemy
+import unittest
+import pickle
+
+__author__ = 'Luca Venturini'
+
+
+class TestJunctionCache(unittest.TestCase):
+
+    """Tests for the per-process cache of the reliable junctions."""
+
+    def setUp(self):
+
+        self.engine = sqlalchemy.create_engine("sqlite:///:memory:")
+        DBBASE.metadata.create_all(self.engine, tables=[Chrom.__table__, Junction.__table__])
+        self.engine.execute(Chrom.__table__.insert(), [{"chrom_id": 1, "name": "Chr1"},
+                                                       {"chrom_id": 2, "name": "Chr2"},
+                                                       {"chrom_id": 3, "name": "Chr3"}])
+        junctions = [(1, 101, 200, "+"), (1, 101, 300, "-"), (1, 501, 600, "+"),
+                     (2, 101, 200, "-"), (3, 1001, 2000, "+"),
+                     (1, 50, 80, "-"), (1, 501, 600, "-")]
+        self.engine.execute(Junction.__table__.insert(),
+                            [{"chrom_id": chrom_id, "start": start - 10, "end": end + 10,
+                              "junction_start": start, "junction_end": end, "strand": strand}
+                             for chrom_id, start, end, strand in junctions])
+
+    def test_verify(self):
+
+        cache = JunctionCache(self.engine)
+        introns = [(101, 200), (101, 300), (50, 80), (201, 300), (501, 600)]
+        # Duplicated junctions: the last one in the database is kept
+        self.assertEqual(cache.verify("Chr1", introns),
+                         {(101, 200): "+", (101, 300): "-", (50, 80): "-", (501, 600): "-"})
+        self.assertEqual(cache.verify("Chr2", introns), {(101, 200): "-"})
+        self.assertEqual(cache.verify("Chr4", introns), dict())
+
+    def test_eviction(self):
+
+        cache = JunctionCache(self.engine, max_chroms=2)
+        first = cache.get_chrom("Chr1")
+        self.assertEqual(len(first), 4)
+        cache.get_chrom("Chr2")
+        self.assertIs(cache.get_chrom("Chr1"), first)
+        cache.get_chrom("Chr3")  # Chr2 is the least recently used, it must be evicted
+        self.assertIs(cache.get_chrom("Chr1"), first)
+        self.assertEqual(cache.verify("Chr3", [(1001, 2000)]), {(1001, 2000): "+"})
+
+    def test_pickle(self):
+
+        cache = JunctionCache(self.engine)
+        cache.get_chrom("Chr1")
+        copy = pickle.loads(pickle.dumps(cache))
+        self.assertIsNone(copy.engine)
+        self.assertEqual(copy.max_chroms, cache.max_chroms)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import os
+import unittest
+from Mikado.configuration import configurator
+from Mikado.loci import Transcript, Superlocus
+
+__author__ = 'Luca Venturini'
+
+
+class TestLocusAggregates(unittest.TestCase):
+
+    """Tests for the incremental maintenance of the locus-wide features, CDS coverage and CDS intron index."""
+
+    my_json = configurator.to_json(os.path.join(os.path.dirname(__file__), "configuration.yaml"))
+
+    @staticmethod
+    def __create(tid, exons, cds):
+        transcript = Transcript()
+        transcript.chrom, transcript.strand, transcript.id = "Chr1", "+", tid
+        transcript.add_exons(exons)
+        if cds:
+            transcript.add_exons(cds, features="CDS")
+        transcript.finalize()
+        return transcript
+
+    def setUp(self):
+        self.t1 = self.__create("t1", [(101, 500), (801, 1000), (1201, 1600)],
+                                [(201, 500), (801, 1000), (1201, 1420)])
+        self.t2 = self.__create("t2", [(101, 500), (801, 1000), (1201, 1300), (1501, 1800)],
+                                [(431, 500), (801, 1000), (1201, 1300), (1501, 1529)])
+        self.t3 = self.__create("t3", [(101, 500), (701, 1000)], [])
+
+    def __check(self, locus):
+        transcripts = list(locus.transcripts.values())
+        for feature in ("exons", "introns", "combined_cds_introns", "selected_cds_introns"):
+            expected = set.union(*[set(getattr(_, feature)) for _ in transcripts])
+            self.assertEqual(set(getattr(locus, feature)), expected, feature)
+        splices = set()
+        for transcript in transcripts:
+            splices.update(transcript.splices)
+        self.assertEqual(set(locus.splices), splices)
+
+    def test_add_remove(self):
+
+        locus = Superlocus(self.t1, json_conf=self.my_json)
+        locus.add_transcript_to_locus(self.t2)
+        locus.add_transcript_to_locus(self.t3)
+        self.__check(locus)
+        self.assertIn((801, 1000), locus.exons)
+
+        # (1201, 1300) and (1501, 1800) are only in t2, (801, 1000) is shared
+        locus.remove_transcript_from_locus("t2")
+        self.__check(locus)
+        self.assertNotIn((1501, 1800), locus.exons)
+        self.assertNotIn((1301, 1500), locus.introns)
+        self.assertIn((801, 1000), locus.exons)
+        locus.remove_transcript_from_locus("t1")
+        self.__check(locus)
+        self.assertEqual(locus.combined_cds_introns, set())
+
+    def test_cds_coverage(self):
+
+        locus = Superlocus(self.t1, json_conf=self.my_json)
+        locus.add_transcript_to_locus(self.t2)
+        self.assertEqual(locus._cds_coverage, (749, 749))
+        locus.add_transcript_to_locus(self.t3)
+        self.assertEqual(locus._cds_coverage, (749, 749))
+        locus.remove_transcript_from_locus("t1")
+        self.assertEqual(locus._cds_coverage, (399, 399))
+
+    def test_retained_index(self):
+
+        t4 = self.__create("t4", [(101, 500), (801, 1300)], [(201, 500), (801, 1010)])
+        locus = Superlocus(self.t1, json_conf=self.my_json)
+        locus.add_transcript_to_locus(t4)
+        index = locus._cds_intron_index
+        self.assertEqual(list(index.keys()), ["+"])
+        self.assertEqual(sorted((_.start, _.end, sorted(_.value)) for _ in index["+"].find(1, 2000)),
+                         [(501, 801, ["t1", "t4"]), (1001, 1201, ["t1"])])
+        # The last exon of t4 spans the (1001, 1200) CDS intron of t1
+        locus.find_retained_introns(t4)
+        self.assertEqual(t4.retained_introns, ((801, 1300),))
+        # Without t1, the only CDS intron left belongs to t4 itself
+        locus.remove_transcript_from_locus("t1")
+        self.assertEqual(len(locus._cds_intron_index["+"]), 1)
+        locus.find_retained_introns(t4)
+        self.assertEqual(t4.retained_introns, ())
+
+    def test_metrics(self):
+
+        locus = Superlocus(self.t1, json_conf=self.my_json)
+        locus.add_transcript_to_locus(self.t2)
+        locus.add_transcript_to_locus(self.t3)
+        locus.get_metrics()
+        # Each transcript must have its own fractions, not only the last one
+        self.assertAlmostEqual(locus.transcripts["t1"].intron_fraction, 2 / 4)
+        self.assertAlmostEqual(locus.transcripts["t2"].intron_fraction, 3 / 4)
+        self.assertAlmostEqual(locus.transcripts["t3"].intron_fraction, 1 / 4)
+        self.assertAlmostEqual(locus.transcripts["t1"].combined_cds_locus_fraction, 720 / 749)
+        self.assertEqual(locus.transcripts["t3"].combined_cds_locus_fraction, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
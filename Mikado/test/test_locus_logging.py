@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+from Mikado.utilities.log_utils import LocusAdapter
+from Mikado.picking import loci_processer
+from Mikado.loci import Transcript, Superlocus
+from Mikado.configuration import configurator
+import logging
+import logging.handlers
+import queue
+import unittest
+
+__author__ = 'Luca Venturini'
+
+
+class TestLocusLogging(unittest.TestCase):
+
+    """Tests for the logging of the loci through a single logger per worker."""
+
+    def setUp(self):
+        self.queue = queue.Queue()
+        self.logger = logging.getLogger("test_locus_logging")
+        self.handler = logging.handlers.QueueHandler(self.queue)
+        self.logger.addHandler(self.handler)
+        self.logger.propagate = False
+        self.logger.setLevel("INFO")
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+
+    def test_adapter(self):
+        adapter = LocusAdapter(self.logger, "Chr1:100-2000")
+        self.assertEqual(adapter.name, "Chr1:100-2000")
+        adapter.info("Analysing %s", "t1")
+        adapter.debug("Skipped")
+        self.assertFalse(adapter.isEnabledFor(logging.DEBUG))
+        record = self.queue.get_nowait()
+        self.assertEqual(record.getMessage(), "Chr1:100-2000 - Analysing t1")
+        self.assertEqual(record.name, "test_locus_logging")
+        self.assertEqual(record.locus, "Chr1:100-2000")
+        self.assertTrue(self.queue.empty())
+
+    def test_assign(self):
+        transcript = Transcript()
+        transcript.chrom, transcript.strand, transcript.id = "Chr1", "+", "t1"
+        transcript.add_exons([(101, 500), (801, 1000)])
+        transcript.finalize()
+        adapter = LocusAdapter(self.logger, "Chr1:101-1000")
+        transcript.logger = adapter
+        locus = Superlocus(transcript, json_conf=configurator.to_json(None))
+        locus.logger = adapter
+        self.assertIs(transcript.logger, adapter)
+        self.assertIs(locus.logger, adapter)
+
+    def test_queue_logger(self):
+        # A single logger, with a single handler, must be used for all the loci of a process
+        before = len(logging.Logger.manager.loggerDict)
+        first = loci_processer._queue_logger(self.queue, "WARNING")
+        second = loci_processer._queue_logger(self.queue, "WARNING")
+        self.assertIs(first, second)
+        self.assertEqual(len(first.handlers), 1)
+        self.assertLessEqual(len(logging.Logger.manager.loggerDict), before + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+from Mikado.picking.locus_queue import LocusQueue
+import unittest
+import threading
+import time
+
+__author__ = 'Luca Venturini'
+
+
+class TestLocusQueue(unittest.TestCase):
+
+    """Tests for the bounded queue used to send the superloci to the workers."""
+
+    def test_fifo(self):
+
+        queue = LocusQueue(maxsize=10, max_volume=100)
+        for num in range(5):
+            queue.put(("locus", num), volume=10)
+        self.assertEqual(queue.volume, 50)
+        self.assertEqual([queue.get()[1] for _ in range(5)], list(range(5)))
+        self.assertEqual(queue.volume, 0)
+
+    def test_oversized(self):
+
+        # An item larger than the maximum volume must be accepted if the queue is empty
+        queue = LocusQueue(maxsize=10, max_volume=10)
+        queue.put(("giant", 1), volume=1000)
+        self.assertEqual(queue.volume, 1000)
+        self.assertEqual(queue.get(), ("giant", 1))
+        self.assertEqual(queue.volume, 0)
+
+    def test_backpressure(self):
+
+        queue = LocusQueue(maxsize=10, max_volume=20)
+        queue.put(("first", 1), volume=15)
+        submitted = threading.Event()
+
+        def submit():
+            queue.put(("second", 2), volume=10)
+            submitted.set()
+
+        thread = threading.Thread(target=submit)
+        thread.start()
+        time.sleep(0.2)
+        # The second superlocus must wait until the first has been retrieved
+        self.assertFalse(submitted.is_set())
+        self.assertEqual(queue.get(), ("first", 1))
+        self.assertTrue(submitted.wait(5))
+        thread.join()
+        self.assertEqual(queue.get(), ("second", 2))
+        self.assertEqual(queue.volume, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+from Mikado.picking.loci_processer import merge_loci
+import unittest
+import tempfile
+import os
+
+__author__ = 'Luca Venturini'
+
+
+class TestMergeLoci(unittest.TestCase):
+
+    """Tests for the merging of the temporary files produced by the pick workers."""
+
+    @staticmethod
+    def locus_lines(counter, gid, tid, start, end):
+
+        attributes = "ID={0};Parent={1};primary=True".format(tid, gid)
+        lines = ["Chr1\tMikado\tgene\t{0}\t{1}\t.\t+\t.\tID={2}".format(start, end, gid),
+                 "Chr1\tMikado\tmRNA\t{0}\t{1}\t.\t+\t.\t{2}".format(start, end, attributes),
+                 "Chr1\tMikado\texon\t{0}\t{1}\t.\t+\t.\tID={2}.exon1;Parent={2}".format(
+                     start, end, tid)]
+        return ["{0}/{1}\n".format(counter, line) for line in lines]
+
+    def test_merge(self):
+
+        tempdir = tempfile.TemporaryDirectory()
+        out_handles = [os.path.join(tempdir.name, "mikado.loci.{0}".format(_))
+                       for _ in ("metrics.tsv", "scores.tsv", "gff3")]
+        for handle in out_handles:
+            open(handle, "wt").close()
+
+        # Two workers, with interleaved superloci
+        worker_loci = {1: [(1, 100, 200), (4, 700, 800)],
+                       2: [(2, 300, 400), (3, 500, 600)]}
+        for worker, loci in worker_loci.items():
+            gff, metrics, scores = [
+                open(os.path.join(tempdir.name, "{0}-{1}".format(os.path.basename(_), worker)), "wt")
+                for _ in (out_handles[2], out_handles[0], out_handles[1])]
+            for gene_counter, (counter, start, end) in enumerate(loci, 1):
+                gid = "worker{0}.Chr1G{1}".format(worker, gene_counter)
+                tid = "{0}.1".format(gid)
+                gff.writelines(self.locus_lines(counter, gid, tid, start, end))
+                print("{0}/{1}\t{2}\t{3}".format(counter, tid, gid, start), file=metrics)
+                print("{0}/{1}\t{2}\t{3}".format(counter, tid, gid, end), file=scores)
+            [_.close() for _ in (gff, metrics, scores)]
+
+        merge_loci(2, out_handles, prefix="test", tempdir=tempdir.name)
+
+        with open(out_handles[0]) as metrics:
+            self.assertEqual([_.rstrip().split("\t") for _ in metrics],
+                             [["test.Chr1G{0}.1".format(num), "test.Chr1G{0}".format(num), str(start)]
+                              for num, start in enumerate((100, 300, 500, 700), 1)])
+        with open(out_handles[1]) as scores:
+            self.assertEqual([_.rstrip().split("\t")[2] for _ in scores], ["200", "400", "600", "800"])
+        with open(out_handles[2]) as gff:
+            genes = [_.split("\t") for _ in gff if "\tgene\t" in _]
+        self.assertEqual([(_[3], _[8].split(";")[0]) for _ in genes],
+                         [(str(start), "ID=test.Chr1G{0}".format(num))
+                          for num, start in enumerate((100, 300, 500, 700), 1)])
+        tempdir.cleanup()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+import Mikado
+from Mikado.loci import Transcript, Superlocus
+from Mikado.picking.packing import pack_superlocus, unpack_superlocus, PackedSuperlocus
+import unittest
+import pickle
+
+__author__ = 'Luca Venturini'
+
+
+class TestPacking(unittest.TestCase):
+
+    """Tests for the compact representation of the superloci sent to the worker processes."""
+
+    def setUp(self):
+
+        self.json_conf = Mikado.configuration.configurator.to_json(None)
+
+        coding = Transcript()
+        coding.chrom, coding.start, coding.end, coding.strand = "Chr1", 101, 3000, "+"
+        coding.id, coding.parent, coding.source = "t1", "g1", "test"
+        coding.score = 10.5
+        coding.attributes["note"] = "coding"
+        coding.attributes["tpm"] = 3.5
+        coding.add_exons([(101, 300), (401, 600), (801, 1200), (2501, 3000)])
+        coding.add_exons([(421, 600), (801, 1200), (2501, 2700)], features="CDS")
+
+        non_coding = Transcript()
+        non_coding.chrom, non_coding.start, non_coding.end, non_coding.strand = "Chr1", 201, 2800, "-"
+        non_coding.id, non_coding.parent, non_coding.source = "t2", "g2", "test"
+        non_coding.add_exons([(201, 600), (801, 1200), (2501, 2800)])
+
+        monoexonic = Transcript()
+        monoexonic.chrom, monoexonic.start, monoexonic.end, monoexonic.strand = "Chr1", 2900, 3500, None
+        monoexonic.id, monoexonic.parent, monoexonic.source = "t3", "g3", "test"
+        monoexonic.add_exon((2900, 3500))
+
+        for transcript in (coding, non_coding, monoexonic):
+            transcript.finalize()
+
+        self.superlocus = Superlocus(coding, stranded=False, json_conf=self.json_conf)
+        self.superlocus.add_transcript_to_locus(non_coding, check_in_locus=False)
+        self.superlocus.add_transcript_to_locus(monoexonic, check_in_locus=False)
+
+    def test_roundtrip(self):
+
+        packed = pickle.loads(pickle.dumps(pack_superlocus(self.superlocus)))
+        self.assertIsInstance(packed, PackedSuperlocus)
+        unpacked = unpack_superlocus(packed, self.json_conf)
+        self.assertIsInstance(unpacked, Superlocus)
+        self.assertEqual((unpacked.chrom, unpacked.start, unpacked.end, unpacked.strand),
+                         (self.superlocus.chrom, self.superlocus.start,
+                          self.superlocus.end, self.superlocus.strand))
+        self.assertEqual(sorted(unpacked.transcripts.keys()),
+                         sorted(self.superlocus.transcripts.keys()))
+
+        for tid in self.superlocus.transcripts:
+            original, rebuilt = self.superlocus.transcripts[tid], unpacked.transcripts[tid]
+            self.assertTrue(rebuilt.finalized)
+            for attr in ("chrom", "source", "feature", "start", "end", "strand", "score", "parent",
+                         "attributes", "exons", "introns", "combined_cds", "selected_cds",
+                         "combined_utr", "internal_orfs", "phases",
+                         "has_start_codon", "has_stop_codon"):
+                self.assertEqual(getattr(original, attr), getattr(rebuilt, attr), (tid, attr))
+
+        self.assertTrue(unpacked.transcripts["t1"].is_coding)
+        self.assertEqual(unpacked.transcripts["t1"].attributes["tpm"], 3.5)
+
+    def test_string_table(self):
+
+        packed = pack_superlocus(self.superlocus)
+        # Each string must be stored only once
+        self.assertEqual(len(packed.strings), len(set(packed.strings)))
+        self.assertEqual(packed.strings.count("Chr1"), 1)
+        self.assertEqual(len(packed.transcripts), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+from Mikado.preparation import chunking
+from Mikado.preparation.annotation_parser import load_from_gtf, load_from_gff, merge_records
+from Mikado.preparation.transcript_store import TranscriptStore
+from Mikado.parsers import GTF, GFF
+from Mikado.utilities.log_utils import create_null_logger
+from Mikado import exceptions
+import functools
+import tempfile
+import os
+import unittest
+
+__author__ = 'Luca Venturini'
+
+
+class TestPrepareChunks(unittest.TestCase):
+
+    """Tests for the parallel parsing of single input files in Mikado prepare."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.logger = create_null_logger()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def __write(self, name, lines):
+        name = os.path.join(self.directory.name, name)
+        with open(name, "wt") as out:
+            print(*lines, sep="\n", file=out)
+        return name
+
+    @staticmethod
+    def __gtf(tid, start, strand="+"):
+        attributes = 'gene_id "{0}.gene"; transcript_id "{0}";'.format(tid)
+        transcript = "\t".join(["Chr1", "test", "transcript", str(start), str(start + 799), ".",
+                                strand, ".", attributes])
+        exons = ["\t".join(["Chr1", "test", "exon", str(exon_start), str(exon_start + 199), ".",
+                            strand, ".", attributes + ' exon_number "{}";'.format(number)])
+                 for number, exon_start in enumerate((start, start + 600), 1)]
+        return [transcript] + exons
+
+    def __merge(self, name, annot_type, chunks):
+
+        """Parse the file in chunks, merge the results and return the name of the merged store."""
+
+        if annot_type == "gtf":
+            loader = load_from_gtf
+        else:
+            loader = functools.partial(load_from_gff, chunked=True)
+        stores = [os.path.join(self.directory.name, "store.{}".format(index))
+                  for index in range(len(chunks))]
+        for store, chunk in zip(stores, chunks):
+            loader(store, chunking.open_chunk(name, annot_type, chunk), "", set(), self.logger)
+        with TranscriptStore(stores[0], flag="w") as store:
+            store.merge(stores[1:], functools.partial(merge_records, name=name, label=""))
+        [self.assertFalse(os.path.exists(_)) for _ in stores[1:]]
+        return stores[0]
+
+    def __load(self, name, annot_type, chunks):
+
+        """Parse the file in chunks, merge the results and return the records."""
+
+        merged = self.__merge(name, annot_type, chunks)
+        with TranscriptStore(merged) as store:
+            self.assertEqual(list(store.orphans()), [])
+            records = dict((tid, store[tid]) for tid in store)
+        os.remove(merged)
+        return records
+
+    def __reference(self, name, annot_type):
+        store = os.path.join(self.directory.name, "reference.store")
+        if annot_type == "gtf":
+            load_from_gtf(store, GTF.GTF(name), "", set(), self.logger)
+        else:
+            load_from_gff(store, GFF.GFF3(name), "", set(), self.logger)
+        with TranscriptStore(store) as reference:
+            records = dict((tid, reference[tid]) for tid in reference)
+        os.remove(store)
+        return records
+
+    def test_gtf(self):
+        lines = []
+        for index in range(20):
+            lines.extend(self.__gtf("t{}".format(index), 1000 * (index + 1)))
+        # Move the second exon of a transcript to the end of the file, in another chunk
+        lines.append(lines.pop(5))
+        name = self.__write("test.gtf", lines)
+        chunks = chunking.find_chunks(name, "gtf", 4, min_size=0)
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(chunks[0][0], 0)
+        self.assertEqual(chunks[-1][1], os.path.getsize(name))
+        with open(name, "rb") as handle:
+            for start, end in chunks[1:]:
+                handle.seek(start - 1)
+                self.assertEqual(handle.read(1), b"\n")
+                self.assertIn(b"\ttranscript\t", handle.readline())
+        self.assertEqual(self.__load(name, "gtf", chunks), self.__reference(name, "gtf"))
+
+    @staticmethod
+    def __gff3(tid, start, chrom="Chr1", strand="+", length=800):
+        end = start + length - 1
+        lines = ["\t".join([chrom, "test", "gene", str(start), str(end), ".", strand, ".",
+                            "ID={}.gene".format(tid)]),
+                 "\t".join([chrom, "test", "mRNA", str(start), str(end), ".", strand, ".",
+                            "ID={0};Parent={0}.gene".format(tid)])]
+        for exon_start in (start, end - 199):
+            lines.append("\t".join([chrom, "test", "exon", str(exon_start), str(exon_start + 199),
+                                    ".", strand, ".", "Parent={}".format(tid)]))
+        return lines
+
+    def test_gff3(self):
+        lines = ["##gff-version 3"]
+        for index in range(20):
+            lines.extend(self.__gff3("t{}".format(index), 1000 * (index + 1)))
+        name = self.__write("test.gff3", lines)
+        chunks = chunking.find_chunks(name, "gff3", 3, min_size=0)
+        self.assertEqual(len(chunks), 3)
+        with open(name, "rb") as handle:
+            for start, end in chunks[1:]:
+                handle.seek(start)
+                self.assertIn(b"\tgene\t", handle.readline())
+        self.assertEqual(self.__load(name, "gff3", chunks), self.__reference(name, "gff3"))
+
+    def test_gff3_interleaved(self):
+        # In files sorted by coordinate, the exons of a gene can follow the lines of a nested gene,
+        # so that a chunk starting at the latter holds exons whose mRNA is in the previous chunk.
+        lines = ["##gff-version 3"]
+        for index in range(20):
+            start = 10000 * (index + 1)
+            outer = self.__gff3("o{}".format(index), start, length=1800)
+            lines.extend(outer[:-1] + self.__gff3("i{}".format(index), start + 400) + outer[-1:])
+        name = self.__write("interleaved.gff3", lines)
+        chunks = chunking.find_chunks(name, "gff3", 10, min_size=0)
+        self.assertEqual(len(chunks), 10)
+        with open(name, "rb") as handle:
+            starts = []
+            for start, end in chunks[1:]:
+                handle.seek(start)
+                starts.append(handle.readline())
+        self.assertTrue(any(b"ID=i" in _ for _ in starts))
+        records = self.__load(name, "gff3", chunks)
+        self.assertEqual(records, self.__reference(name, "gff3"))
+        self.assertEqual(len(records), 40)
+        self.assertEqual(records["o1"]["parent"], ["o1.gene"])
+        self.assertEqual(sorted(records["o1"]["features"]["exon"]), [(20000, 20199), (21600, 21799)])
+
+    def test_max_records(self):
+        # Writing the records in batches must give the same transcripts as a single write,
+        # even when the lines of a transcript are found again after its record has been written
+        lines = ["##gff-version 3"]
+        for index in range(20):
+            start = 10000 * (index + 1)
+            outer = self.__gff3("o{}".format(index), start, length=1800)
+            lines.extend(outer[:-1] + self.__gff3("i{}".format(index), start + 400) + outer[-1:])
+        name = self.__write("batches.gff3", lines)
+        gtf_lines = []
+        for index in range(20):
+            gtf_lines.extend(self.__gtf("t{}".format(index), 1000 * (index + 1)))
+        gtf_lines.append(gtf_lines.pop(5))
+        gtf_name = self.__write("batches.gtf", gtf_lines)
+        for loader, parser, current in ((load_from_gff, GFF.GFF3, name), (load_from_gtf, GTF.GTF, gtf_name)):
+            store = os.path.join(self.directory.name, "batches.store")
+            with self.subTest(name=current):
+                self.assertEqual(loader(store, parser(current), "", set(), self.logger, max_records=3),
+                                 40 if parser is GFF.GFF3 else 20)
+                with TranscriptStore(store) as batched:
+                    self.assertEqual(list(batched.orphans()), [])
+                    records = dict((tid, batched[tid]) for tid in batched)
+                self.assertEqual(records, self.__reference(current, "gff3" if parser is GFF.GFF3 else "gtf"))
+            os.remove(store)
+
+    def test_gff3_orphans(self):
+        # Exons whose mRNA line is missing from the file must still be reported as invalid
+        lines = ["##gff-version 3"]
+        for index in range(20):
+            lines.extend(self.__gff3("t{}".format(index), 1000 * (index + 1)))
+        orphan = self.__gff3("orphan", 30000)
+        lines.extend(orphan[:1] + orphan[2:])
+        name = self.__write("orphans.gff3", lines)
+        with self.assertRaises(KeyError):
+            load_from_gff(os.path.join(self.directory.name, "reference.store"),
+                          GFF.GFF3(name), "", set(), self.logger)
+        merged = self.__merge(name, "gff3", chunking.find_chunks(name, "gff3", 3, min_size=0))
+        with TranscriptStore(merged) as store:
+            self.assertEqual(list(store.orphans()), ["orphan"])
+            self.assertEqual(len(store), 21)
+        os.remove(merged)
+
+    def test_duplicated(self):
+        # Transcripts present twice in the file, with the second instance in another chunk,
+        # must be treated as when parsing the file in a single pass: only the first is kept.
+        lines = ["##gff-version 3"]
+        for index in range(20):
+            lines.extend(self.__gff3("t{}".format(index), 1000 * (index + 1)))
+        lines.extend(self.__gff3("t2", 50000))
+        lines.extend(self.__gff3("t3", 60000, chrom="Chr2", strand="-"))
+        name = self.__write("duplicated.gff3", lines)
+        chunks = chunking.find_chunks(name, "gff3", 4, min_size=0)
+        self.assertEqual(len(chunks), 4)
+        with open(name, "rb") as handle:
+            self.assertIn(b"ID=t2;", handle.read(chunks[0][1]))
+            handle.seek(chunks[-1][0])
+            self.assertIn(b"ID=t2;", handle.read())
+        records = self.__load(name, "gff3", chunks)
+        self.assertEqual(records, self.__reference(name, "gff3"))
+        self.assertEqual(sorted(records["t2"]["features"]["exon"]), [(3000, 3199), (3600, 3799)])
+        self.assertEqual((records["t3"]["chrom"], records["t3"]["strand"]), ("Chr1", "+"))
+
+        lines = []
+        for index in range(20):
+            lines.extend(self.__gtf("t{}".format(index), 1000 * (index + 1)))
+        lines.extend(self.__gtf("t2", 50000, strand="-"))
+        name = self.__write("duplicated.gtf", lines)
+        chunks = chunking.find_chunks(name, "gtf", 4, min_size=0)
+        records = self.__load(name, "gtf", chunks)
+        self.assertEqual(records, self.__reference(name, "gtf"))
+        self.assertEqual(records["t2"]["strand"], "+")
+
+    def test_no_split(self):
+        name = self.__write("small.gtf", self.__gtf("t1", 1000))
+        size = os.path.getsize(name)
+        self.assertEqual(chunking.find_chunks(name, "gtf", 4), [(0, size)])
+        self.assertEqual(chunking.find_chunks(name, "gtf", 1, min_size=0), [(0, size)])
+        # A single transcript cannot be split
+        self.assertEqual(chunking.find_chunks(name, "gtf", 4, min_size=0), [(0, size)])
+
+    def test_invalid(self):
+        first = {"chrom": "Chr1", "strand": "+", "attributes": {}, "features": {"exon": [(1, 100)]}}
+        second = {"chrom": "Chr1", "strand": "-", "attributes": {}, "features": {"exon": [(201, 300)]}}
+        with self.assertRaises(exceptions.InvalidAssembly):
+            merge_records("t1", first, second, "test.gtf", "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+from Mikado.configuration import configurator
+from Mikado.loci import Transcript, Locus
+from Mikado.picking.loci_processer import remove_fragments
+from Mikado.utilities.log_utils import create_null_logger
+import unittest
+
+__author__ = 'Luca Venturini'
+
+
+class _Stranded:
+
+    """Minimal container of loci, as returned by Superlocus.split_strands."""
+
+    def __init__(self, loci):
+        self.loci = dict((locus.id, locus) for locus in loci)
+
+    def __lt__(self, other):
+        return False
+
+
+class TestRemoveFragments(unittest.TestCase):
+
+    """Tests for the interval-indexed removal of the fragments."""
+
+    logger = create_null_logger("test_remove_fragments")
+
+    def setUp(self):
+        self.json_conf = configurator.to_json(None)
+
+    def __locus(self, tid, strand, exons, cds=None):
+        transcript = Transcript()
+        transcript.chrom, transcript.strand, transcript.id = "Chr1", strand, tid
+        transcript.add_exons(exons)
+        if cds:
+            transcript.add_exons(cds, features="CDS")
+        transcript.finalize()
+        locus = Locus(transcript, logger=self.logger)
+        locus.json_conf = self.json_conf
+        locus.id = "locus.{0}".format(tid)
+        return locus
+
+    def __create_loci(self):
+        gene = self.__locus("gene", "+", [(1001, 1800), (3001, 5000)], [(1101, 1800), (3001, 3500)])
+        other = self.__locus("other", "-", [(40001, 41000), (42001, 43000)], [(40101, 41000), (42001, 42498)])
+        return [_Stranded([gene, self.__locus("intronic", "+", [(2001, 2300)]),
+                           self.__locus("exonic", "+", [(1501, 1700)])]),
+                _Stranded([self.__locus("antisense", "-", [(1201, 1600)])]),
+                _Stranded([other, self.__locus("runon", "-", [(44001, 44400)])])]
+
+    def __brute_force(self, stranded_loci):
+        """Reference implementation, comparing each putative fragment against all other loci."""
+        fragments = dict((locus.id, locus.is_putative_fragment())
+                         for stranded in stranded_loci for locus in stranded.loci.values())
+        if all(fragments.values()):
+            return dict((_, False) for _ in fragments)
+        reference = [locus for stranded in stranded_loci for locus in stranded.loci.values()
+                     if fragments[locus.id] is False]
+        result = dict()
+        for lid, is_fragment in fragments.items():
+            locus = [_ for stranded in stranded_loci for _ in stranded.loci.values() if _.id == lid][0]
+            result[lid] = is_fragment and any(other.other_is_fragment(locus) for other in reference)
+        return result
+
+    def test_fragments(self):
+
+        for flank in (0, 1000, 100000):
+            with self.subTest(flank=flank):
+                self.json_conf["pick"]["run_options"]["flank"] = flank
+                self.json_conf["pick"]["run_options"]["remove_overlapping_fragments"] = False
+                stranded_loci = self.__create_loci()
+                expected = self.__brute_force(self.__create_loci())
+                found = dict((locus.id, locus.is_fragment)
+                             for stranded in remove_fragments(stranded_loci, self.json_conf, self.logger)
+                             for locus in stranded.loci.values())
+                self.assertEqual(found, expected)
+                self.assertEqual(sorted(_ for _ in found if found[_] is True),
+                                 ["locus.antisense", "locus.exonic", "locus.intronic", "locus.runon"])
+
+    def test_removal(self):
+
+        self.json_conf["pick"]["run_options"]["remove_overlapping_fragments"] = True
+        stranded_loci = self.__create_loci()
+        kept = sorted(lid for stranded in remove_fragments(stranded_loci, self.json_conf, self.logger)
+                      for lid in stranded.loci)
+        self.assertEqual(kept, ["locus.gene", "locus.other"])
+
+    def test_only_fragments(self):
+
+        stranded_loci = [_Stranded([self.__locus("first", "+", [(2001, 2300)]),
+                                    self.__locus("second", "+", [(5001, 5300)])])]
+        kept = sorted(lid for stranded in remove_fragments(stranded_loci, self.json_conf, self.logger)
+                      for lid in stranded.loci)
+        self.assertEqual(kept, ["locus.first", "locus.second"])
+
+
+if __name__ == "__main__":
+    unittest.main()
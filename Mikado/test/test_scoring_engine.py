@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+from Mikado.loci import scoring_engine
+from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
+import numpy
+import unittest
+import collections
+
+__author__ = 'Luca Venturini'
+
+
+class TestScoringEngine(unittest.TestCase):
+
+    """Tests for the matrix-based scoring of the transcripts."""
+
+    Metrics = collections.namedtuple("Metrics", ["cdna_length", "exon_num", "is_complete"])
+
+    def setUp(self):
+        self.transcripts = {"t1": self.Metrics(1000, 2, True),
+                            "t2": self.Metrics(1500, 4, True),
+                            "t3": self.Metrics(500, 3, True)}
+        self.tids = ["t1", "t2", "t3"]
+
+    def test_matrix(self):
+
+        matrix = scoring_engine.metrics_matrix(self.transcripts, self.tids,
+                                               ["exon_num", "is_complete"])
+        self.assertEqual(matrix.shape, (3, 2))
+        self.assertEqual(matrix.tolist(), [[2, 1], [4, 1], [3, 1]])
+
+    def test_rescaling(self):
+
+        scoring = {"cdna_length": {"rescaling": "max", "multiplier": 2},
+                   "exon_num": {"rescaling": "target", "value": 3, "multiplier": 1},
+                   "is_complete": {"rescaling": "min", "multiplier": 5}}
+        params = ["cdna_length", "exon_num", "is_complete"]
+        matrix = scoring_engine.metrics_matrix(self.transcripts, self.tids, params)
+        scores, constant = scoring_engine.score_matrix(matrix, params, scoring)
+        self.assertEqual(scores[:, 0].tolist(), [1.0, 2.0, 0.0])
+        self.assertEqual(scores[:, 1].tolist(), [0.0, 0.0, 1.0])
+        # A metric with a single value gives the maximum score to all transcripts
+        self.assertEqual(scores[:, 2].tolist(), [5, 5, 5])
+        self.assertEqual(constant.tolist(), [[False, False, True]] * 3)
+
+    def test_min(self):
+
+        scoring = {"cdna_length": {"rescaling": "min", "multiplier": 1}}
+        matrix = scoring_engine.metrics_matrix(self.transcripts, self.tids, ["cdna_length"])
+        scores, _ = scoring_engine.score_matrix(matrix, ["cdna_length"], scoring)
+        self.assertEqual(scores[:, 0].tolist(), [0.5, 0.0, 1.0])
+
+    def test_filter(self):
+
+        scoring = {"cdna_length": {"rescaling": "max", "multiplier": 1,
+                                   "filter": {"operator": "ge", "value": 1000}},
+                   "exon_num": {"rescaling": "max", "multiplier": 1,
+                                "filter": {"operator": "not in", "value": [2, 3]}}}
+        params = ["cdna_length", "exon_num"]
+        matrix = scoring_engine.metrics_matrix(self.transcripts, self.tids, params)
+        scores, constant = scoring_engine.score_matrix(matrix, params, scoring)
+        self.assertEqual(scores[:, 0].tolist(), [0.5, 1.0, 0.0])
+        self.assertEqual(scores[:, 1].tolist(), [0.0, 1.0, 0.0])
+        self.assertEqual(constant.tolist(), [[False, True], [False, False], [True, True]])
+
+    def test_evaluate_column(self):
+
+        column = numpy.array([1, 2, 3], dtype=numpy.float64)
+        for operator, value, expected in [("eq", 2, [False, True, False]),
+                                          ("ne", 2, [True, False, True]),
+                                          ("gt", 2, [False, False, True]),
+                                          ("lt", 2, [True, False, False]),
+                                          ("ge", 2, [False, True, True]),
+                                          ("le", 2, [True, True, False]),
+                                          ("in", [1, 3], [True, False, True])]:
+            with self.subTest(operator=operator):
+                self.assertEqual(scoring_engine.evaluate_column(
+                    column, {"operator": operator, "value": value}).tolist(), expected)
+        with self.assertRaises(ValueError):
+            scoring_engine.evaluate_column(column, {"operator": "foo", "value": 1})
+
+    def test_predict(self):
+
+        params = ["cdna_length", "exon_num", "is_complete"]
+        matrix = scoring_engine.metrics_matrix(self.transcripts, self.tids, params)
+        training = numpy.random.RandomState(0).rand(50, 3) * [2000, 5, 1]
+        target = training[:, 0] / 2000
+        regressor = RandomForestRegressor(n_estimators=5, random_state=0).fit(training, target)
+        classifier = RandomForestClassifier(n_estimators=5, random_state=0).fit(training, target > 0.5)
+        # A single call must give the same results as scoring the transcripts one at a time
+        self.assertEqual(scoring_engine.predict_scores(regressor, matrix).tolist(),
+                         [regressor.predict(row.reshape(1, -1))[0] for row in matrix])
+        self.assertEqual(scoring_engine.predict_scores(classifier, matrix).tolist(),
+                         [classifier.predict_proba(row.reshape(1, -1))[0][1] for row in matrix])
+        self.assertEqual(scoring_engine.predict_scores(regressor, matrix[:0]).tolist(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+import Mikado
+from Mikado.picking.shards import find_split_points, parse_shard, Shard
+from Mikado.utilities.log_utils import create_null_logger
+from Mikado.exceptions import UnsortedInput
+import unittest
+import tempfile
+import os
+
+__author__ = 'Luca Venturini'
+
+
+class TestShards(unittest.TestCase):
+
+    """Tests for the splitting of the input of Mikado pick into independent regions."""
+
+    @staticmethod
+    def write_gtf(handle, transcripts):
+
+        for chrom, tid, exons in transcripts:
+            print(chrom, "test", "transcript", exons[0][0], exons[-1][1], ".", "+", ".",
+                  'gene_id "{0}.gene"; transcript_id "{0}";'.format(tid), sep="\t", file=handle)
+            for start, end in exons:
+                print(chrom, "test", "exon", start, end, ".", "+", ".",
+                      'gene_id "{0}.gene"; transcript_id "{0}";'.format(tid), sep="\t", file=handle)
+
+    def setUp(self):
+
+        self.transcripts = [
+            ("Chr1", "t1", [(100, 200), (300, 400)]),
+            ("Chr1", "t2", [(150, 200), (300, 500)]),
+            ("Chr1", "t3", [(1000, 1200), (1300, 1400)]),
+            ("Chr1", "t4", [(1450, 1500)]),
+            ("Chr1", "t5", [(5000, 5200), (5300, 5400)]),
+            ("Chr2", "t6", [(100, 200), (300, 400)]),
+            ("Chr2", "t7", [(3000, 3200), (3300, 3400)])]
+
+        self.gtf = tempfile.NamedTemporaryFile(mode="wt", suffix=".gtf", delete=False)
+        self.write_gtf(self.gtf, self.transcripts)
+        self.gtf.close()
+        self.json_conf = Mikado.configuration.configurator.to_json(None)
+        self.json_conf["pick"]["run_options"]["flank"] = 200
+
+    def tearDown(self):
+        os.remove(self.gtf.name)
+
+    def test_single_shard(self):
+
+        shards = find_split_points(self.gtf.name, flank=200, shards=1)
+        self.assertEqual(shards, [Shard(0, os.stat(self.gtf.name).st_size)])
+
+    def test_split_points(self):
+
+        shards = find_split_points(self.gtf.name, flank=200, shards=100)
+        starts = []
+        with open(self.gtf.name, "rb") as handle:
+            for shard in shards:
+                handle.seek(shard.start)
+                starts.append(handle.readline().split(b"\t")[8].split(b'"')[3].decode())
+        # t2 overlaps t1, t4 is within the flank of t3
+        self.assertEqual(starts, ["t1", "t3", "t5", "t6", "t7"])
+
+        # The regions must be contiguous and cover the whole file
+        self.assertEqual(shards[0].start, 0)
+        self.assertEqual(shards[-1].end, os.stat(self.gtf.name).st_size)
+        for shard, following in zip(shards[:-1], shards[1:]):
+            self.assertEqual(shard.end, following.start)
+
+    def test_parse_shards(self):
+
+        logger = create_null_logger("shards")
+        whole = find_split_points(self.gtf.name, flank=200, shards=1)
+        split = find_split_points(self.gtf.name, flank=200, shards=100)
+
+        with open(self.gtf.name, "rb") as handle:
+            whole_loci = [(sorted(slocus.transcripts.keys()), counter) for slocus, counter in
+                          parse_shard(handle, whole[0], self.json_conf, logger)]
+            split_loci = []
+            for shard in split:
+                split_loci.extend([(sorted(slocus.transcripts.keys()), counter) for slocus, counter in
+                                   parse_shard(handle, shard, self.json_conf, logger)])
+
+        self.assertEqual(whole_loci, split_loci)
+        self.assertEqual([_[0] for _ in whole_loci],
+                         [["t1", "t2"], ["t3", "t4"], ["t5"], ["t6"], ["t7"]])
+        counters = [_[1] for _ in whole_loci]
+        self.assertEqual(counters, sorted(counters))
+        self.assertEqual(len(set(counters)), len(counters))
+
+    def test_unsorted(self):
+
+        with open(self.gtf.name, "wt") as handle:
+            self.write_gtf(handle, [self.transcripts[2], self.transcripts[0]])
+        with self.assertRaises(UnsortedInput):
+            find_split_points(self.gtf.name, flank=200, shards=2)
+
+
+if __name__ == "__main__":
+    unittest.main()
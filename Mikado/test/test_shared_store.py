@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+from Mikado.picking.shared_store import SharedStore, write_store, OrfState
+from Mikado.parsers.bed12 import BED12
+import unittest
+import tempfile
+import pickle
+import os
+
+__author__ = 'Luca Venturini'
+
+
+class TestSharedStore(unittest.TestCase):
+
+    """Tests for the memory-mapped store of the preloaded data."""
+
+    def setUp(self):
+
+        self.junctions = dict()
+        for pos in range(1, 2000, 7):
+            self.junctions[("Chr{0}".format(pos % 3 + 1), pos, pos + 100)] = "+" if pos % 2 else "-"
+        self.orfs = {"t1": [(0, 300, "t1.orf1", 0.0, "+", 10, 199, 0, True, False)],
+                     "t2": [(0, 500, "t2.orf1", 0.0, "+", 0, 300, 0, False, True),
+                            (0, 500, "t2.orf2", 0.0, "-", 300, 450, 0, True, True)]}
+        self.hits = {"t1": [{"target": "prot1", "evalue": 10 ** -5, "hsps": [{"query_start": 1}]}]}
+
+        handle, self.filename = tempfile.mkstemp(suffix=".store")
+        os.close(handle)
+        write_store(self.filename, {"junctions": (self.junctions, None),
+                                    "orfs": (self.orfs, "orfs"),
+                                    "hits": (self.hits, None)})
+        self.store = SharedStore(self.filename)
+
+    def tearDown(self):
+        self.store.remove()
+        self.assertFalse(os.path.exists(self.filename))
+
+    def test_junctions(self):
+
+        junctions = self.store["junctions"]
+        self.assertEqual(len(junctions), len(self.junctions))
+        for key, strand in self.junctions.items():
+            self.assertIn(key, junctions)
+            self.assertEqual(junctions[key], strand)
+        self.assertNotIn(("Chr1", 2, 102), junctions)
+        self.assertNotIn(("Chr4", 1, 101), junctions)
+        with self.assertRaises(KeyError):
+            _ = junctions[("Chr1", 2, 102)]
+
+    def test_orfs(self):
+
+        orfs = self.store["orfs"]
+        self.assertNotIn("t3", orfs)
+        self.assertEqual(len(orfs["t2"]), 2)
+        for orf, values in zip(orfs["t2"], self.orfs["t2"]):
+            state = OrfState(*values)
+            self.assertIsInstance(orf, BED12)
+            self.assertEqual(orf.chrom, "t2")
+            self.assertEqual((orf.name, orf.strand, orf.thick_start, orf.thick_end),
+                             (state.orf_name, state.strand, state.thick_start, state.thick_end))
+            self.assertEqual((orf.has_start_codon, orf.has_stop_codon),
+                             (state.has_start_codon, state.has_stop_codon))
+
+    def test_hits(self):
+
+        self.assertEqual(self.store["hits"]["t1"], self.hits["t1"])
+        self.assertNotIn("t2", self.store["hits"])
+
+    def test_pickle(self):
+
+        # Only the file name should be transferred to other processes
+        self.assertIn("junctions", self.store)
+        copy = pickle.loads(pickle.dumps(self.store))
+        self.assertLess(len(pickle.dumps(self.store)), 200 + len(self.filename))
+        self.assertEqual(copy["hits"]["t1"], self.hits["t1"])
+        copy.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
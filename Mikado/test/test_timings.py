@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+import Mikado
+from Mikado.loci import Transcript, Superlocus
+from Mikado.picking.timings import superlocus_timings, merge_timings, SlowLociReport, \
+    STAGES, TIMING_FIELDS
+from Mikado.utilities.log_utils import create_null_logger
+import unittest
+import tempfile
+import os
+
+__author__ = 'Luca Venturini'
+
+
+class TestTimings(unittest.TestCase):
+
+    """Tests for the per-superlocus timings of Mikado pick."""
+
+    def test_superlocus_timings(self):
+
+        json_conf = Mikado.configuration.configurator.to_json(None)
+        first = Transcript()
+        first.chrom, first.start, first.end, first.strand = "Chr1", 101, 2000, "+"
+        first.id, first.parent = "t1", "g1"
+        first.add_exons([(101, 500), (801, 2000)])
+        second = Transcript()
+        second.chrom, second.start, second.end, second.strand = "Chr1", 101, 2000, "-"
+        second.id, second.parent = "t2", "g2"
+        second.add_exons([(101, 600), (801, 2000)])
+        [_.finalize() for _ in (first, second)]
+
+        slocus = Superlocus(first, stranded=False, json_conf=json_conf)
+        slocus.add_transcript_to_locus(second)
+        slocus.logger = create_null_logger("timings")
+        slocus.timings["loading"] += 0.5
+        stranded_loci = sorted(slocus.split_strands())
+        for stranded in stranded_loci:
+            stranded.logger = slocus.logger
+            stranded.define_loci()
+            self.assertGreater(stranded.timings["subloci"], 0)
+            self.assertEqual(stranded.graph_size, (1, 0))
+
+        row = superlocus_timings(slocus, stranded_loci, 3)
+        self.assertEqual(sorted(row.keys()), sorted(TIMING_FIELDS))
+        self.assertEqual(row["counter"], 3)
+        self.assertEqual(row["superlocus"], "Chr1:101-2000")
+        self.assertEqual(row["transcripts"], 2)
+        self.assertEqual(row["approximation_level"], 0)
+        self.assertEqual((row["comparison_hits"], row["comparison_misses"]),
+                         (slocus.comparisons.hits, slocus.comparisons.misses))
+        self.assertGreaterEqual(row["loading"], 0.5)
+        self.assertAlmostEqual(row["total"], sum(row[stage] for stage in STAGES), places=3)
+
+    def test_report(self):
+
+        report = SlowLociReport(top=2)
+        for counter, total in enumerate([0.5, 3, 0.1, 2, 1]):
+            row = dict((stage, 0) for stage in STAGES)
+            row.update({"counter": counter, "superlocus": "Chr1:{0}".format(counter),
+                        "transcripts": 1, "approximation_level": 0,
+                        "graph_nodes": 1, "graph_edges": 0, "subloci": total, "total": total})
+            report.add(row)
+        self.assertEqual([_["total"] for _ in report.rows], [3, 2])
+        with self.assertLogs("null", "INFO") as cm:
+            logger = create_null_logger("null")
+            logger.setLevel("INFO")
+            report.log(logger)
+        self.assertEqual(len(cm.output), 3)
+        self.assertIn("slowest stage: subloci", cm.output[1])
+
+    def test_merge(self):
+
+        tempdir = tempfile.TemporaryDirectory()
+        partials = [os.path.join(tempdir.name, "timings.tsv-{0}".format(_)) for _ in (1, 2)]
+        for partial, counters in zip(partials, ([1, 4, 5], [2, 3])):
+            with open(partial, "wt") as out:
+                for counter in counters:
+                    row = [counter, "Chr1:{0}".format(counter), 1, 0, 1, 0, 0, 0] + [0] * len(STAGES) + [counter]
+                    print(*row, sep="\t", file=out)
+
+        report = SlowLociReport(top=1)
+        output = os.path.join(tempdir.name, "timings.tsv")
+        merge_timings(partials, output, report=report)
+        with open(output) as merged:
+            self.assertEqual(next(merged).rstrip("\n").split("\t"), TIMING_FIELDS)
+            self.assertEqual([int(_.split("\t")[0]) for _ in merged], [1, 2, 3, 4, 5])
+        self.assertEqual(report.rows[0]["counter"], "5")
+        self.assertFalse(any(os.path.exists(_) for _ in partials))
+        tempdir.cleanup()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,6 +6,8 @@ from Mikado.configuration.configurator import to_json
 import os
 from sqlalchemy.engine import reflection
 from Mikado.serializers.orf import Orf
+from Mikado.loci.clique_methods import define_graph, find_cliques, find_communities
+import random
 
 
 class WrongLoadedOrf(unittest.TestCase):
@@ -366,5 +368,72 @@ class TestRetrieval(unittest.TestCase):
         retrieval._connect_to_db(self.tr)
         reflector = reflection.Inspector.from_engine(self.tr.engine)
 
+class OrfSelectionTester(unittest.TestCase):
+
+    """Tests for the greedy selection of the non-overlapping ORFs."""
+
+    def setUp(self):
+        self.tr = Transcript()
+        self.tr.start, self.tr.end, self.tr.chrom, self.tr.strand = (101, 10100, "Chr1", "+")
+        self.tr.id = "test1"
+        self.tr.add_exons([(101, 10100)])
+        self.tr.finalize()
+
+    def __orf(self, name, thick_start, thick_end):
+        orf = BED12(transcriptomic=True)
+        orf.chrom, orf.name, orf.strand = self.tr.id, name, "+"
+        orf.start, orf.end = 0, self.tr.cdna_length - 1
+        orf.thick_start, orf.thick_end = thick_start, thick_end
+        return orf
+
+    def __clique_selection(self, candidates):
+        """Reference implementation, removing in rounds the best ORF of each community and its cliques."""
+        orf_dictionary = dict((x.name, x) for x in candidates)
+        graph = define_graph(orf_dictionary, inters=self.tr.is_overlapping_cds)
+        selected = []
+        while len(graph) > 0:
+            cliques = find_cliques(graph)
+            to_remove = set()
+            for comm in find_communities(graph):
+                best_orf = sorted([orf_dictionary[x] for x in comm], key=retrieval.orf_sorter, reverse=True)[0]
+                selected.append(best_orf)
+                for clique in iter(cl for cl in cliques if best_orf.name in cl):
+                    to_remove.update(clique)
+            graph.remove_nodes_from(to_remove)
+        return sorted(selected, key=retrieval.orf_sorter, reverse=True)
+
+    def test_random_selection(self):
+
+        state = random.Random(10)
+        for _ in range(50):
+            # Distinct lengths, so that the order of the ORFs is unambiguous
+            lengths = state.sample(range(30, 3000), 40)
+            candidates = []
+            for num, length in enumerate(lengths):
+                thick_start = state.randint(1, self.tr.cdna_length - length)
+                candidates.append(self.__orf("orf{0}".format(num), thick_start, thick_start + length - 1))
+            expected = self.__clique_selection(candidates)
+            self.assertEqual([_.name for _ in retrieval.find_candidate_orfs(self.tr, candidates)],
+                             [_.name for _ in expected])
+            for minimal in (500, 1500):
+                selected = retrieval.find_candidate_orfs(self.tr, candidates,
+                                                         minimal_secondary_orf_length=minimal)
+                self.assertEqual([_.name for _ in selected],
+                                 [_.name for _ in expected[:1] + [orf for orf in expected[1:]
+                                                                  if orf.cds_len >= minimal]])
+
+    def test_identical_orfs(self):
+
+        first = self.__orf("first", 101, 400)
+        copy = self.__orf("copy", 101, 400)
+        adjacent = self.__orf("adjacent", 400, 600)
+        separate = self.__orf("separate", 601, 700)
+        selected = retrieval.find_candidate_orfs(self.tr, [first, copy, adjacent, separate])
+        # Identical ORFs do not exclude each other; ORFs sharing even a single base do
+        self.assertEqual([_.name for _ in selected], ["first", "copy", "separate"])
+        self.assertEqual(sorted(_.name for _ in self.__clique_selection([first, copy, adjacent, separate])),
+                         ["copy", "first", "separate"])
+
+
 if __name__ == '__main__':
     unittest.main()
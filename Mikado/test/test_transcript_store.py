@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+from Mikado.preparation.transcript_store import TranscriptStore
+from Mikado.preparation.prepare import store_transcripts
+from Mikado.preparation.redundancy import chain_hash, clusters, Candidate
+from Mikado.utilities.log_utils import create_null_logger
+import collections
+import pickle
+import tempfile
+import os
+import unittest
+
+__author__ = 'Luca Venturini'
+
+
+class TestTranscriptStore(unittest.TestCase):
+
+    """Tests for the intermediate store of Mikado prepare."""
+
+    @staticmethod
+    def __record(tid, chrom, strand, exons):
+        return {"tid": tid, "chrom": chrom, "strand": strand, "source": "test",
+                "attributes": {"foo": "bar"}, "parent": "{}.gene".format(tid),
+                "strand_specific": False, "features": {"exon": exons}}
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.records = {
+            "t1": self.__record("t1", "Chr2", "+", [(501, 600), (101, 200)]),
+            "t2": self.__record("t2", "Chr1", "-", [(1001, 1500)]),
+            "t3": self.__record("t3", "Chr1", "+", [(101, 300), (401, 600)]),
+            "t4": self.__record("t4", "Chr1", "+", [(101, 300), (401, 600)])}
+        self.name = os.path.join(self.directory.name, "store.db")
+        with TranscriptStore(self.name, flag="n") as store:
+            store.write(self.records)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_records(self):
+        with TranscriptStore(self.name) as store:
+            self.assertEqual(len(store), 4)
+            self.assertEqual(sorted(store.keys()), ["t1", "t2", "t3", "t4"])
+            for tid in self.records:
+                self.assertIn(tid, store)
+                self.assertEqual(store[tid], self.records[tid])
+            self.assertNotIn("t5", store)
+            with self.assertRaises(KeyError):
+                _ = store["t5"]
+
+    def test_positions(self):
+        chain = chain_hash("+", [(101, 300), (401, 600)])
+        with TranscriptStore(self.name) as store:
+            self.assertEqual(list(store.positions()),
+                             [("t3", "Chr1", 101, 600, 400, chain),
+                              ("t4", "Chr1", 101, 600, 400, chain),
+                              ("t2", "Chr1", 1001, 1500, 500, chain_hash("-", [(1001, 1500)])),
+                              ("t1", "Chr2", 101, 600, 200, chain_hash("+", [(101, 200), (501, 600)]))])
+
+    def test_pickle(self):
+        store = TranscriptStore(self.name, cache_size=512)
+        other = pickle.loads(pickle.dumps(store))
+        self.assertEqual(other.filename, self.name)
+        self.assertEqual(other.cache_size, 512)
+        self.assertEqual(other["t2"], self.records["t2"])
+        store.close()
+        other.close()
+
+    def test_invalid(self):
+        with self.assertRaises(OSError):
+            TranscriptStore(os.path.join(self.directory.name, "missing.db"))
+        with self.assertRaises(ValueError):
+            TranscriptStore(self.name, flag="x")
+        with self.assertRaises(KeyError):
+            with TranscriptStore(os.path.join(self.directory.name, "invalid.db"), flag="n") as store:
+                store.write({"t1": {"chrom": "Chr1", "strand": "+"}})
+        # Incomplete new stores must be removed
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, "invalid.db")))
+
+    def test_streaming(self):
+        name = os.path.join(self.directory.name, "streamed.db")
+        record = self.__record("s1", "Chr1", "-", [])
+        with TranscriptStore(name, flag="n") as store:
+            for start in (1001, 101, 501):
+                store.add_feature("s1", "exon", start, start + 99)
+            store.add_feature("s1", "CDS", 541, 600)
+            store.write({"s1": record})
+        with TranscriptStore(name) as store:
+            self.assertEqual(store["s1"]["features"], {"exon": [(1001, 1100), (101, 200), (501, 600)],
+                                                       "CDS": [(541, 600)]})
+            self.assertEqual(list(store.positions()),
+                             [("s1", "Chr1", 101, 1100, 300,
+                               chain_hash("-", [(101, 200), (501, 600), (1001, 1100)]))])
+
+    def test_batches(self):
+        # Transcripts whose lines are found again after they have been written must be reconciled
+        name = os.path.join(self.directory.name, "batches.db")
+
+        def reconcile(tid, first, second):
+            first["attributes"].update(second["attributes"])
+            return first
+
+        with TranscriptStore(name, flag="n") as store:
+            store.add_feature("b1", "exon", 101, 200)
+            store.write({"b1": self.__record("b1", "Chr1", "+", [])}, reconcile)
+            store.add_feature("b1", "exon", 501, 600)
+            second = self.__record("b1", "Chr1", "+", [])
+            second["attributes"] = {"baz": "qux"}
+            store.write({"b1": second}, reconcile)
+        with TranscriptStore(name) as store:
+            self.assertEqual(len(store), 1)
+            self.assertEqual(store["b1"]["features"], {"exon": [(101, 200), (501, 600)]})
+            self.assertEqual(store["b1"]["attributes"], {"foo": "bar", "baz": "qux"})
+            self.assertEqual(list(store.positions()),
+                             [("b1", "Chr1", 101, 600, 200, chain_hash("+", [(101, 200), (501, 600)]))])
+
+    def test_shared(self):
+        other = os.path.join(self.directory.name, "other.db")
+        with TranscriptStore(other, flag="n") as store:
+            store.write({"o1": self.__record("o1", "Chr1", "+", [(101, 200)])})
+        with TranscriptStore(self.name) as store:
+            self.assertIsNone(store.shared(other))
+        with TranscriptStore(other, flag="n") as store:
+            store.write({"t2": self.__record("t2", "Chr1", "+", [(101, 200)])})
+        with TranscriptStore(self.name) as store:
+            self.assertEqual(store.shared(other), "t2")
+            # The other store must have been detached
+            self.assertEqual(len(store), 4)
+
+    def test_sorting(self):
+        # t3 and t4 are redundant, so only one of them must be retained
+        stores = {self.name: TranscriptStore(self.name)}
+        keys = list(store_transcripts(stores, create_null_logger(), min_length=300))
+        stores[self.name].close()
+        self.assertEqual(keys, [[("t3", self.name), "Chr1", (101, 600)],
+                                [("t2", self.name), "Chr1", (1001, 1500)]])
+
+    def test_chain_hash(self):
+        self.assertEqual(chain_hash("+", [(401, 600), (101, 300)]),
+                         chain_hash("+", [(151, 300), (401, 550)]))
+        self.assertNotEqual(chain_hash("+", [(101, 300), (401, 600)]),
+                            chain_hash("-", [(101, 300), (401, 600)]))
+        self.assertNotEqual(chain_hash("+", [(101, 300), (401, 600)]),
+                            chain_hash("+", [(101, 301), (401, 600)]))
+
+    def test_priority(self):
+        # Redundant transcripts from the first input file are preferred
+        other = os.path.join(self.directory.name, "first.db")
+        with TranscriptStore(other, flag="n") as store:
+            store.write({"a5": self.__record("a5", "Chr1", "+", [(101, 300), (401, 600)])})
+        stores = collections.OrderedDict((name, TranscriptStore(name)) for name in (self.name, other))
+        keys = list(store_transcripts(stores, create_null_logger()))
+        [store.close() for store in stores.values()]
+        self.assertEqual([key[0] for key in keys],
+                         [("t3", self.name), ("t2", self.name), ("t1", self.name)])
+
+    def test_contained(self):
+        records = {
+            "c1": self.__record("c1", "Chr1", "+", [(101, 300), (401, 600)]),
+            "c2": self.__record("c2", "Chr1", "+", [(151, 300), (401, 550)]),
+            "c3": self.__record("c3", "Chr1", "+", [(91, 300), (401, 600)]),
+            "c4": self.__record("c4", "Chr1", "-", [(151, 300), (401, 550)]),
+            "c5": self.__record("c5", "Chr1", "+", [(151, 300), (401, 700)]),
+            "c6": self.__record("c6", "Chr1", "+", [(95, 300), (401, 605)]),
+            "m1": self.__record("m1", "Chr1", "+", [(1001, 2000)]),
+            "m2": self.__record("m2", "Chr1", "+", [(1201, 1800)]),
+            "m3": self.__record("m3", "Chr1", "-", [(1201, 1800)])}
+        name = os.path.join(self.directory.name, "contained.db")
+        with TranscriptStore(name, flag="n") as store:
+            store.write(records)
+        stores = {name: TranscriptStore(name)}
+        logger = create_null_logger()
+        self.assertEqual(len(list(store_transcripts(stores, logger))), 9)
+        keys = list(store_transcripts(stores, logger, remove_contained=True))
+        self.assertEqual([key[0][0] for key in keys], ["c3", "c6", "c4", "c5", "m1", "m3"])
+        # With the tolerance, c3 is considered as contained within c6
+        keys = list(store_transcripts(stores, logger, remove_contained=True, tolerance=10))
+        self.assertEqual([key[0][0] for key in keys], ["c6", "c4", "c5", "m1", "m3"])
+        stores[name].close()
+
+    def test_merge_sorted(self):
+        # Transcripts from different stores must be merged in sorted order
+        names = [os.path.join(self.directory.name, "{}.db".format(index)) for index in range(3)]
+        for index, name in enumerate(names):
+            with TranscriptStore(name, flag="n") as store:
+                store.write(dict(("{}_{}_{}".format(chrom, index, pos),
+                                  self.__record("{}_{}_{}".format(chrom, index, pos), chrom, "+",
+                                                [(pos * 1000 + index * 10 + 1, pos * 1000 + 300)]))
+                                 for chrom in ("Chr1", "Chr2") for pos in range(5)))
+        stores = collections.OrderedDict((name, TranscriptStore(name, cache_size=16)) for name in names)
+        keys = list(store_transcripts(stores, create_null_logger()))
+        [store.close() for store in stores.values()]
+        self.assertEqual(len(keys), 30)
+        self.assertEqual([(key[1], key[2]) for key in keys], sorted((key[1], key[2]) for key in keys))
+
+    def test_clusters(self):
+        positions = [("Chr1", Candidate(1, 100, b"", 0, "a", "")),
+                     ("Chr1", Candidate(50, 200, b"", 0, "b", "")),
+                     ("Chr1", Candidate(205, 300, b"", 0, "c", "")),
+                     ("Chr2", Candidate(250, 300, b"", 0, "d", ""))]
+        self.assertEqual([(chrom, [_.tid for _ in cluster]) for chrom, cluster in clusters(positions)],
+                         [("Chr1", ["a", "b"]), ("Chr1", ["c"]), ("Chr2", ["d"])])
+        self.assertEqual([(chrom, [_.tid for _ in cluster])
+                          for chrom, cluster in clusters(positions, tolerance=5)],
+                         [("Chr1", ["a", "b", "c"]), ("Chr2", ["d"])])
+
+
+if __name__ == "__main__":
+    unittest.main()
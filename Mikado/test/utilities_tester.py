@@ -7,6 +7,8 @@ import os
 import tempfile
 import logging
 import queue
+import itertools
+import random
 
 
 class UtilTester(unittest.TestCase):
@@ -47,6 +49,29 @@ class UtilTester(unittest.TestCase):
         grouped = list(Mikado.utilities.grouper(objects, 4))
         self.assertEqual(grouped, [[0, 1, 2, 3], [4, 5, 6, 7], [8]])
 
+    def test_any_overlap(self):
+
+        random.seed(10)
+        for _ in range(200):
+            first, second = [], []
+            for intervals in (first, second):
+                pos = random.randint(1, 100)
+                for __ in range(random.randint(1, 6)):
+                    length = random.randint(0, 30)
+                    intervals.append((pos, pos + length))
+                    pos += length + random.randint(1, 40)
+            for minimum in (0, 1):
+                correct = any(Mikado.utilities.overlap(*comb) >= minimum
+                              for comb in itertools.product(first, second))
+                self.assertEqual(Mikado.utilities.any_overlap(first, second, minimum),
+                                 correct, (first, second, minimum))
+                self.assertEqual(Mikado.utilities.any_overlap(set(second), set(first), minimum),
+                                 correct, (first, second, minimum))
+
+        self.assertTrue(Mikado.utilities.any_overlap([(10, 20)], [(20, 30)]))
+        self.assertFalse(Mikado.utilities.any_overlap([(10, 20)], [(20, 30)], 1))
+        self.assertFalse(Mikado.utilities.any_overlap([], [(20, 30)]))
+
     def test_merger(self):
 
         first_name = tempfile.mktemp(suffix=".tmp", dir=tempfile.tempdir)
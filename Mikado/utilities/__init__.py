@@ -11,6 +11,7 @@ import collections
 from ..parsers import to_gff
 from itertools import zip_longest
 from .overlap import overlap
+from .intersections import any_overlap
 
 __author__ = 'Luca Venturini'
 
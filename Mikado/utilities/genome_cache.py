@@ -0,0 +1,220 @@
+# coding: utf-8
+
+"""
+This module contains the per-process access point to the genome sequence, used by the
+transcript checks in Mikado prepare and by the padding of transcripts in Mikado pick.
+The FASTA file is opened only once per process, and the sequences are retrieved either
+through a LRU cache of fixed-size windows or, optionally, directly from a memory map
+of the uncompressed FASTA file.
+"""
+
+import collections
+import mmap
+import os
+import pyfaidx
+
+__author__ = 'Luca Venturini'
+
+
+class SequenceView:
+
+    """
+    Class representing a region of a longer sequence, which can be sliced as if it were the
+    sequence of the region itself (ie with 0-based offsets from the start of the region),
+    without copying the sequence of the whole region.
+    """
+
+    __slots__ = ["sequence", "offset", "length"]
+
+    def __init__(self, sequence, offset, length):
+
+        """
+        :param sequence: the underlying sequence, or any object which can be sliced to retrieve it.
+        :param offset: the 0-based offset of the region within the underlying sequence.
+        :type offset: int
+        :param length: the length of the region.
+        :type length: int
+        """
+
+        self.sequence = sequence
+        self.offset = offset
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError("Only contiguous slices of a sequence view can be retrieved")
+        start, stop, _ = key.indices(self.length)
+        if start >= stop:
+            return ""
+        return self.sequence[self.offset + start:self.offset + stop]
+
+
+class _Chromosome:
+
+    """
+    Private class to slice a chromosome through the cache of the genome.
+    """
+
+    __slots__ = ["genome", "chrom"]
+
+    def __init__(self, genome, chrom):
+        self.genome, self.chrom = genome, chrom
+
+    def __getitem__(self, key):
+        return self.genome.fetch(self.chrom, key.start + 1, key.stop)
+
+
+class GenomeCache:
+
+    """
+    Class to retrieve sequences from an indexed genome FASTA file.
+    Instances should be retrieved with get_genome, so that each process opens the genome only once.
+    """
+
+    def __init__(self, filename, memory_map=False, window_size=2**16, max_windows=64):
+
+        """
+        :param filename: the genome FASTA file.
+        :type filename: str
+
+        :param memory_map: flag. If set, and the FASTA is not compressed, the file will be memory-mapped
+        and the sequences read directly from it, without caching.
+        :type memory_map: bool
+
+        :param window_size: the size of the windows kept in the cache.
+        :type window_size: int
+
+        :param max_windows: the maximum number of windows to keep in the cache.
+        :type max_windows: int
+        """
+
+        self.filename = filename
+        self.pid = os.getpid()
+        self.window_size = window_size
+        self.max_windows = max(1, max_windows)
+        self.fasta = pyfaidx.Fasta(filename)
+        self.__windows = collections.OrderedDict()
+        self.__handle, self.__map = None, None
+        if memory_map is True and not filename.endswith((".gz", ".bgz")):
+            self.__handle = open(filename, "rb")
+            self.__map = mmap.mmap(self.__handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __reduce__(self):
+        # File handles and memory maps cannot be pickled, so the genome is opened again when unpickling
+        return get_genome, (self.filename, self.memory_mapped)
+
+    @property
+    def memory_mapped(self):
+        """Flag. True if the sequences are read from a memory map of the FASTA file."""
+        return self.__map is not None
+
+    def __len__(self):
+        return len(self.__windows)
+
+    def __contains__(self, chrom):
+        return chrom in self.fasta
+
+    def __window(self, chrom, index):
+
+        key = (chrom, index)
+        if key in self.__windows:
+            self.__windows.move_to_end(key)
+        else:
+            while len(self.__windows) >= self.max_windows:
+                self.__windows.popitem(last=False)
+            self.__windows[key] = str(
+                self.fasta[chrom][index * self.window_size:(index + 1) * self.window_size])
+        return self.__windows[key]
+
+    def __read_mapped(self, chrom, start, end):
+
+        record = self.fasta.faidx.index[chrom]
+        first = record.offset + (start // record.lenc) * record.lenb + start % record.lenc
+        last = record.offset + ((end - 1) // record.lenc) * record.lenb + (end - 1) % record.lenc
+        return self.__map[first:last + 1].replace(b"\n", b"").replace(b"\r", b"").decode()
+
+    def fetch(self, chrom, start, end):
+
+        """
+        Method to retrieve a genomic sequence, with the same semantics of slicing a pyfaidx record.
+        :param chrom: the chromosome.
+        :type chrom: str
+
+        :param start: the 1-based start of the sequence.
+        :type start: int
+
+        :param end: the 1-based end of the sequence, included.
+        :type end: int
+
+        :rtype: str
+        """
+
+        start, end = max(start - 1, 0), min(end, len(self.fasta[chrom]))
+        if start >= end:
+            return ""
+        elif self.__map is not None:
+            return self.__read_mapped(chrom, start, end)
+
+        first, last = start // self.window_size, (end - 1) // self.window_size
+        sequence = "".join(self.__window(chrom, index) for index in range(first, last + 1))
+        offset = first * self.window_size
+        return sequence[start - offset:end - offset]
+
+    def region(self, chrom, start, end):
+
+        """
+        Method to retrieve a genomic region lazily: only the slices actually requested
+        (eg the exons and splice sites of a long transcript) will be read from the genome.
+        :param chrom: the chromosome.
+        :type chrom: str
+
+        :param start: the 1-based start of the region.
+        :type start: int
+
+        :param end: the 1-based end of the region, included.
+        :type end: int
+
+        :rtype: SequenceView
+        """
+
+        start, end = max(start, 1), min(end, len(self.fasta[chrom]))
+        return SequenceView(_Chromosome(self, chrom), start - 1, max(end - start + 1, 0))
+
+    def close(self):
+        """Method to close the file handles."""
+        if self.__map is not None:
+            self.__map.close()
+            self.__handle.close()
+            self.__map = self.__handle = None
+        self.fasta.close()
+        self.__windows.clear()
+
+
+_genomes = dict()
+
+
+def get_genome(filename, memory_map=False):
+
+    """
+    Function to retrieve the GenomeCache for a FASTA file. The genome is opened
+    the first time it is requested in each process and access mode, and kept open for the lifetime
+    of the process; the file handles inherited from a parent process are never reused,
+    as their position is shared.
+    :param filename: the genome FASTA file, or a pyfaidx.Fasta instance.
+    :type filename: (str|pyfaidx.Fasta)
+
+    :param memory_map: flag, passed to GenomeCache when the genome is opened.
+    :type memory_map: bool
+
+    :rtype: GenomeCache
+    """
+
+    if isinstance(filename, pyfaidx.Fasta):
+        filename = filename.filename
+    key = (filename, bool(memory_map))
+    if key not in _genomes or _genomes[key].pid != os.getpid():
+        _genomes[key] = GenomeCache(filename, memory_map=memory_map)
+    return _genomes[key]
@@ -0,0 +1,64 @@
+import cython
+
+
+@cython.profile(True)
+cpdef bint any_overlap(first, second, long minimum=0):
+
+    """This function checks whether any interval in the first collection
+    overlaps any interval in the second collection by at least "minimum" bases,
+    using the same definition of overlap as the "overlap" function
+    (i.e. overlap >= 0 for touching intervals, > 0 for real overlaps).
+
+    Instead of checking every possible combination of intervals, the two
+    collections are sorted and traversed with a two-pointer merge,
+    so that the check is linear in the number of intervals.
+
+    :param first: a collection of (start, end) intervals, e.g. exons or introns.
+    :param second: a collection of (start, end) intervals.
+    :param minimum: the minimum overlap required to consider two intervals as intersecting.
+    :rtype: bool
+    """
+
+    cdef list fsorted = _normalise(first)
+    cdef list ssorted = _normalise(second)
+    cdef Py_ssize_t index = 0, oindex = 0
+    cdef Py_ssize_t flength = len(fsorted), slength = len(ssorted)
+    cdef long start, end, ostart, oend, left, right
+
+    while index < flength and oindex < slength:
+        start, end = fsorted[index]
+        ostart, oend = ssorted[oindex]
+        if start > ostart:
+            left = start
+        else:
+            left = ostart
+        if end < oend:
+            right = end
+        else:
+            right = oend
+        if right - left >= minimum:
+            return True
+        # The interval ending first cannot overlap any of the following ones
+        # more than it overlaps the current one, so it can be discarded.
+        if end <= oend:
+            index += 1
+        else:
+            oindex += 1
+
+    return False
+
+
+cdef list _normalise(intervals):
+
+    """Private function to sort a collection of intervals, making sure that
+    the start of each interval is not greater than its end."""
+
+    cdef list result = []
+    cdef long start, end
+    for interval in intervals:
+        start, end = interval[:2]
+        if start > end:
+            start, end = end, start
+        result.append((start, end))
+    result.sort()
+    return result
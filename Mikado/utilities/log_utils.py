@@ -39,10 +39,10 @@ def check_logger(logger):
     otherwise it raises a ValueError.
 
     :param logger: the logger instance
-    :type logger: logging.Logger
+    :type logger: logging.Logger | logging.LoggerAdapter
     """
 
-    if isinstance(logger, logging.Logger):
+    if isinstance(logger, (logging.Logger, logging.LoggerAdapter)):
         return logger
     else:
         raise ValueError("{0} is not a logger but rather {1}".format(
@@ -99,3 +99,33 @@ def create_queue_logger(instance, prefix=""):
     instance.logger.setLevel(instance._log_handler.level)
     instance.logger.propagate = False
     return
+
+
+class LocusAdapter(logging.LoggerAdapter):
+
+    """
+    Adapter to attach the identity of a locus (e.g. "Chr1:100-2000") to the messages
+    of a logger. The pick workers use a single logger each, and wrap it with this adapter
+    for every superlocus, instead of creating (and keeping forever) a new logger per superlocus.
+    """
+
+    def __init__(self, logger, locus):
+
+        """
+        :param logger: the logger to wrap.
+        :type logger: logging.Logger
+
+        :param locus: the identity of the locus.
+        :type locus: str
+        """
+
+        super().__init__(logger, {"locus": locus})
+
+    @property
+    def name(self):
+        """The identity of the locus, used in place of the name of the wrapped logger."""
+        return self.extra["locus"]
+
+    def process(self, msg, kwargs):
+        kwargs.setdefault("extra", self.extra)
+        return "{0} - {1}".format(self.extra["locus"], msg), kwargs
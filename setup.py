@@ -52,6 +52,8 @@ setup(
                                      [path.join("Mikado", "scales", "contrast.pyx")]),
                            Extension(path.join("Mikado.utilities.intervaltree"),
                                      [path.join("Mikado", "utilities", "intervaltree.pyx")]),
+                           Extension(path.join("Mikado.utilities.intersections"),
+                                     [path.join("Mikado", "utilities", "intersections.pyx")]),
                            ]),
     zip_safe=False,
     keywords="rna-seq annotation genomics transcriptomics",